@@ -1,16 +1,18 @@
+# Only what every page needs is imported here. The mapping, search and
+# packaging modules are imported by the pages that use them, so Emergency
+# Contacts and Safety Planning render without loading them.
 import streamlit as st
 from streamlit_option_menu import option_menu
 import pandas as pd
-import folium
-from streamlit_folium import st_folium
-from geopy.geocoders import Nominatim
-from geopy.distance import geodesic
+from navigator import settings
+from navigator.gazetteer import load_gazetteer
+from navigator.geocoding import GeocodeCache, get_coordinates
+from navigator.perf import NULL_RERUN, PerfRecorder, authorized, serve_metrics
+import hashlib
 import json
+import re
 import time
 import os
-import zipfile
-import base64
-from io import BytesIO
 
 # Page configuration must be FIRST Streamlit command
 st.set_page_config(
@@ -20,129 +22,45 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Phase timings shared by every session, and the side-port metrics endpoint
+@st.cache_resource
+def get_perf_recorder():
+    recorder = PerfRecorder()
+    if settings.PERF_PORT:
+        serve_metrics(recorder, settings.PERF_HOST, settings.PERF_PORT, settings.PERF_TOKEN)
+    return recorder
+
+# Timings for this script run; a no-op unless NAVIGATOR_PERF is set
+rerun = get_perf_recorder().start_rerun() if settings.PERF_ENABLED else NULL_RERUN
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+# Stylesheet from static/, read and minified once per process. Streamlit
+# serves only images from static/ with their real content type, so the CSS
+# is still inlined rather than linked.
+@st.cache_resource
+def get_stylesheet():
+    with open(os.path.join(STATIC_DIR, "style.css"), encoding="utf-8") as f:
+        css = re.sub(r"/\*.*?\*/", "", f.read(), flags=re.S)
+    return "<style>" + re.sub(r"\s*([{};,])\s*", r"\1", re.sub(r"\s+", " ", css)).strip() + "</style>"
+
+# URL of a file served from static/ (server.enableStaticServing). The content
+# hash in ?v= lets browsers cache it for good and refetch when it changes.
+@st.cache_resource
+def static_url(name):
+    with open(os.path.join(STATIC_DIR, name), "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:12]
+    return f"app/static/{name}?v={digest}"
+
 # Custom CSS for professional design
-st.markdown("""
-<style>
-    :root {
-        --primary: #8e44ad;
-        --secondary: #9b59b6;
-        --accent: #e74c3c;
-        --light: #f9ebfc;
-        --dark: #2c3e50;
-        --success: #27ae60;
-    }
-    
-    .stApp {
-        background-color: #faf5ff;
-        background-image: radial-gradient(#e0d1f3 1.5px, transparent 1.5px), 
-                          radial-gradient(#e0d1f3 1.5px, #faf5ff 1.5px);
-        background-size: 60px 60px;
-        background-position: 0 0, 30px 30px;
-        color: var(--dark);
-    }
-    
-    .st-b7, .css-1d391kg, .st-c0 {
-        background-color: rgba(255, 255, 255, 0.92) !important;
-        border-radius: 15px;
-        padding: 25px;
-        box-shadow: 0 4px 20px rgba(0, 0, 0, 0.08);
-        border-left: 4px solid var(--primary);
-    }
-    
-    h1, h2, h3, h4 {
-        color: var(--primary);
-        border-bottom: 2px solid var(--secondary);
-        padding-bottom: 10px;
-    }
-    
-    .stButton>button {
-        background: linear-gradient(135deg, var(--primary) 0%, var(--secondary) 100%);
-        color: white;
-        border: none;
-        border-radius: 8px;
-        padding: 12px 28px;
-        font-weight: 600;
-        transition: all 0.3s ease;
-        margin: 5px 0;
-    }
-    
-    .stButton>button:hover {
-        transform: translateY(-3px);
-        box-shadow: 0 6px 15px rgba(142, 68, 173, 0.4);
-    }
-    
-    .emergency-button {
-        background: linear-gradient(135deg, var(--accent) 0%, #c0392b 100%) !important;
-        animation: pulse 2s infinite;
-    }
-    
-    @keyframes pulse {
-        0% { box-shadow: 0 0 0 0 rgba(231, 76, 60, 0.7); }
-        70% { box-shadow: 0 0 0 12px rgba(231, 76, 60, 0); }
-        100% { box-shadow: 0 0 0 0 rgba(231, 76, 60, 0); }
-    }
-    
-    .offline-badge {
-        background: linear-gradient(135deg, #7f8c8d 0%, #95a5a6 100%);
-        color: white;
-        padding: 5px 15px;
-        border-radius: 20px;
-        font-weight: bold;
-        display: inline-block;
-        margin-bottom: 15px;
-    }
-    
-    .resource-card {
-        padding: 20px;
-        border-radius: 10px;
-        margin: 15px 0;
-        box-shadow: 0 4px 8px rgba(0,0,0,0.1);
-        border-left: 4px solid var(--secondary);
-        transition: transform 0.3s ease;
-    }
-    
-    .resource-card:hover {
-        transform: translateY(-5px);
-        box-shadow: 0 8px 16px rgba(0,0,0,0.15);
-    }
-    
-    .contact-chip {
-        display: inline-block;
-        background: var(--light);
-        padding: 8px 15px;
-        border-radius: 30px;
-        margin: 5px;
-        font-weight: 500;
-        border: 1px solid var(--secondary);
-    }
-    
-    .footer {
-        position: fixed;
-        bottom: 0;
-        width: 100%;
-        background: var(--dark);
-        color: white;
-        padding: 10px;
-        text-align: center;
-        font-size: 0.8rem;
-        z-index: 100;
-    }
-    
-    .safe-exit {
-        position: absolute;
-        top: 15px;
-        right: 15px;
-        background: var(--light);
-        color: var(--accent);
-        border: 1px solid var(--accent);
-        padding: 5px 15px;
-        border-radius: 20px;
-        font-size: 0.9rem;
-        cursor: pointer;
-        z-index: 1000;
-    }
-</style>
-""", unsafe_allow_html=True)
+with rerun.phase("css"):
+    st.markdown(get_stylesheet(), unsafe_allow_html=True)
+
+MAP_WIDTH = 1200
+MAP_HEIGHT = 400
+# Opening-hours filter choices: None for any time, else the hours ahead to
+# look for resources that are open or opening
+OPEN_FILTERS = {"Any time": None, "Open now": 0, "Open now or within 2 hours": 2, "Open now or within 12 hours": 12}
 
 # Initialize session state for offline mode and data
 def init_session_state():
@@ -150,6 +68,8 @@ def init_session_state():
         st.session_state.offline_mode = False
     if 'resources' not in st.session_state:
         st.session_state.resources = pd.DataFrame()
+    if 'engine' not in st.session_state:
+        st.session_state.engine = None
     if 'geolocation' not in st.session_state:
         st.session_state.geolocation = None
     if 'safe_mode' not in st.session_state:
@@ -162,122 +82,60 @@ def safe_exit():
     st.session_state.safe_mode = True
     st.experimental_rerun()
 
-# Load resources data (simulate online/offline)
-def load_resources():
-    # Sample dataset
-    data = {
-        'name': [
-            'Hope Shelter', 
-            'Safe Haven Women\'s Center',
-            'New Beginnings Refuge',
-            'Legal Aid GBV Division',
-            'Survivor Support Legal Clinic'
-        ],
-        'type': ['Shelter', 'Shelter', 'Shelter', 'Legal Aid', 'Legal Aid'],
-        'address': [
-            '123 Safety St, Johannesburg',
-            '456 Protection Ave, Cape Town',
-            '789 Refuge Rd, Durban',
-            '101 Justice Blvd, Pretoria',
-            '202 Empowerment Way, Port Elizabeth'
-        ],
-        'phone': [
-            '0800 555 123',
-            '0800 555 456',
-            '0800 555 789',
-            '0800 555 101',
-            '0800 555 202'
-        ],
-        'hours': ['24/7', '24/7', '24/7', '9am-5pm Mon-Fri', '8:30am-4:30pm Mon-Fri'],
-        'capacity': [20, 35, 15, 'N/A', 'N/A'],
-        'latitude': [-26.2041, -33.9249, -29.8587, -25.7479, -33.9608],
-        'longitude': [28.0473, 18.4241, 31.0218, 28.2293, 25.6022],
-        'services': [
-            'Emergency shelter, counseling, medical assistance',
-            'Shelter, childcare, job training',
-            'Short-term housing, legal referrals',
-            'Free legal representation, protection orders',
-            'Legal counseling, court accompaniment'
-        ],
-        'languages': ['English, Zulu', 'English, Afrikaans', 'English, Zulu', 'English', 'English, Xhosa']
-    }
-    return pd.DataFrame(data)
-
-# Get coordinates from address
-def get_coordinates(address):
-    try:
-        geolocator = Nominatim(user_agent="gbv_resource_navigator")
-        location = geolocator.geocode(address)
-        if location:
-            return (location.latitude, location.longitude)
-    except:
-        pass
-    return None
-
-# Create a downloadable offline package
-def create_offline_package(resources):
-    # Create ZIP file with resources
-    buffer = BytesIO()
-    with zipfile.ZipFile(buffer, 'w') as zipf:
-        # Add resources as CSV
-        resources.to_csv('resources.csv', index=False)
-        zipf.write('resources.csv')
-        
-        # Add HTML page for offline use
-        offline_html = """
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>GBV Resource Navigator - Offline</title>
-            <style>
-                body { font-family: Arial, sans-serif; padding: 20px; }
-                .resource { border: 1px solid #ddd; padding: 15px; margin: 10px 0; border-radius: 8px; }
-                .emergency { background-color: #ffe6e6; padding: 15px; border-radius: 8px; }
-            </style>
-        </head>
-        <body>
-            <h1>GBV Resource Navigator - Offline</h1>
-            <div class="emergency">
-                <h2>Emergency Contacts</h2>
-                <p>GBV Emergency Line: <strong>0800 428 428</strong></p>
-                <p>Police Emergency: <strong>10111</strong></p>
-                <p>Suicide Helpline: <strong>0800 567 567</strong></p>
-            </div>
-            <div id="resources"></div>
-            <script>
-                // Load resources from CSV
-                fetch('resources.csv')
-                    .then(response => response.text())
-                    .then(data => {
-                        const resources = data.split('\\n').slice(1);
-                        let html = '<h2>Available Resources</h2>';
-                        resources.forEach(row => {
-                            if (row) {
-                                const [name, type, address, phone, hours, capacity, lat, lng, services, languages] = row.split(',');
-                                html += `
-                                    <div class="resource">
-                                        <h3>${name}</h3>
-                                        <p><strong>Type:</strong> ${type}</p>
-                                        <p><strong>Address:</strong> ${address}</p>
-                                        <p><strong>Phone:</strong> ${phone}</p>
-                                        <p><strong>Hours:</strong> ${hours}</p>
-                                        <p><strong>Services:</strong> ${services}</p>
-                                    </div>
-                                `;
-                            }
-                        });
-                        document.getElementById('resources').innerHTML = html;
-                    });
-            </script>
-        </body>
-        </html>
-        """
-        with open('offline.html', 'w') as f:
-            f.write(offline_html)
-        zipf.write('offline.html')
-    
-    buffer.seek(0)
-    return buffer
+# Geocoding cache shared by every session in this server process
+@st.cache_resource
+def get_geocode_cache():
+    return GeocodeCache(os.path.join(settings.CACHE_DIR, "geocode_cache.json"))
+
+# Versioned dataset snapshots and deltas for offline package updates
+@st.cache_resource
+def get_snapshot_store():
+    from navigator.sync import SnapshotStore
+    return SnapshotStore(settings.SYNC_STATE)
+
+# Live shelter availability: one feed per server process tails the shared
+# store, and every session reads changes from it
+@st.cache_resource
+def get_availability_feed():
+    from navigator.availability import AvailabilityFeed, AvailabilityStore
+    return AvailabilityFeed(AvailabilityStore(settings.AVAILABILITY_DB)).start()
+
+# Bring this session's availability for an engine's resources up to date,
+# patching only the rows that changed since its last rerun; the resources and
+# their indexes stay as they are
+def sync_availability(engine):
+    from navigator.availability import LiveAvailability
+    live = st.session_state.get('availability')
+    if live is None or st.session_state.get('availability_for') is not engine:
+        live = st.session_state.availability = LiveAvailability(engine.positions_by_id(), len(engine))
+        st.session_state.availability_for = engine
+    rerun.count("availability_patched", live.update(get_availability_feed()))
+    return live
+
+# Installable offline app, regenerated into PWA_DIR once per dataset version
+# by whichever server process sees that version first
+@st.cache_resource
+def publish_pwa(_resources, version):
+    from navigator.pwa import build_pwa
+    return build_pwa(_resources, settings.PWA_DIR, version)
+
+# Resource Finder results and rendered maps, shared by every session of the
+# server process and emptied when the dataset changes
+@st.cache_resource
+def get_query_caches():
+    from navigator.query_cache import QueryCache
+    return QueryCache(settings.QUERY_CACHE_SIZE), QueryCache(settings.MAP_CACHE_SIZE)
+
+# Result list paging and card toggles
+def set_results_cursor(cursor):
+    st.session_state.results_cursor = cursor
+
+def toggle_card(position):
+    st.session_state.open_cards ^= {position}
+
+# Fill the location box with a typeahead suggestion
+def choose_location(name):
+    st.session_state.location_input = name
 
 # Initialize session state
 init_session_state()
@@ -299,18 +157,43 @@ else:
     st.success("You have safely exited the application. Close this browser tab immediately.")
     st.stop()
 
-# Load resources
-if st.session_state.resources.empty:
+# One query engine per dataset version for the whole server process, over
+# a memory-mapped snapshot that other server processes map too. Sessions
+# share it read-only; filters return positions into it, never copies.
+@st.cache_resource(max_entries=2)
+def get_shared_engine(dataset_key):
+    from navigator.engine import QueryEngine
+    from navigator.snapshot import load_snapshot
+    resources = load_snapshot(settings.DATASET_PATH)
+    return QueryEngine(resources, get_snapshot_store().publish(resources))
+
+# Geographic partitions of the dataset, with an LRU of regional engines
+# shared by every session of the server process
+@st.cache_resource(max_entries=2)
+def get_partitions(dataset_key):
+    from navigator.partitions import load_partitions
+    return load_partitions(settings.DATASET_PATH)
+
+# Attach the shared dataset to this session, once, on the pages that use it
+def load_session_resources():
+    if not st.session_state.resources.empty:
+        return
+    from navigator.snapshot import dataset_key
     try:
         # Try to load from online source
-        st.session_state.resources = load_resources()
+        with rerun.phase("load"):
+            engine = get_shared_engine(dataset_key(settings.DATASET_PATH))
+            st.session_state.engine = engine
+            st.session_state.resources = engine.resources
+            st.session_state.dataset_version = engine.version
     except Exception as e:
         st.error(f"Online resources unavailable. Switching to offline mode. Error: {str(e)}")
         st.session_state.offline_mode = True
 
 # Navigation
 with st.sidebar:
-    st.image("https://i.imgur.com/XtQF0Qn.png", width=200)
+    st.markdown(f'<img src="{static_url("logo.png")}" width="200" alt="SafePath Navigator">',
+                unsafe_allow_html=True)
     selected = option_menu(
         menu_title=None,
         options=["Resource Finder", "Emergency Contacts", "Safety Planning", "Offline Access"],
@@ -328,14 +211,24 @@ with st.sidebar:
     st.subheader("📍 Your Location")
     location_input = st.text_input("Enter your location (city, address, or postal code)", key="location_input")
     
+    # Typeahead suggestions from the bundled gazetteer
+    gazetteer = load_gazetteer()
+    if location_input and gazetteer.lookup(location_input) is None:
+        suggestions = gazetteer.suggest(location_input)
+        if suggestions:
+            st.caption("Did you mean:")
+            for place in suggestions:
+                st.button(place.label, key=f"suggest_{place.label}", on_click=choose_location, args=(place.name,))
+    
     if st.button("Use Current Location", key="geolocate_btn"):
         # Simulate with a default location
         st.session_state.geolocation = (-25.7479, 28.2293)  # Pretoria coordinates
         st.success("Location set to current position")
     
     if location_input:
-        with st.spinner("Locating..."):
-            coords = get_coordinates(location_input)
+        with st.spinner("Locating..."), rerun.phase("geocode"):
+            coords = get_coordinates(location_input, cache=get_geocode_cache(), gazetteer=gazetteer,
+                                     offline=st.session_state.offline_mode)
             if coords:
                 st.session_state.geolocation = coords
                 st.success(f"Location set to {location_input}")
@@ -391,92 +284,192 @@ if st.session_state.get('emergency_expanded', False):
 st.title("🕊️ SafePath Navigator")
 st.markdown("### Find GBV Shelters, Legal Aid, and Support Services")
 st.markdown("---")
+rerun.mark(f"first_paint[{selected}]")
 
 # Resource Finder Page
 if selected == "Resource Finder":
+    from navigator.dataset import format_capacity
+    from navigator.inverted_index import SERVICE_TAGS
+    from navigator.opening_hours import local_time, week_slot
+    from navigator.query_cache import query_key, round_location
+    from navigator.map_layer import (SOUTH_AFRICA_CENTER, bounds_from_st_folium, build_marker_layer,
+                                     render_base_map, render_marker_layer, show_rendered_map, viewport_bounds)
+    from navigator.results import paginate, result_signature
+    from navigator.snapshot import dataset_key
+    
+    dataset = dataset_key(settings.DATASET_PATH)
+    try:
+        with rerun.phase("load"):
+            partitions = get_partitions(dataset)
+    except Exception as e:
+        partitions = None
+        st.error(f"Online resources unavailable. Switching to offline mode. Error: {str(e)}")
+        st.session_state.offline_mode = True
     st.subheader("Find Nearby Resources")
     
+    search_query = st.text_input("Search by name, service, area or language", key="search_query",
+                                 placeholder="e.g. legal aid soweto")
+    
     # Filters
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3, col4, col5 = st.columns(5)
     with col1:
         resource_type = st.selectbox("Resource Type", ["All", "Shelter", "Legal Aid", "Counseling", "Medical"])
     with col2:
         distance = st.slider("Maximum Distance (km)", 1, 100, 20)
     with col3:
-        services = st.multiselect("Specific Services", 
-                                 ["24/7 Access", "Child-Friendly", "Legal Assistance", 
-                                  "Counseling", "Medical Care", "Transportation"])
+        services = st.multiselect("Specific Services", list(SERVICE_TAGS))
+    with col4:
+        languages = st.multiselect("Languages", partitions.languages if partitions else [])
+    with col5:
+        open_within = OPEN_FILTERS[st.selectbox("Opening Hours", list(OPEN_FILTERS))]
+    
+    # Only the partitions within reach of the location are loaded. A text
+    # search without a location needs the whole dataset; with neither, the
+    # national summary is shown instead of every resource.
+    engine = None
+    if partitions is not None:
+        if st.session_state.geolocation:
+            with rerun.phase("load"):
+                engine = partitions.engine_near(*st.session_state.geolocation, distance)
+        elif search_query:
+            load_session_resources()
+            engine = st.session_state.engine
     
     # Show results
-    if not st.session_state.resources.empty:
-        # Filter resources
-        filtered_resources = st.session_state.resources.copy()
+    if engine is not None:
+        with rerun.phase("availability"):
+            availability = sync_availability(engine)
         
-        if resource_type != "All":
-            filtered_resources = filtered_resources[filtered_resources['type'] == resource_type]
+        # Results are shared by every session asking the same normalized
+        # query of the same dataset version
+        result_cache, map_cache = get_query_caches()
+        result_cache.validate(dataset)
+        map_cache.validate(dataset)
+        location = round_location(st.session_state.geolocation)
+        now = local_time()
+        query = query_key((dataset, engine.version), location, distance, resource_type, services, languages,
+                          search_query, week_slot(now), open_within)
         
-        # Calculate distances if location is set
-        if st.session_state.geolocation:
-            user_location = st.session_state.geolocation
-            filtered_resources['distance'] = filtered_resources.apply(
-                lambda row: geodesic(user_location, (row['latitude'], row['longitude'])).km,
-                axis=1
-            )
-            filtered_resources = filtered_resources[filtered_resources['distance'] <= distance]
-            filtered_resources = filtered_resources.sort_values('distance')
+        def run_query():
+            # Calculate distances if location is set, touching only nearby grid
+            # cells, then keep the hits matching the type/service/language bitsets
+            with rerun.phase("filter"):
+                stats = {}
+                positions, distances = engine.filter(location, distance, resource_type, services, languages,
+                                                     stats=stats, open_at=now if open_within is not None else None,
+                                                     open_within=open_within)
+                rerun.count("rows_scanned", stats['scanned'])
+            
+            # Rank by relevance to the search box, nearest first among equals
+            if search_query:
+                with rerun.phase("search"):
+                    positions, distances = engine.search(search_query, positions, distances)
+            return positions, distances
+        
+        (positions, distances), hit = result_cache.get(query, run_query)
+        rerun.count("result_cache_hit", int(hit))
+        rerun.count("results", len(positions))
+        if open_within is not None and engine.hours.known < len(engine):
+            st.caption("Resources without readable opening hours are left out.")
         
         # Show map and results
-        if not filtered_resources.empty:
-            # Create map
+        if len(positions):
+            # Create map: a base map rendered once per location, plus a marker
+            # layer holding only the clustered resources inside the current
+            # viewport, rendered once per query, viewport and availability state
             st.subheader("Resource Map")
-            if st.session_state.geolocation:
-                user_location = st.session_state.geolocation
-                m = folium.Map(location=user_location, zoom_start=10)
-            else:
-                m = folium.Map(location=[-28.4793, 24.6727], zoom_start=5)  # Default to South Africa view
-            
-            # Add user location
-            if st.session_state.geolocation:
-                folium.Marker(
-                    location=user_location,
-                    popup="Your Location",
-                    icon=folium.Icon(color="blue", icon="user", prefix="fa")
-                ).add_to(m)
-            
-            # Add resources
-            for idx, row in filtered_resources.iterrows():
-                folium.Marker(
-                    location=[row['latitude'], row['longitude']],
-                    popup=f"<b>{row['name']}</b><br>{row['type']}<br>📞 {row['phone']}",
-                    icon=folium.Icon(
-                        color="red" if row['type'] == "Shelter" else "green", 
-                        icon="home" if row['type'] == "Shelter" else "balance-scale", 
-                        prefix="fa"
-                    )
-                ).add_to(m)
+            with rerun.phase("map_build"):
+                base_map, _ = map_cache.get(("base", st.session_state.geolocation),
+                                            lambda: render_base_map(st.session_state.geolocation))
+                map_state = st.session_state.get("resource_map")
+                bounds = bounds_from_st_folium(map_state)
+                zoom = map_state.get("zoom") if bounds else None
+                if st.session_state.get("map_view_for") != st.session_state.geolocation or zoom is None:
+                    # The reported viewport belongs to a previous base map
+                    st.session_state.map_view_for = st.session_state.geolocation
+                    zoom = 10 if st.session_state.geolocation else 5
+                    center = st.session_state.geolocation or SOUTH_AFRICA_CENTER
+                    bounds = viewport_bounds(center, zoom, MAP_WIDTH, MAP_HEIGHT)
+                bounds = tuple(round(value, 3) for value in bounds)
+                
+                def render_layer():
+                    resources = engine.rows(positions)
+                    if distances is not None:
+                        resources = resources.assign(distance=distances)
+                    layer, markers = build_marker_layer(resources, bounds, zoom,
+                                                        lambda i: availability.describe(positions[i]))
+                    rerun.count("markers", markers)
+                    return render_marker_layer(layer)
+                
+                layer_script, hit = map_cache.get(("layer", query, bounds, zoom, availability.seq), render_layer)
+                rerun.count("map_cache_hit", int(hit))
+                rerun.count("map_html_bytes", len(base_map['script']) + len(layer_script))
             
             # Display map
-            st_folium(m, width=1200, height=400)
+            with rerun.phase("st_folium"):
+                show_rendered_map(base_map, layer_script, key="resource_map", width=MAP_WIDTH, height=MAP_HEIGHT,
+                                  returned_objects=["bounds", "zoom"])
             
-            # Show resource cards
-            st.subheader(f"Found {len(filtered_resources)} Resources")
-            for idx, row in filtered_resources.iterrows():
-                distance_info = f"{row['distance']:.1f} km away" if 'distance' in row and st.session_state.geolocation else ""
+            # Show resource cards one page at a time; paging restarts when the
+            # result list changes
+            st.subheader(f"Found {len(positions)} Resources")
+            signature = (engine.version, result_signature(positions))
+            if st.session_state.get('results_signature') != signature:
+                st.session_state.results_signature = signature
+                st.session_state.results_cursor = 0
+                st.session_state.open_cards = set()
+            start, stop, previous_cursor, next_cursor = paginate(len(positions),
+                                                                 st.session_state.results_cursor)
+            
+            with rerun.phase("cards"):
+                page = engine.rows(positions[start:stop])
+                for offset in range(start, stop):
+                    position = positions[offset]
+                    row = page.iloc[offset - start]
+                    distance_info = f"{distances[offset]:.1f} km away" if distances is not None else ""
                 
-                with st.expander(f"### {row['name']} - {row['type']} {distance_info}", expanded=False):
-                    col1, col2 = st.columns([1, 2])
+                    col1, col2 = st.columns([5, 1])
+                    with col1:
+                        st.markdown(f"### {row['name']} - {row['type']} {distance_info}")
+                    with col2:
+                        is_open = position in st.session_state.open_cards
+                        st.button("Hide details" if is_open else "Details", key=f"card_{position}",
+                                  on_click=toggle_card, args=(position,))
+                
+                    # Details are only rendered for opened cards
+                    if is_open:
+                        col1, col2 = st.columns([1, 2])
+                        with col1:
+                            st.markdown(f"**Address:** {row['address']}")
+                            st.markdown(f"**Phone:** `{row['phone']}`")
+                            opening = engine.hours.describe(position, now)
+                            st.markdown(f"**Hours:** {row['hours']}" + (f" ({opening})" if opening else ""))
+                            if row['type'] == "Shelter":
+                                st.markdown(f"**Capacity:** {format_capacity(row['capacity'])}")
+                            status = availability.describe(position)
+                            if status:
+                                st.markdown(f"**Availability:** {status}")
+                        with col2:
+                            st.markdown(f"**Services:** {row['services']}")
+                            st.markdown(f"**Languages:** {row['languages']}")
+                            st.markdown(f"**Get Directions:** [Google Maps](https://www.google.com/maps/dir/?api=1&destination={row['latitude']},{row['longitude']})")
+            
+                if previous_cursor is not None or next_cursor is not None:
+                    col1, col2, col3 = st.columns([1, 2, 1])
                     with col1:
-                        st.markdown(f"**Address:** {row['address']}")
-                        st.markdown(f"**Phone:** `{row['phone']}`")
-                        st.markdown(f"**Hours:** {row['hours']}")
-                        if row['type'] == "Shelter":
-                            st.markdown(f"**Capacity:** {row['capacity']} people")
+                        st.button("◀ Previous", key="results_previous", disabled=previous_cursor is None,
+                                  on_click=set_results_cursor, args=(previous_cursor,))
                     with col2:
-                        st.markdown(f"**Services:** {row['services']}")
-                        st.markdown(f"**Languages:** {row['languages']}")
-                        st.markdown(f"**Get Directions:** [Google Maps](https://www.google.com/maps/dir/?api=1&destination={row['latitude']},{row['longitude']})")
+                        st.caption(f"Showing {start + 1}-{stop} of {len(positions)}")
+                    with col3:
+                        st.button("Next ▶", key="results_next", disabled=next_cursor is None,
+                                  on_click=set_results_cursor, args=(next_cursor,))
         else:
             st.warning("No resources found matching your criteria. Try adjusting your filters.")
+    elif partitions is not None:
+        st.info("Set your location in the sidebar to see resources near you, or search by name or service.")
+        st.subheader(f"{len(partitions)} Resources Nationwide")
+        st.dataframe(partitions.national_summary(), use_container_width=True)
     else:
         st.error("Resource data is not available. Please try again later or use offline resources.")
 
@@ -608,6 +601,9 @@ elif selected == "Safety Planning":
 
 # Offline Access Page
 elif selected == "Offline Access":
+    from navigator.offline_package import create_offline_package, tile_report
+    
+    load_session_resources()
     st.header("Offline Access")
     st.markdown("### Prepare for connectivity gaps")
     
@@ -628,34 +624,87 @@ elif selected == "Offline Access":
         """, unsafe_allow_html=True)
         
         if st.button("Generate Offline Package", key="download_btn"):
-            with st.spinner("Preparing offline resources..."):
-                offline_package = create_offline_package(st.session_state.resources)
-                st.success("Offline package ready for download!")
-                
-                # Create download link
-                b64 = base64.b64encode(offline_package.getvalue()).decode()
-                href = f'<a href="data:application/zip;base64,{b64}" download="gbv_offline_resources.zip">Download ZIP File</a>'
-                st.markdown(href, unsafe_allow_html=True)
+            st.session_state.offline_package_ready = True
+        
+        if st.session_state.get('offline_package_ready', False):
+            with st.spinner("Preparing offline resources..."), rerun.phase("offline_package"):
+                manifest = get_snapshot_store().manifest()
+                offline_package = create_offline_package(st.session_state.resources, manifest)
+            st.success(f"Offline package ready for download! (version {manifest['version']})")
+            
+            # Served as a file download rather than an inline base64 link
+            st.download_button("Download ZIP File", data=offline_package,
+                               file_name="gbv_offline_resources.zip", mime="application/zip",
+                               key="download_zip_btn")
+            
+            report = tile_report(offline_package)
+            if report:
+                st.markdown("**Offline map tiles by region**")
+                st.dataframe(pd.DataFrame([
+                    {
+                        "Region": region['name'],
+                        "Resources": region['resources'],
+                        "Tiles": region['tiles'],
+                        "Size (MB)": round(region['bytes'] / 1024 / 1024, 2),
+                        "Over budget": region['over_budget'],
+                    }
+                    for region in report['regions']
+                ]), hide_index=True)
+                st.caption(f"Tiles shared by neighbouring regions are stored once: "
+                           f"{report.get('bytes', 0) / 1024 / 1024:.2f} MB in total.")
+        
+        # Field workers on metered data only fetch what changed since their copy
+        st.markdown("#### Update an existing package")
+        held_version = st.number_input("Version of the package you have (shown at the bottom of offline.html)",
+                                       min_value=0, step=1, key="held_version")
+        if held_version:
+            store = get_snapshot_store()
+            delta = store.delta_since(int(held_version))
+            if delta is None:
+                st.info("This version can no longer be updated. Please download the full package.")
+            elif delta['from_version'] == delta['to_version']:
+                st.success("Your package is already up to date.")
+            else:
+                changes = len(delta['added']) + len(delta['changed']) + len(delta['removed'])
+                st.download_button(f"Download Update ({changes} changes)",
+                                   data=json.dumps(delta, separators=(",", ":")),
+                                   file_name=f"gbv_update_{delta['from_version']}_to_{delta['to_version']}.json",
+                                   mime="application/json", key="download_delta_btn")
+                st.caption("Open offline.html from your package and choose this file under "
+                           "\"Apply an update file\". The page checks the update against this "
+                           "version's checksum before using it.")
     
     with col2:
-        st.markdown("""
-            <div class="resource-card">
-                <h3>📱 Mobile App Installation</h3>
-                <p>For better offline access, install our mobile app:</p>
-                <ol>
-                    <li>Open this page on your mobile device</li>
-                    <li>Tap the share button in your browser</li>
-                    <li>Select "Add to Home Screen"</li>
-                </ol>
-                <p><strong>Once installed:</strong></p>
-                <ul>
-                    <li>Works completely offline</li>
-                    <li>Fast access to emergency contacts</li>
-                    <li>GPS navigation to shelters</li>
-                    <li>Discreet "Safe Exit" feature</li>
-                </ul>
-            </div>
-        """, unsafe_allow_html=True)
+        if settings.PWA_URL and not st.session_state.resources.empty:
+            with rerun.phase("pwa"):
+                publish_pwa(st.session_state.resources, st.session_state.dataset_version)
+            st.markdown(f"""
+                <div class="resource-card">
+                    <h3>📱 Mobile App Installation</h3>
+                    <p>For better offline access, install the offline app:</p>
+                    <ol>
+                        <li>Open <a href="{settings.PWA_URL}" target="_blank">the offline app</a> on your mobile device</li>
+                        <li>Tap the share button or menu in your browser</li>
+                        <li>Select "Add to Home Screen" or "Install app"</li>
+                    </ol>
+                    <p><strong>Once installed:</strong></p>
+                    <ul>
+                        <li>Opens without a connection after the first visit</li>
+                        <li>Fast access to emergency contacts</li>
+                        <li>Resource search near your town or GPS location</li>
+                        <li>Updates download only what changed (version {st.session_state.dataset_version})</li>
+                    </ul>
+                </div>
+            """, unsafe_allow_html=True)
+        else:
+            st.markdown("""
+                <div class="resource-card">
+                    <h3>📱 Mobile App Installation</h3>
+                    <p>The installable offline app is not available on this server.</p>
+                    <p>Download the offline package instead and open <code>offline.html</code>
+                    from the unzipped folder; it works without an internet connection.</p>
+                </div>
+            """, unsafe_allow_html=True)
     
     st.markdown("---")
     st.subheader("Offline Safety Features")
@@ -688,3 +737,36 @@ st.markdown("""
     Remember: You are not alone - help is available 24/7</p>
 </div>
 """, unsafe_allow_html=True)
+rerun.finish()
+
+# Operator performance panel, opened with ?perf=<NAVIGATOR_PERF_TOKEN>
+if rerun.enabled and authorized(st.query_params.get("perf")):
+    recorder = get_perf_recorder()
+    snapshot = recorder.snapshot()
+    with st.expander(f"Performance ({snapshot['reruns']} reruns)", expanded=True):
+        st.markdown("**Phase timings (ms)**")
+        st.dataframe(pd.DataFrame([
+            {"Phase": name, "Runs": stats['count'],
+             **{key.upper(): round(stats[key] * 1000, 2) for key in ("mean", "p50", "p90", "p95", "p99") if key in stats}}
+            for name, stats in snapshot['phases_s'].items()
+        ]), hide_index=True)
+        st.markdown("**Counters per rerun**")
+        st.dataframe(pd.DataFrame([
+            {"Counter": name, "Total": stats['sum'],
+             **{key.upper(): stats[key] for key in ("mean", "p50", "p95") if key in stats}}
+            for name, stats in snapshot['counters'].items()
+        ]), hide_index=True)
+        st.markdown("**Shared caches**")
+        result_cache, map_cache = get_query_caches()
+        st.dataframe(pd.DataFrame([
+            {"Cache": name, **{key.replace("_", " ").capitalize(): value for key, value in cache.stats().items()}}
+            for name, cache in (("Query results", result_cache), ("Rendered maps", map_cache))
+        ]).assign(**{"Hit rate": lambda frame: (frame["Hit rate"] * 100).round(1).astype(str) + "%"}),
+            hide_index=True)
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("Export JSON", data=recorder.to_json(), file_name="navigator_perf.json",
+                               mime="application/json", key="perf_json_btn")
+        with col2:
+            st.download_button("Export Prometheus", data=recorder.to_prometheus(), file_name="navigator_perf.prom",
+                               mime="text/plain", key="perf_prom_btn")
@@ -0,0 +1,15 @@
+import os
+import runpy
+import sys
+
+# Runs app.py under streamlit.testing with the sidebar menu replaced by the
+# page named in NAVIGATOR_BENCH_PAGE; the real menu is a custom component,
+# which AppTest cannot drive.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import streamlit_option_menu
+
+streamlit_option_menu.option_menu = lambda *args, **kwargs: os.environ.get("NAVIGATOR_BENCH_PAGE", "Resource Finder")
+runpy.run_path(os.path.join(ROOT, "app.py"), run_name="__main__")
@@ -0,0 +1,135 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from navigator.availability import STATUSES, AvailabilityFeed, AvailabilityStore, LiveAvailability
+
+DEFAULT_WRITERS = 16
+DEFAULT_UPDATES = 500
+DEFAULT_RESOURCES = 10_000
+# Seconds to wait for the feed to see every write once the writers finish
+FEED_TIMEOUT = 30
+
+
+def _resource_ids(count):
+    return [f"r{i:07d}" for i in range(count)]
+
+
+# One shelter-side updater: `updates` transactions of `batch` random
+# changes each, timed individually. Runs in its own process, as separate
+# server processes and update scripts would.
+def _writer(path, seed, updates, batch, resources, start_at):
+    random.seed(seed)
+    store = AvailabilityStore(path)
+    latencies = []
+    errors = 0
+    while time.time() < start_at:
+        time.sleep(0.001)
+    started = time.time()
+    for _ in range(updates):
+        changes = [(f"r{random.randrange(resources):07d}", random.randrange(0, 40), random.choice(STATUSES))
+                   for _ in range(batch)]
+        t0 = time.perf_counter()
+        try:
+            store.update_many(changes)
+        except sqlite3.OperationalError:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - t0)
+    finished = time.time()
+    store.close()
+    return latencies, errors, started, finished
+
+
+def _percentiles_ms(values):
+    if not values:
+        return {}
+    return {name: round(float(np.percentile(values, q)) * 1000, 3)
+            for name, q in (("p50_ms", 50), ("p95_ms", 95), ("p99_ms", 99), ("max_ms", 100))}
+
+
+# Many concurrent writers against a scratch availability database, with a
+# feed tailing it as a server process would. Checks that no update is lost
+# and that the feed ends up matching the database, and times how long a
+# session takes to patch itself from the feed afterwards.
+def run_stress(writers=DEFAULT_WRITERS, updates=DEFAULT_UPDATES, batch=1, resources=DEFAULT_RESOURCES, path=None):
+    directory = None
+    if path is None:
+        directory = tempfile.TemporaryDirectory()
+        path = os.path.join(directory.name, "availability.sqlite3")
+    try:
+        store = AvailabilityStore(path)
+        feed = AvailabilityFeed(store, interval=0.05).start()
+        session = LiveAvailability({resource_id: i for i, resource_id in enumerate(_resource_ids(resources))},
+                                   resources)
+        start_seq = feed.seq
+
+        # Writers wait for a common start time so process start-up isn't timed
+        start_at = time.time() + 2.0
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(writers) as pool:
+            pending = [pool.apply_async(_writer, (path, seed, updates, batch, resources, start_at))
+                       for seed in range(writers)]
+            results = [result.get() for result in pending]
+        started = min(result[2] for result in results)
+        wall = max(result[3] for result in results) - started
+
+        latencies = [latency for result in results for latency in result[0]]
+        errors = sum(result[1] for result in results)
+        expected_seq = start_seq + len(latencies) * batch
+        deadline = time.time() + FEED_TIMEOUT
+        while feed.seq < expected_seq and time.time() < deadline:
+            time.sleep(0.01)
+        feed_lag = time.time() - started - wall
+        feed.stop()
+
+        seq, rows = store.snapshot()
+        consistent = seq == expected_seq and {row[1]: row for row in rows} == feed.current
+        t0 = time.perf_counter()
+        patched = session.update(feed)
+        patch_time = time.perf_counter() - t0
+
+        return {
+            'writers': writers,
+            'transactions': len(latencies),
+            'updates': len(latencies) * batch,
+            'batch': batch,
+            'errors': errors,
+            'wall_s': round(wall, 3),
+            'updates_per_s': round(len(latencies) * batch / wall, 1),
+            'transaction_latency': _percentiles_ms(latencies),
+            'feed_catch_up_s': round(feed_lag, 3),
+            'consistent': consistent,
+            'session_rows_patched': patched,
+            'session_patch_ms': round(patch_time * 1000, 3),
+        }
+    finally:
+        if directory is not None:
+            directory.cleanup()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stress the availability store with concurrent writers.")
+    parser.add_argument("--writers", type=int, default=DEFAULT_WRITERS, help="concurrent writer processes")
+    parser.add_argument("--updates", type=int, default=DEFAULT_UPDATES, help="transactions per writer")
+    parser.add_argument("--batch", type=int, default=1, help="changes per transaction")
+    parser.add_argument("--resources", type=int, default=DEFAULT_RESOURCES, help="number of distinct resources")
+    parser.add_argument("--db", help="database to write to (default: a scratch file)")
+    args = parser.parse_args(argv)
+
+    report = run_stress(args.writers, args.updates, args.batch, args.resources, args.db)
+    print(json.dumps(report, indent=2))
+    if report['errors'] or not report['consistent']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import numpy as np
+
+from benchmarks.synthetic import synthetic_resources
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_ROWS = 100_000
+DEFAULT_SESSIONS = [1, 10, 50]
+# Seconds to wait for the server to start and for one rerun to finish
+STARTUP_TIMEOUT = 120
+RERUN_TIMEOUT = 600
+# Steps of one visit, in order
+STEPS = ['open_finder', 'set_location', 'move_distance', 'emergency_contacts', 'open_offline', 'offline_package']
+CITIES = ['Johannesburg', 'Pretoria', 'Cape Town', 'Durban', 'Gqeberha', 'East London', 'Bloemfontein',
+          'Polokwane', 'Mbombela', 'Soweto']
+DISTANCES = [5, 10, 50, 100]
+# The sidebar page menu, a custom component
+MENU_COMPONENT = "streamlit_option_menu.option_menu"
+# Seconds between samples of the server's memory and CPU time
+SAMPLE_INTERVAL = 0.1
+
+
+class LoadTestError(Exception):
+    pass
+
+
+# One browser tab, speaking Streamlit's websocket protocol: each rerun sends
+# the widget values the visitor has set and waits for the script to finish.
+# Rerun latency is measured from sending the request to the last message of
+# the run, so it includes delivery but not the browser's own rendering.
+class Session:
+    def __init__(self, url):
+        self.url = url
+        self.websocket = None
+        self.values = {}
+        self.widgets = {}
+        self.errors = []
+        self._messages = {}
+
+    async def connect(self):
+        from tornado.websocket import websocket_connect
+
+        self.websocket = await websocket_connect(self.url, subprotocols=["streamlit"],
+                                                 max_message_size=256 * 1024 * 1024)
+
+    def close(self):
+        if self.websocket is not None:
+            self.websocket.close()
+
+    # Id of the first widget of a kind with the given key or label, or of
+    # any widget of the kind when neither is given
+    def widget(self, kind, key=None, label=None):
+        for widget_id, (widget_kind, widget_label) in self.widgets.items():
+            if widget_kind == kind and (widget_id.endswith(f"-{key}") if key else label in (None, widget_label)):
+                return widget_id
+        raise LoadTestError(f"no {kind} {key or label!r} on the page")
+
+    def set_value(self, widget_id, field, value):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        state = WidgetState(id=widget_id)
+        if field == "double_array_value":
+            state.double_array_value.data.extend(value)
+        else:
+            setattr(state, field, value)
+        self.values[widget_id] = state
+
+    # Rerun the script with the current widget values, plus a click on the
+    # given button; returns the time until the run finished
+    async def rerun(self, click=None):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        message = BackMsg()
+        message.rerun_script.query_string = ""
+        message.rerun_script.widget_states.widgets.extend(self.values.values())
+        if click:
+            message.rerun_script.widget_states.widgets.append(WidgetState(id=click, trigger_value=True))
+        self.widgets = {}
+        started = time.perf_counter()
+        await self.websocket.write_message(message.SerializeToString(), binary=True)
+        await asyncio.wait_for(self._read_until_finished(), RERUN_TIMEOUT)
+        return time.perf_counter() - started
+
+    async def _read_until_finished(self):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        while True:
+            payload = await self.websocket.read_message()
+            if payload is None:
+                raise LoadTestError("server closed the connection")
+            message = ForwardMsg()
+            message.ParseFromString(payload)
+            kind = message.WhichOneof("type")
+            if kind == "ref_hash":
+                # The server sends messages this session has already seen
+                # by reference
+                message = self._messages[message.ref_hash]
+                kind = message.WhichOneof("type")
+            elif message.hash:
+                self._messages[message.hash] = message
+            if kind == "delta" and message.delta.WhichOneof("type") == "new_element":
+                element = message.delta.new_element
+                element_kind = element.WhichOneof("type")
+                if element_kind == "exception":
+                    self.errors.append(element.exception.message)
+                proto = getattr(element, element_kind)
+                if getattr(proto, "id", ""):
+                    # Custom components have no label; their name identifies them
+                    self.widgets[proto.id] = (element_kind, getattr(proto, "label", getattr(proto, "component_name", "")))
+            elif kind == "script_finished":
+                if message.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    self.errors.append("script failed to compile")
+                if message.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    return
+
+
+# One visitor: open the Resource Finder, set a location, move the distance
+# slider, look at Emergency Contacts, then generate the offline package.
+# Returns each step's rerun time and the first error, if any.
+async def visit(url, seed, think_time=0.0, start_delay=0.0):
+    rng = random.Random(seed)
+    timings = {}
+    session = Session(url)
+    await asyncio.sleep(start_delay)
+
+    async def step(name, action):
+        if timings and think_time:
+            await asyncio.sleep(rng.uniform(0.5, 1.5) * think_time)
+        timings[name] = await action()
+        if session.errors:
+            raise LoadTestError(f"{name}: {session.errors[0]}")
+
+    def go_to(page):
+        session.set_value(session.widget("component_instance", label=MENU_COMPONENT), "json_value", json.dumps(page))
+        return session.rerun()
+
+    try:
+        await session.connect()
+        await step('open_finder', session.rerun)
+        session.set_value(session.widget("text_input", key="location_input"), "string_value", rng.choice(CITIES))
+        await step('set_location', session.rerun)
+        session.set_value(session.widget("slider", label="Maximum Distance (km)"), "double_array_value",
+                          [rng.choice(DISTANCES)])
+        await step('move_distance', session.rerun)
+        await step('emergency_contacts', lambda: go_to("Emergency Contacts"))
+        await step('open_offline', lambda: go_to("Offline Access"))
+        await step('offline_package', lambda: session.rerun(click=session.widget("button", key="download_btn")))
+    except Exception as e:
+        return timings, f"{type(e).__name__}: {e}"
+    finally:
+        session.close()
+    return timings, None
+
+
+# Resident memory (MB) and CPU time used so far (s) of a process, from /proc
+def process_usage(pid):
+    with open(f"/proc/{pid}/status", encoding="ascii") as f:
+        rss = next(int(line.split()[1]) / 1024 for line in f if line.startswith("VmRSS:"))
+    with open(f"/proc/{pid}/stat", encoding="ascii") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    return rss, cpu
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# `streamlit run app.py` on a free local port, as one replica
+def start_server(path, cache_dir):
+    port = _free_port()
+    env = dict(os.environ, NAVIGATOR_DATASET=path, NAVIGATOR_CACHE_DIR=cache_dir)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", os.path.join(ROOT, "app.py"), "--server.headless", "true",
+         "--server.address", "127.0.0.1", "--server.port", str(port), "--browser.gatherUsageStats", "false",
+         "--server.fileWatcherType", "none"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    deadline = time.time() + STARTUP_TIMEOUT
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise LoadTestError(f"server exited: {server.stderr.read().decode(errors='replace')[-2000:]}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as response:
+                if response.status == 200:
+                    return server, f"ws://127.0.0.1:{port}/_stcore/stream"
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise LoadTestError("server did not start")
+
+
+def _percentiles_ms(values):
+    if not values:
+        return {}
+    return {name: round(float(np.percentile(values, q)) * 1000, 1)
+            for name, q in (("p50_ms", 50), ("p95_ms", 95), ("p99_ms", 99), ("max_ms", 100))}
+
+
+async def _sample(pid, peak, stop):
+    while not stop.is_set():
+        peak[0] = max(peak[0], process_usage(pid)[0])
+        try:
+            await asyncio.wait_for(stop.wait(), SAMPLE_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+# `sessions` visitors arriving within ramp_up seconds against a fresh server
+async def _run_level(url, pid, sessions, think_time, ramp_up, warmup, seed):
+    if warmup:
+        # A replica that has already served a visitor: dataset mapped,
+        # partitions and offline package built
+        _, error = await visit(url, seed - 1)
+        if error:
+            raise LoadTestError(f"warm-up visit failed: {error}")
+    idle_rss, cpu_started = process_usage(pid)
+    peak, stop = [idle_rss], asyncio.Event()
+    sampler = asyncio.ensure_future(_sample(pid, peak, stop))
+    started = time.perf_counter()
+    visits = await asyncio.gather(*(visit(url, seed + i, think_time, ramp_up * i / sessions)
+                                    for i in range(sessions)))
+    wall = time.perf_counter() - started
+    stop.set()
+    await sampler
+    cpu = process_usage(pid)[1] - cpu_started
+
+    reruns = [elapsed for timings, _ in visits for elapsed in timings.values()]
+    errors = [error for _, error in visits if error]
+    return {
+        'sessions': sessions,
+        'reruns': len(reruns),
+        'errors': len(errors),
+        'first_error': errors[0] if errors else None,
+        'wall_s': round(wall, 3),
+        'reruns_per_s': round(len(reruns) / wall, 2),
+        'rerun_latency': _percentiles_ms(reruns),
+        'step_latency': {name: _percentiles_ms([timings[name] for timings, _ in visits if name in timings])
+                         for name in STEPS},
+        'rss_idle_mb': round(idle_rss, 1),
+        'rss_peak_mb': round(peak[0], 1),
+        'rss_per_session_mb': round((peak[0] - idle_rss) / sessions, 2),
+        'cpu_s': round(cpu, 2),
+        'cpu_per_session_s': round(cpu / sessions, 3),
+        'cpu_utilization': round(cpu / wall, 2),
+    }
+
+
+# Each session count runs against its own fresh server process, so memory
+# from one level doesn't carry into the next. The dataset's snapshot and
+# partitions on disk are shared, as on a machine running several replicas.
+def run_load_test(rows=DEFAULT_ROWS, session_counts=DEFAULT_SESSIONS, think_time=0.0, ramp_up=0.0,
+                  warmup=True, seed=0):
+    report = {'rows': rows, 'think_time_s': think_time, 'ramp_up_s': ramp_up, 'cpu_count': os.cpu_count(),
+              'levels': []}
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "resources.csv")
+        synthetic_resources(rows).to_csv(path, index=False)
+        for sessions in session_counts:
+            server, url = start_server(path, os.path.join(workdir, "cache"))
+            try:
+                level = asyncio.run(_run_level(url, server.pid, sessions, think_time, ramp_up, warmup, seed))
+            finally:
+                server.terminate()
+                try:
+                    server.wait(10)
+                except subprocess.TimeoutExpired:
+                    server.kill()
+            report['levels'].append(level)
+            latency = level['rerun_latency']
+            print(f"  {sessions:>5} sessions  p50 {latency.get('p50_ms', 0):9.1f} ms  "
+                  f"p95 {latency.get('p95_ms', 0):9.1f} ms  p99 {latency.get('p99_ms', 0):9.1f} ms  "
+                  f"RSS {level['rss_peak_mb']:8.1f} MB  CPU {level['cpu_per_session_s']:7.3f} s/session  "
+                  f"errors {level['errors']}", file=sys.stderr)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive concurrent simulated sessions through a local app server.")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="synthetic dataset size")
+    parser.add_argument("--sessions", type=int, nargs="+", default=DEFAULT_SESSIONS,
+                        help="concurrent session counts to test, one fresh server each")
+    parser.add_argument("--think-time", type=float, default=0.0,
+                        help="mean seconds a visitor pauses between steps (0: back to back)")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="seconds over which sessions arrive")
+    parser.add_argument("--no-warmup", action="store_true", help="measure a cold server, not a warm replica")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="write the report JSON here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    report = run_load_test(args.rows, args.sessions, args.think_time, args.ramp_up, not args.no_warmup, args.seed)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if any(level['errors'] for level in report['levels']):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
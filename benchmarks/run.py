@@ -0,0 +1,260 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_resources
+from navigator import settings
+from navigator.dataset import load_resources
+from navigator.distance import distances_from
+from navigator.inverted_index import InvertedIndex
+from navigator.map_layer import build_base_map, build_marker_layer, viewport_bounds
+from navigator.offline_package import build_offline_package
+from navigator.opening_hours import OpeningHours
+from navigator.search import SearchIndex
+from navigator.spatial_index import SpatialIndex
+
+RESULTS_FORMAT = 1
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+# Each benchmark repeats until it has run this long or this many times
+MIN_TIME = 1.0
+MAX_RUNS = 10
+# AppTest runs the whole app script and is slow on big directories
+APPTEST_MAX_ROWS = 100_000
+# A benchmark regresses when its median is this much slower than the
+# baseline's, and by more than the noise floor
+DEFAULT_THRESHOLD = 0.2
+NOISE_FLOOR = 0.002
+
+JOHANNESBURG = (-26.2041, 28.0473)
+SEARCH_QUERY = "legal aid soweto"
+# A fixed Monday morning, so open-now results are the same on every run
+OPEN_AT = datetime(2024, 5, 6, 7, 0)
+APP_BENCHMARKS = {'app_first_run': None, 'app_cards_with_location': JOHANNESBURG, 'app_rerun_warm': JOHANNESBURG}
+PAGES = ["Resource Finder", "Emergency Contacts", "Safety Planning", "Offline Access"]
+APPTEST_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "apptest_app.py")
+
+
+# Run fn until MIN_TIME or MAX_RUNS, returning timing stats in seconds
+def measure(fn, min_time=MIN_TIME, max_runs=MAX_RUNS):
+    times = []
+    started = time.perf_counter()
+    while len(times) < max_runs and (not times or time.perf_counter() - started < min_time):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return {'median_s': statistics.median(times), 'min_s': min(times), 'max_s': max(times), 'runs': len(times)}
+
+
+def _render_map(resources, zoom=10):
+    base_map = build_base_map(JOHANNESBURG)
+    layer, markers = build_marker_layer(resources, viewport_bounds(JOHANNESBURG, zoom, 1200, 400), zoom)
+    base_map.add_child(layer)
+    base_map.get_root().render()
+    return markers
+
+
+# The hot paths of one Resource Finder query, on a dataset of n rows
+def library_benchmarks(resources, path, min_time, only=None):
+    results = {}
+
+    def run(name, fn):
+        if only and name not in only:
+            return
+        results[name] = measure(fn, min_time)
+        print(f"  {name:<30} {results[name]['median_s'] * 1000:10.2f} ms", file=sys.stderr)
+
+    run('load_csv', lambda: load_resources(path))
+    run('index_spatial', lambda: SpatialIndex.from_resources(resources))
+    run('index_filters', lambda: InvertedIndex(resources))
+    run('index_search', lambda: SearchIndex(resources))
+    run('index_hours', lambda: OpeningHours(resources))
+
+    spatial = SpatialIndex.from_resources(resources)
+    filters = InvertedIndex(resources)
+    search = SearchIndex(resources)
+    hours = OpeningHours(resources)
+    latitudes = resources['latitude'].to_numpy()
+    longitudes = resources['longitude'].to_numpy()
+
+    def filter_type_distance():
+        positions, distances = spatial.within(JOHANNESBURG[0], JOHANNESBURG[1], 20)
+        keep = filters.mask('Shelter', ['Counseling'], ['Zulu'])[positions]
+        return positions[keep], distances[keep]
+
+    run('filter_type_distance', filter_type_distance)
+    run('filter_no_location', lambda: filters.positions('Legal Aid', ['Legal Assistance']))
+    run('filter_open_within', lambda: hours.mask(OPEN_AT, 2))
+    run('distance_all_rows', lambda: distances_from(JOHANNESBURG, latitudes, longitudes))
+    run('search_ranked', lambda: search.search(SEARCH_QUERY, candidates=np.arange(len(resources))))
+
+    positions, distances = spatial.within(JOHANNESBURG[0], JOHANNESBURG[1], 100)
+    nearby = resources.iloc[positions].assign(distance=distances)
+    run('map_build_render', lambda: _render_map(nearby))
+    run('offline_package', lambda: build_offline_package(resources))
+    return results
+
+
+# Whole-app reruns through streamlit.testing: a cold first run (load and
+# index the dataset), then a run with a location set that draws the map and
+# the first page of result cards, then the same run again warm
+def app_benchmarks(path, cache_dir):
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    settings.DATASET_PATH = path
+    settings.CACHE_DIR = cache_dir
+    settings.SNAPSHOT_DIR = os.path.join(cache_dir, "snapshots")
+    settings.AVAILABILITY_DB = os.path.join(cache_dir, "availability.sqlite3")
+    st.cache_resource.clear()
+    st.cache_data.clear()
+    results = {}
+    at = AppTest.from_file(APPTEST_SCRIPT, default_timeout=600)
+    for name, location in APP_BENCHMARKS.items():
+        if location:
+            at.session_state.geolocation = location
+        t0 = time.perf_counter()
+        at.run()
+        elapsed = time.perf_counter() - t0
+        if at.exception:
+            raise RuntimeError(f"{name} failed: {at.exception[0].value}")
+        results[name] = {'median_s': elapsed, 'min_s': elapsed, 'max_s': elapsed, 'runs': 1}
+        print(f"  {name:<30} {elapsed * 1000:10.2f} ms", file=sys.stderr)
+    return results
+
+
+# First run of each page in a fresh interpreter, the cost a visitor pays when
+# a new server process serves them: module imports, dataset load and indexes
+# for the pages that need them, and rendering
+COLD_START_SNIPPET = """
+import sys, time
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=600)
+started = time.perf_counter()
+at.run()
+print(time.perf_counter() - started)
+sys.exit(1 if at.exception else 0)
+"""
+
+
+def cold_start_benchmarks(path, cache_dir):
+    results = {}
+    for page in PAGES:
+        env = dict(os.environ, NAVIGATOR_BENCH_PAGE=page, NAVIGATOR_DATASET=path, NAVIGATOR_CACHE_DIR=cache_dir)
+        process = subprocess.run([sys.executable, "-c", COLD_START_SNIPPET, APPTEST_SCRIPT], env=env,
+                                 capture_output=True, text=True)
+        if process.returncode:
+            raise RuntimeError(f"cold start of {page} failed: {process.stderr[-2000:]}")
+        elapsed = float(process.stdout.split()[-1])
+        name = "cold_start_" + page.lower().replace(" ", "_")
+        results[name] = {'median_s': elapsed, 'min_s': elapsed, 'max_s': elapsed, 'runs': 1}
+        print(f"  {name:<30} {elapsed * 1000:10.2f} ms", file=sys.stderr)
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=settings.BASE_DIR).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'commit': commit,
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def run_benchmarks(sizes, min_time=MIN_TIME, apptest_max_rows=APPTEST_MAX_ROWS, only=None):
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            print(f"{size} rows", file=sys.stderr)
+            resources = synthetic_resources(size)
+            path = os.path.join(workdir, f"resources_{size}.csv")
+            resources.to_csv(path, index=False)
+            resources = load_resources(path)
+            timings = library_benchmarks(resources, path, min_time, only)
+            if size <= apptest_max_rows and (not only or set(only) & set(APP_BENCHMARKS)):
+                timings.update(app_benchmarks(path, os.path.join(workdir, f"cache_{size}")))
+            if size <= apptest_max_rows and (not only or any(name.startswith("cold_start_") for name in only)):
+                timings.update(cold_start_benchmarks(path, os.path.join(workdir, f"cache_{size}")))
+            if only:
+                timings = {name: stats for name, stats in timings.items() if name in only}
+            results[str(size)] = timings
+    return {'format': RESULTS_FORMAT, 'environment': environment(), 'results': results}
+
+
+# Benchmarks slower than the baseline by more than threshold, as
+# (size, name, baseline median, current median)
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    regressions = []
+    for size, timings in current['results'].items():
+        for name, stats in timings.items():
+            before = baseline['results'].get(size, {}).get(name)
+            if before is None:
+                continue
+            now, then = stats['median_s'], before['median_s']
+            if now > then * (1 + threshold) and now - then > NOISE_FLOOR:
+                regressions.append((size, name, then, now))
+    return regressions
+
+
+def print_comparison(current, baseline, threshold):
+    regressions = {(size, name) for size, name, _, _ in compare(current, baseline, threshold)}
+    print(f"{'rows':>9}  {'benchmark':<30} {'baseline ms':>12} {'current ms':>12} {'change':>8}", file=sys.stderr)
+    for size, timings in current['results'].items():
+        for name, stats in timings.items():
+            before = baseline['results'].get(size, {}).get(name)
+            if before is None:
+                continue
+            then, now = before['median_s'], stats['median_s']
+            flag = "  REGRESSION" if (size, name) in regressions else ""
+            print(f"{size:>9}  {name:<30} {then * 1000:12.2f} {now * 1000:12.2f} {(now / then - 1) * 100:+7.1f}%{flag}", file=sys.stderr)
+    return len(regressions)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the resource query and rendering paths.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="dataset sizes in rows")
+    parser.add_argument("--only", nargs="+", help="benchmark names to keep")
+    parser.add_argument("--min-time", type=float, default=MIN_TIME, help="seconds to spend per benchmark")
+    parser.add_argument("--apptest-max-rows", type=int, default=APPTEST_MAX_ROWS,
+                        help="largest dataset to run the whole app on")
+    parser.add_argument("-o", "--output", help="write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", help="results JSON to compare against; exits 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown against the baseline, as a fraction")
+    args = parser.parse_args(argv)
+
+    current = run_benchmarks(args.sizes, args.min_time, args.apptest_max_rows, args.only)
+    text = json.dumps(current, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if print_comparison(current, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from benchmarks.run import APPTEST_SCRIPT, JOHANNESBURG
+from benchmarks.synthetic import synthetic_resources
+from navigator import settings
+
+DEFAULT_ROWS = 100_000
+DEFAULT_SESSIONS = 8
+
+
+def _rss_mb():
+    try:
+        with open("/proc/self/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+# Open `sessions` Resource Finder sessions side by side, each with a location
+# set so filters, map and cards run, and record the memory held after each.
+# With private=True every session loads and indexes its own copy of the
+# dataset, as sessions did before the shared snapshot.
+def measure_sessions(path, cache_dir, sessions, private=False):
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    from navigator import dataset, snapshot
+
+    settings.DATASET_PATH = path
+    settings.CACHE_DIR = cache_dir
+    settings.SNAPSHOT_DIR = os.path.join(cache_dir, "snapshots")
+    settings.AVAILABILITY_DB = os.path.join(cache_dir, "availability.sqlite3")
+    load_snapshot = snapshot.load_snapshot
+    if private:
+        snapshot.load_snapshot = lambda path=None, directory=None: dataset.load_resources(path)
+    st.cache_resource.clear()
+    try:
+        apps, traced, rss = [], [], []
+        tracemalloc.start()
+        for _ in range(sessions):
+            if private:
+                st.cache_resource.clear()
+            at = AppTest.from_file(APPTEST_SCRIPT, default_timeout=600)
+            at.run()
+            at.session_state.geolocation = JOHANNESBURG
+            at.run()
+            if at.exception:
+                raise RuntimeError(at.exception[0].value)
+            apps.append(at)
+            gc.collect()
+            traced.append(tracemalloc.get_traced_memory()[0])
+            rss.append(_rss_mb())
+        tracemalloc.stop()
+    finally:
+        snapshot.load_snapshot = load_snapshot
+        st.cache_resource.clear()
+    per_session = (traced[-1] - traced[0]) / max(1, sessions - 1)
+    return {
+        'sessions': sessions,
+        'first_session_mb': round(traced[0] / 1024 / 1024, 2),
+        'per_session_mb': round(per_session / 1024 / 1024, 2),
+        'total_mb': round(traced[-1] / 1024 / 1024, 2),
+        'rss_mb': rss,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure memory held per Streamlit session.")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="synthetic dataset size")
+    parser.add_argument("--sessions", type=int, default=DEFAULT_SESSIONS, help="concurrent sessions to open")
+    parser.add_argument("--mode", choices=["shared", "private", "both"], default="both",
+                        help="shared snapshot, a private copy per session (the old behaviour), or both")
+    args = parser.parse_args(argv)
+
+    report = {'rows': args.rows}
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, "resources.csv")
+        synthetic_resources(args.rows).to_csv(path, index=False)
+        for mode in (["private", "shared"] if args.mode == "both" else [args.mode]):
+            report[mode] = measure_sessions(path, os.path.join(workdir, f"cache_{mode}"), args.sessions,
+                                            private=mode == "private")
+            print(f"{mode:>8}: {report[mode]['per_session_mb']:.2f} MB per session, "
+                  f"{report[mode]['total_mb']:.2f} MB for {args.sessions}", file=sys.stderr)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+from navigator.dataset import COLUMNS
+from navigator.gazetteer import load_gazetteer
+
+# How strongly resources concentrate around each kind of place, and how far
+# (in degrees) they spread from its centre
+KIND_WEIGHT = {"city": 12.0, "town": 3.0, "suburb": 2.0}
+KIND_SPREAD = {"city": 0.12, "town": 0.05, "suburb": 0.02}
+
+TYPES = ['Shelter', 'Legal Aid', 'Counseling', 'Medical']
+TYPE_SHARE = [0.35, 0.2, 0.25, 0.2]
+NAME_PREFIXES = ['Hope', 'Safe Haven', 'New Beginnings', 'Ubuntu', 'Thuthuzela', 'Siyakhana', 'Lerato',
+                 'Masimanyane', 'Ikhaya', 'Rise', 'Khanya', 'Sinethemba']
+NAME_SUFFIXES = {'Shelter': ['Shelter', 'Refuge', 'Safe House', "Women's Centre"],
+                 'Legal Aid': ['Legal Clinic', 'Law Centre', 'Paralegal Office', 'Justice Desk'],
+                 'Counseling': ['Counselling Centre', 'Trauma Support', 'Wellness Centre', 'Support Group'],
+                 'Medical': ['Care Centre', 'Clinic', 'Health Centre', 'Hospital Unit']}
+SERVICES = {'Shelter': ['emergency shelter', 'counseling', 'childcare', 'job training', 'transport to court'],
+            'Legal Aid': ['free legal representation', 'protection orders', 'court accompaniment', 'paralegal advice'],
+            'Counseling': ['trauma counselling', 'support group', 'family therapy', 'youth counselling'],
+            'Medical': ['medical examination', 'PEP', 'HIV testing', 'forensic care', 'clinic referrals']}
+LANGUAGES = ['English', 'Zulu', 'Xhosa', 'Afrikaans', 'Sotho', 'Tswana', 'Pedi', 'Tsonga', 'Venda', 'Swati']
+HOURS = ['24/7', '24/7', '08:00-17:00 Mon-Fri', '09:00-16:00 Mon-Fri', '08:00-13:00 Sat',
+         '07:30-16:30 Mon-Fri', 'By appointment']
+COMBINATIONS = 50
+STREETS = ['Main Rd', 'Church St', 'Long St', 'Voortrekker Rd', 'Nelson Mandela Dr', 'Market St', 'Station Rd']
+
+
+# A reproducible resource directory of n rows, shaped like real partner data:
+# clustered around South African places, realistic mixes of types, services,
+# languages and hours, and missing capacities for non-shelters
+def synthetic_resources(n, seed=0):
+    rng = np.random.default_rng(seed)
+    places = load_gazetteer().places
+    weights = np.array([KIND_WEIGHT.get(place.kind, 1.0) for place in places])
+    chosen = rng.choice(len(places), size=n, p=weights / weights.sum())
+    centres = np.array([place.coordinates for place in places])[chosen]
+    spread = np.array([KIND_SPREAD.get(place.kind, 0.05) for place in places])[chosen]
+    latitudes = np.round(centres[:, 0] + rng.normal(0, 1, n) * spread, 6)
+    longitudes = np.round(centres[:, 1] + rng.normal(0, 1, n) * spread, 6)
+    place_names = np.array([place.name for place in places], dtype=object)[chosen]
+
+    types = rng.choice(TYPES, size=n, p=TYPE_SHARE)
+    prefixes = rng.choice(NAME_PREFIXES, size=n)
+    suffix_picks = rng.integers(0, 4, size=n)
+    names = [f"{prefix} {NAME_SUFFIXES[rtype][pick]} {place}"
+             for prefix, rtype, pick, place in zip(prefixes, types, suffix_picks, place_names)]
+    addresses = [f"{number} {street}, {place}"
+                 for number, street, place in zip(rng.integers(1, 999, size=n), rng.choice(STREETS, size=n), place_names)]
+    phones = [f"0{area} {a:03d} {b:04d}" for area, a, b in
+              zip(rng.choice([11, 12, 21, 31, 41, 51, 800], size=n), rng.integers(0, 1000, size=n),
+                  rng.integers(0, 10000, size=n))]
+
+    # Partner directories repeat the same service and language lists a lot,
+    # so rows draw from a pool of combinations
+    services = np.empty(n, dtype=object)
+    for rtype in TYPES:
+        pool = [", ".join(rng.choice(SERVICES[rtype], size=rng.integers(1, 4), replace=False))
+                for _ in range(COMBINATIONS)]
+        rows = np.flatnonzero(types == rtype)
+        services[rows] = np.array(pool, dtype=object)[rng.integers(0, COMBINATIONS, size=len(rows))]
+    pool = [", ".join(['English'] + list(rng.choice(LANGUAGES[1:], size=rng.integers(0, 3), replace=False)))
+            for _ in range(COMBINATIONS)]
+    languages = np.array(pool, dtype=object)[rng.integers(0, COMBINATIONS, size=n)]
+
+    capacity = pd.array(rng.integers(5, 80, size=n), dtype="Int64")
+    capacity[types != 'Shelter'] = pd.NA
+    resources = pd.DataFrame({
+        'name': names, 'type': types, 'address': addresses, 'phone': phones,
+        'hours': rng.choice(HOURS, size=n), 'capacity': capacity,
+        'latitude': latitudes, 'longitude': longitudes,
+        'services': services, 'languages': languages,
+    })
+    return resources[COLUMNS]
@@ -0,0 +1,2 @@
+# Core logic for the SafePath Navigator Streamlit app (app.py).
+# Keep this module free of imports so pages only pay for what they use.
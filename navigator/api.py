@@ -0,0 +1,219 @@
+import argparse
+import asyncio
+import json
+import math
+import sys
+import urllib.parse
+
+from navigator import settings
+from navigator.engine import QueryEngine
+from navigator.opening_hours import local_time
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+MAX_RADIUS_KM = 500
+MAX_OPENS_WITHIN_HOURS = 7 * 24
+# Request line plus headers; queries never need more
+MAX_HEAD_BYTES = 8192
+IDLE_TIMEOUT = 30
+# Compact output for gateways on slow links
+COMPACT_FIELDS = ['id', 'name', 'type', 'address', 'phone', 'hours', 'latitude', 'longitude', 'services',
+                  'languages']
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           408: "Request Timeout", 431: "Request Header Fields Too Large", 500: "Internal Server Error"}
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _number(params, name, cast=float, low=None, high=None):
+    raw = params.get(name, [None])[-1]
+    if raw in (None, ""):
+        return None
+    try:
+        value = cast(raw)
+    except ValueError:
+        raise BadRequest(f"{name} must be a number")
+    # float() accepts "nan" and "inf", which no range check catches
+    if not math.isfinite(value):
+        raise BadRequest(f"{name} must be a number")
+    if (low is not None and value < low) or (high is not None and value > high):
+        raise BadRequest(f"{name} must be between {low} and {high}")
+    return value
+
+
+# Query string of /v1/resources to QueryEngine.query() arguments plus the
+# page limit. Services and languages may repeat or be comma separated.
+# open_now=1 keeps resources open now, opens_within=N those open now or
+# opening within N hours.
+def parse_resource_query(query_string):
+    params = urllib.parse.parse_qs(query_string)
+    lat = _number(params, "lat", low=-90, high=90)
+    lon = _number(params, "lon", low=-180, high=180)
+    if (lat is None) != (lon is None):
+        raise BadRequest("lat and lon must be given together")
+
+    def listed(name):
+        return [item.strip() for value in params.get(name, []) for item in value.split(",") if item.strip()]
+
+    arguments = {
+        'location': (lat, lon) if lat is not None else None,
+        'radius_km': _number(params, "radius_km", low=0, high=MAX_RADIUS_KM),
+        'nearest': _number(params, "k", int, low=1, high=MAX_LIMIT),
+        'resource_type': params.get("type", [None])[-1],
+        'services': listed("service"),
+        'languages': listed("language"),
+        'text': params.get("q", [None])[-1],
+        'open_within': _number(params, "opens_within", low=0, high=MAX_OPENS_WITHIN_HOURS) or 0,
+    }
+    open_now = params.get("open_now", [""])[-1].lower() in ("1", "true", "yes")
+    arguments['open_at'] = local_time() if open_now or arguments['open_within'] else None
+    if arguments['location'] is None and (arguments['radius_km'] is not None or arguments['nearest']):
+        raise BadRequest("radius_km and k need lat and lon")
+    if arguments['location'] is not None and arguments['radius_km'] is None and not arguments['nearest']:
+        arguments['radius_km'] = settings.API_DEFAULT_RADIUS_KM
+    limit = _number(params, "limit", int, low=1, high=MAX_LIMIT) or DEFAULT_LIMIT
+    return arguments, limit
+
+
+# Case-insensitive lookup of the type, service and language names an
+# InvertedIndex knows, per query argument
+def name_lookup(filters):
+    return {
+        'resource_type': {rtype.casefold(): rtype for rtype in filters.type_bits},
+        'services': {tag.casefold(): tag for tag in filters.service_bits},
+        'languages': {language.casefold(): language for language in filters.language_bits},
+    }
+
+
+# Type, service and language names as the engine spells them, whatever
+# case the caller used; SMS and USSD gateways pass on what people type.
+# Unknown names are kept and simply match nothing.
+def canonical_names(arguments, names):
+    if arguments['resource_type']:
+        arguments['resource_type'] = names['resource_type'].get(arguments['resource_type'].casefold(),
+                                                                 arguments['resource_type'])
+    for field in ('services', 'languages'):
+        arguments[field] = [names[field].get(value.casefold(), value) for value in arguments[field]]
+    return arguments
+
+
+# Routes requests to one shared QueryEngine. Queries run on the event loop:
+# they are short numpy operations over shared read-only indexes, so a thread
+# hand-off would cost more than it saves.
+class QueryAPI:
+    def __init__(self, engine):
+        self.engine = engine
+        self.names = name_lookup(engine.filters)
+        self.requests = 0
+
+    def handle(self, method, target):
+        if method not in ("GET", "HEAD"):
+            return 405, {'error': "only GET is supported"}
+        url = urllib.parse.urlsplit(target)
+        if url.path == "/health":
+            return 200, {'status': "ok", 'version': self.engine.version, 'resources': len(self.engine)}
+        if url.path != "/v1/resources":
+            return 404, {'error': "not found"}
+        try:
+            arguments, limit = parse_resource_query(url.query)
+        except BadRequest as e:
+            return 400, {'error': str(e)}
+        positions, distances = self.engine.query(**canonical_names(arguments, self.names))
+        return 200, {
+            'version': self.engine.version,
+            'total': len(positions),
+            'results': self.engine.records(positions[:limit], distances[:limit] if distances is not None else None,
+                                           COMPACT_FIELDS),
+        }
+
+    # HTTP/1.1 with keep-alive, enough for gateways and load balancers
+    async def serve_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), IDLE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    await self._respond(writer, 431, {'error': "request too large"}, keep_alive=False)
+                    return
+                lines = head.decode("latin-1").split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ")
+                except ValueError:
+                    await self._respond(writer, 400, {'error': "malformed request line"}, keep_alive=False)
+                    return
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length") or 0)
+                    if length < 0:
+                        raise ValueError(length)
+                except ValueError:
+                    await self._respond(writer, 400, {'error': "invalid Content-Length"}, keep_alive=False)
+                    return
+                if length:
+                    await reader.readexactly(length)
+
+                self.requests += 1
+                try:
+                    status, payload = self.handle(method, target)
+                except Exception as e:
+                    status, payload = 500, {'error': type(e).__name__}
+                connection = headers.get("connection", "").lower()
+                keep_alive = connection != "close" and (version == "HTTP/1.1" or connection == "keep-alive")
+                await self._respond(writer, status, payload, keep_alive, head_only=method == "HEAD")
+                if not keep_alive:
+                    return
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive, head_only=False):
+        body = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        writer.write((
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Access-Control-Allow-Origin: *\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        ).encode("latin-1") + (b"" if head_only else body))
+        await writer.drain()
+
+    async def start(self, host, port):
+        return await asyncio.start_server(self.serve_connection, host, port, limit=MAX_HEAD_BYTES)
+
+
+async def serve(engine, host, port):
+    server = await QueryAPI(engine).start(host, port)
+    print(f"Serving {len(engine)} resources on http://{host}:{port}/v1/resources", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve resource queries as JSON over HTTP.")
+    parser.add_argument("--host", default=settings.API_HOST)
+    parser.add_argument("--port", type=int, default=settings.API_PORT)
+    parser.add_argument("--dataset", default=settings.DATASET_PATH, help="resource dataset CSV")
+    args = parser.parse_args(argv)
+
+    from navigator.snapshot import load_snapshot
+    from navigator.sync import SnapshotStore
+
+    # Maps the same snapshot as the app's server processes, and reports the
+    # same dataset version as their offline packages
+    resources = load_snapshot(args.dataset)
+    engine = QueryEngine(resources, SnapshotStore(settings.SYNC_STATE).publish(resources))
+    try:
+        asyncio.run(serve(engine, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import numpy as np
+
+from navigator import settings
+from navigator.opening_hours import local_time
+
+STATUSES = ("open", "full", "closed")
+# Changes the feed remembers individually; a session further behind than
+# this gets the full availability table instead
+FEED_HISTORY = 10000
+# How often the feed looks for new changes, in seconds
+POLL_INTERVAL = 1.0
+# Changes kept in the database by prune()
+KEEP_CHANGES = 100000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS availability (
+    resource_id TEXT PRIMARY KEY,
+    beds_available INTEGER,
+    status TEXT,
+    updated_at REAL NOT NULL,
+    seq INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    resource_id TEXT NOT NULL,
+    beds_available INTEGER,
+    status TEXT,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def _validate(beds_available, status):
+    if beds_available is not None and (int(beds_available) != beds_available or beds_available < 0):
+        raise ValueError(f"beds_available must be a whole number of at least 0, not {beds_available!r}")
+    if status is not None and status not in STATUSES:
+        raise ValueError(f"status must be one of {', '.join(STATUSES)}, not {status!r}")
+
+
+# Live shelter availability (free beds, open/full/closed) shared by every
+# server process through one SQLite database in WAL mode, so readers never
+# block the shelters writing to it. Every update is also appended to a
+# change feed numbered by `seq`, which readers tail to learn what changed.
+class AvailabilityStore:
+    def __init__(self, path=None, timeout=30.0, clock=time.time):
+        self.path = path or settings.AVAILABILITY_DB
+        self.timeout = timeout
+        self.clock = clock
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    # One connection per thread; sqlite3 connections can't be shared
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # Durable at checkpoints rather than every commit; a crash can
+            # only lose the last moments of updates, never corrupt the file
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    # Apply updates given as (resource_id, beds_available, status) in one
+    # transaction. None leaves that field as it was. Returns the last seq.
+    def update_many(self, updates):
+        updates = list(updates)
+        for _, beds_available, status in updates:
+            _validate(beds_available, status)
+        connection = self._connection()
+        now = self.clock()
+        # Take the write lock up front so the seq order is the commit order
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            seq = None
+            for resource_id, beds_available, status in updates:
+                connection.execute(
+                    "INSERT INTO availability (resource_id, beds_available, status, updated_at, seq) "
+                    "VALUES (?, ?, ?, ?, 0) ON CONFLICT (resource_id) DO UPDATE SET "
+                    "beds_available = COALESCE(excluded.beds_available, beds_available), "
+                    "status = COALESCE(excluded.status, status), updated_at = excluded.updated_at",
+                    (str(resource_id), beds_available, status, now))
+                # The feed records the merged state, so readers never need
+                # earlier changes to interpret a later one
+                seq = connection.execute(
+                    "INSERT INTO changes (resource_id, beds_available, status, updated_at) "
+                    "SELECT resource_id, beds_available, status, updated_at FROM availability "
+                    "WHERE resource_id = ?", (str(resource_id),)).lastrowid
+                connection.execute("UPDATE availability SET seq = ? WHERE resource_id = ?", (seq, str(resource_id)))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return seq
+
+    def update(self, resource_id, beds_available=None, status=None):
+        return self.update_many([(resource_id, beds_available, status)])
+
+    # Changes after seq, oldest first, as (seq, resource_id, beds, status, updated_at)
+    def changes_since(self, seq, limit=FEED_HISTORY):
+        return self._connection().execute(
+            "SELECT seq, resource_id, beds_available, status, updated_at FROM changes "
+            "WHERE seq > ? ORDER BY seq LIMIT ?", (seq, limit)).fetchall()
+
+    # Current availability of every resource that has any, and the seq it
+    # is current as of, read in one consistent snapshot
+    def snapshot(self):
+        connection = self._connection()
+        connection.execute("BEGIN")
+        try:
+            seq = connection.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+            rows = connection.execute(
+                "SELECT seq, resource_id, beds_available, status, updated_at FROM availability").fetchall()
+        finally:
+            connection.execute("COMMIT")
+        return seq, rows
+
+    # Drop all but the newest `keep` changes; readers that far behind
+    # reload the snapshot
+    def prune(self, keep=KEEP_CHANGES):
+        connection = self._connection()
+        return connection.execute(
+            "DELETE FROM changes WHERE seq <= (SELECT MAX(seq) FROM changes) - ?", (keep,)).rowcount
+
+
+# One reader per server process tailing the store's change feed, so
+# sessions never query SQLite themselves: each asks the feed what changed
+# since the seq it last saw and gets back just those resources.
+class AvailabilityFeed:
+    def __init__(self, store, interval=POLL_INTERVAL, history=FEED_HISTORY):
+        self.store = store
+        self.interval = interval
+        self.seq = 0
+        self.current = {}
+        self.recent = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._reload()
+
+    def _reload(self):
+        seq, rows = self.store.snapshot()
+        with self._lock:
+            self.current = {row[1]: row for row in rows}
+            self.recent.clear()
+            self.seq = seq
+
+    # Read new changes from the store; returns how many there were
+    def poll(self):
+        rows = self.store.changes_since(self.seq, self.recent.maxlen)
+        if rows and rows[0][0] != self.seq + 1:
+            # Pruned past our position; start again from the snapshot
+            self._reload()
+            return self.poll()
+        with self._lock:
+            for row in rows:
+                self.current[row[1]] = row
+                self.recent.append((row[0], row[1]))
+            if rows:
+                self.seq = rows[-1][0]
+        if len(rows) == self.recent.maxlen:
+            return len(rows) + self.poll()
+        return len(rows)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="availability-feed", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except sqlite3.Error as e:
+                print(f"Availability feed: {e}", file=sys.stderr)
+
+    # (seq, rows, full) bringing a reader at seq up to date: rows are the
+    # current state of resources changed since, or of every resource when
+    # full is True because seq is older than the feed remembers
+    def since(self, seq):
+        with self._lock:
+            if seq == self.seq:
+                return self.seq, [], False
+            if seq > self.seq or not self.recent or self.recent[0][0] > seq + 1:
+                return self.seq, list(self.current.values()), True
+            changed = set()
+            for change_seq, resource_id in reversed(self.recent):
+                if change_seq <= seq:
+                    break
+                changed.add(resource_id)
+            return self.seq, [self.current[resource_id] for resource_id in changed], False
+
+
+# Availability of one session's resources by row position. Updating from
+# the feed patches only the rows that changed; the resources themselves
+# and their indexes are left alone. positions maps resource ids to rows
+# and is only read, so sessions can share one.
+class LiveAvailability:
+    def __init__(self, positions, size):
+        self.positions = positions
+        self.seq = 0
+        self.beds = np.full(size, -1, dtype=np.int32)
+        self.status = np.full(size, -1, dtype=np.int8)
+        self.updated_at = np.full(size, np.nan)
+
+    # Bring up to date from the feed; returns the number of rows patched
+    def update(self, feed):
+        seq, rows, full = feed.since(self.seq)
+        if full:
+            self.beds[:] = -1
+            self.status[:] = -1
+            self.updated_at[:] = np.nan
+        patched = 0
+        for _, resource_id, beds_available, status, updated_at in rows:
+            position = self.positions.get(resource_id)
+            if position is None:
+                continue
+            self.beds[position] = -1 if beds_available is None else beds_available
+            self.status[position] = -1 if status is None else STATUSES.index(status)
+            self.updated_at[position] = updated_at
+            patched += 1
+        self.seq = seq
+        return patched
+
+    # Short description such as "Open, 3 beds free (updated 14:05)", or None
+    def describe(self, position):
+        if np.isnan(self.updated_at[position]):
+            return None
+        parts = []
+        if self.status[position] >= 0:
+            parts.append(STATUSES[self.status[position]].capitalize())
+        if self.beds[position] >= 0:
+            beds = int(self.beds[position])
+            parts.append(f"{beds} bed{'' if beds == 1 else 's'} free")
+        updated = _local(self.updated_at[position]).strftime("%H:%M")
+        return f"{', '.join(parts)} (updated {updated})"
+
+
+# A stored timestamp in the directory's time zone (settings.TIMEZONE), not the
+# server's, like opening hours
+def _local(timestamp):
+    return local_time(datetime.fromtimestamp(float(timestamp), timezone.utc))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Update live shelter availability.")
+    parser.add_argument("--db", default=settings.AVAILABILITY_DB, help="availability database")
+    commands = parser.add_subparsers(dest="command", required=True)
+    update = commands.add_parser("set", help="set a resource's free beds and/or status")
+    update.add_argument("resource_id")
+    update.add_argument("--beds", type=int, help="number of free beds")
+    update.add_argument("--status", choices=STATUSES)
+    commands.add_parser("show", help="list current availability")
+    prune = commands.add_parser("prune", help="drop old entries from the change feed")
+    prune.add_argument("--keep", type=int, default=KEEP_CHANGES)
+    args = parser.parse_args(argv)
+
+    store = AvailabilityStore(args.db)
+    if args.command == "set":
+        if args.beds is None and args.status is None:
+            parser.error("give --beds and/or --status")
+        print(f"seq {store.update(args.resource_id, args.beds, args.status)}")
+    elif args.command == "show":
+        seq, rows = store.snapshot()
+        for _, resource_id, beds_available, status, updated_at in sorted(rows, key=lambda row: row[1]):
+            print(f"{resource_id}\t{status or '-'}\t{'-' if beds_available is None else beds_available}\t"
+                  f"{_local(updated_at):%Y-%m-%d %H:%M:%S}")
+        print(f"{len(rows)} resources as of seq {seq}", file=sys.stderr)
+    else:
+        print(f"{store.prune(args.keep)} changes removed", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from navigator import settings
+
+# Nominatim's usage policy allows one request per second
+DEFAULT_RATE_LIMIT = 1.0
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_BACKOFF = 0.5
+MAX_BACKOFF = 30.0
+# HTTP statuses worth retrying; anything else is a permanent failure
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+FOUND = "found"
+NOT_FOUND = "not_found"
+FAILED = "failed"
+
+
+# Spaces requests at least 1/rate seconds apart. Reservations are made under
+# a thread lock, so one limiter holds across event loops and threads.
+class RateLimiter:
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    async def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+# One limiter per provider host, shared by every geocoder in the process
+def provider_limiter(base_url, rate):
+    host = urllib.parse.urlsplit(base_url).netloc
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None or limiter.interval != (1.0 / rate if rate > 0 else 0.0):
+            limiter = _limiters[host] = RateLimiter(rate)
+        return limiter
+
+
+# Append-only JSON lines file of finished lookups, so an interrupted run
+# resumes where it stopped. Failed lookups are retried on the next run.
+class Checkpoint:
+    def __init__(self, path):
+        self.path = path
+        self.results = {}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut short by the interruption
+                    self.results[entry["q"]] = entry
+        self._file = None
+
+    def done(self, query):
+        entry = self.results.get(query)
+        return entry is not None and entry["status"] != FAILED
+
+    def coordinates(self, query):
+        entry = self.results.get(query)
+        return tuple(entry["coords"]) if entry and entry["coords"] else None
+
+    def record(self, query, status, coords):
+        entry = {"q": query, "status": status, "coords": list(coords) if coords else None}
+        self.results[query] = entry
+        if self.path:
+            if self._file is None:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class GeocodeError(Exception):
+    def __init__(self, message, retryable=True, retry_after=None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+# Resolves many addresses concurrently against a Nominatim-compatible
+# endpoint: at most `concurrency` requests in flight, never faster than
+# `rate_limit` per second for the provider, retries with exponential backoff
+# and jitter, and a checkpoint file for resuming. Places in the gazetteer and
+# answers already in the shared geocode cache never reach the network.
+class BatchGeocoder:
+    def __init__(self, base_url=settings.GEOCODER_URL, rate_limit=DEFAULT_RATE_LIMIT, concurrency=DEFAULT_CONCURRENCY,
+                 max_retries=DEFAULT_MAX_RETRIES, backoff=DEFAULT_BACKOFF, timeout=settings.GEOCODER_TIMEOUT,
+                 checkpoint_path=None, cache=None, gazetteer=None, user_agent=settings.GEOCODER_USER_AGENT,
+                 country_codes="za"):
+        self.base_url = base_url
+        self.limiter = provider_limiter(base_url, rate_limit)
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.checkpoint_path = checkpoint_path
+        self.cache = cache
+        self.gazetteer = gazetteer
+        self.user_agent = user_agent
+        self.country_codes = country_codes
+        self.requests = 0
+
+    def _request(self, query):
+        params = {"q": query, "format": "json", "limit": 1}
+        if self.country_codes:
+            params["countrycodes"] = self.country_codes
+        request = urllib.request.Request(f"{self.base_url}?{urllib.parse.urlencode(params)}",
+                                         headers={"User-Agent": self.user_agent})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                results = json.loads(response.read().decode("utf-8"))
+        except urllib.error.HTTPError as e:
+            retry_after = e.headers.get("Retry-After") if e.headers else None
+            raise GeocodeError(f"HTTP {e.code}", retryable=e.code in RETRYABLE_STATUSES,
+                               retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None)
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            raise GeocodeError(str(e))
+        if results:
+            return (float(results[0]["lat"]), float(results[0]["lon"]))
+        return None
+
+    async def _geocode_one(self, query):
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire()
+            self.requests += 1
+            try:
+                coords = await asyncio.to_thread(self._request, query)
+                return (FOUND if coords else NOT_FOUND), coords
+            except GeocodeError as e:
+                if not e.retryable or attempt == self.max_retries:
+                    return FAILED, None
+                delay = e.retry_after or min(self.backoff * 2 ** attempt, MAX_BACKOFF) * (0.5 + random.random())
+                await asyncio.sleep(delay)
+        return FAILED, None
+
+    # (known, coords) from the gazetteer or the cache, without any request.
+    # A cached None is a known answer: the place was not found recently. A
+    # cached failed request is not, and is looked up again.
+    def _local(self, query):
+        if self.gazetteer is not None:
+            place = self.gazetteer.lookup(query)
+            if place:
+                return True, place.coordinates
+        if self.cache is not None:
+            try:
+                return True, self.cache.get(query, failures=False)
+            except KeyError:
+                pass
+        return False, None
+
+    # {address: (lat, lon) or None} for every address; progress(done, total)
+    # is called as lookups finish. Callers making many batches (one per
+    # ingest chunk) pass one open checkpoint to all of them; otherwise one is
+    # read from checkpoint_path for this batch alone.
+    async def geocode_all(self, addresses, progress=None, checkpoint=None):
+        owned = checkpoint is None
+        if owned:
+            checkpoint = Checkpoint(self.checkpoint_path)
+        addresses = list(dict.fromkeys(addresses))
+        results = {}
+        pending = []
+        for address in addresses:
+            if checkpoint.done(address):
+                results[address] = checkpoint.coordinates(address)
+                continue
+            known, coords = self._local(address)
+            if known:
+                results[address] = coords
+            else:
+                pending.append(address)
+
+        total, done = len(addresses), len(addresses) - len(pending)
+        queue = asyncio.Queue()
+        for address in pending:
+            queue.put_nowait(address)
+
+        async def worker():
+            nonlocal done
+            while True:
+                try:
+                    address = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                status, coords = await self._geocode_one(address)
+                checkpoint.record(address, status, coords)
+                # Failures are only kept in the checkpoint, which retries them
+                if self.cache is not None and status != FAILED:
+                    self.cache.put(address, coords)
+                results[address] = coords
+                done += 1
+                if progress:
+                    progress(done, total)
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(pending)))))
+        finally:
+            if owned:
+                checkpoint.close()
+        return results
+
+    # Blocking entry point, usable wherever a synchronous geocoder is expected
+    def resolve_many(self, addresses, progress=None, checkpoint=None):
+        return asyncio.run(self.geocode_all(addresses, progress, checkpoint))
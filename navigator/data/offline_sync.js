@@ -0,0 +1,278 @@
+// Applies dataset updates (deltas from navigator.sync.SnapshotStore) to the
+// offline page's resource index and checks them against the server's
+// checksum. Inlined into the offline page by navigator.offline_package; the
+// same file is loaded by the tests under Node.
+var OfflineSync = (function () {
+    "use strict";
+
+    var DIGEST_MODULUS = Math.pow(2, 48);
+    var DIGEST_LENGTH = 12;
+    var GEOHASH_PRECISION = 4;
+    var GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz";
+    var COORDINATE_SCALE = 1e5;
+    var MAX_LANGUAGES = 31;
+    var TERM_COLUMNS = ["name", "services", "address"];
+    var LIST_SEPARATORS = /,|;|\/|\band\b|&/;
+    var WORD = /[0-9a-z_\u00c0-\u024f]+/g;
+
+    // SHA-256 of a string's UTF-8 bytes, as hex
+    var K = [];
+    (function () {
+        var found = 0, candidate = 2;
+        while (found < 64) {
+            var prime = true;
+            for (var d = 2; d * d <= candidate; d++) if (candidate % d === 0) { prime = false; break; }
+            if (prime) K[found++] = (Math.pow(candidate, 1 / 3) % 1) * 4294967296 | 0;
+            candidate++;
+        }
+    })();
+    var H0 = [0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a, 0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19];
+
+    function utf8(text) {
+        return new TextEncoder().encode(text);
+    }
+
+    function sha256(text) {
+        var bytes = utf8(text), length = bytes.length;
+        var blocks = ((length + 8) >> 6) + 1, words = new Int32Array(blocks * 16);
+        for (var i = 0; i < length; i++) words[i >> 2] |= bytes[i] << (24 - (i % 4) * 8);
+        words[length >> 2] |= 0x80 << (24 - (length % 4) * 8);
+        words[blocks * 16 - 1] = length * 8;
+        words[blocks * 16 - 2] = Math.floor(length / 536870912);
+        var h = H0.slice(), w = new Int32Array(64);
+        for (var block = 0; block < blocks; block++) {
+            for (var t = 0; t < 64; t++) {
+                if (t < 16) {
+                    w[t] = words[block * 16 + t];
+                } else {
+                    var x = w[t - 15], y = w[t - 2];
+                    var s0 = ((x >>> 7) | (x << 25)) ^ ((x >>> 18) | (x << 14)) ^ (x >>> 3);
+                    var s1 = ((y >>> 17) | (y << 15)) ^ ((y >>> 19) | (y << 13)) ^ (y >>> 10);
+                    w[t] = (w[t - 16] + s0 + w[t - 7] + s1) | 0;
+                }
+            }
+            var a = h[0], b = h[1], c = h[2], d = h[3], e = h[4], f = h[5], g = h[6], k = h[7];
+            for (t = 0; t < 64; t++) {
+                var S1 = ((e >>> 6) | (e << 26)) ^ ((e >>> 11) | (e << 21)) ^ ((e >>> 25) | (e << 7));
+                var t1 = (k + S1 + ((e & f) ^ (~e & g)) + K[t] + w[t]) | 0;
+                var S0 = ((a >>> 2) | (a << 30)) ^ ((a >>> 13) | (a << 19)) ^ ((a >>> 22) | (a << 10));
+                var t2 = (S0 + ((a & b) ^ (a & c) ^ (b & c))) | 0;
+                k = g; g = f; f = e; e = (d + t1) | 0; d = c; c = b; b = a; a = (t1 + t2) | 0;
+            }
+            h[0] = (h[0] + a) | 0; h[1] = (h[1] + b) | 0; h[2] = (h[2] + c) | 0; h[3] = (h[3] + d) | 0;
+            h[4] = (h[4] + e) | 0; h[5] = (h[5] + f) | 0; h[6] = (h[6] + g) | 0; h[7] = (h[7] + k) | 0;
+        }
+        return h.map(function (word) { return ("0000000" + (word >>> 0).toString(16)).slice(-8); }).join("");
+    }
+
+    // Numbers as Python's json.dumps writes them; the server writes whole
+    // floats as integers, since JavaScript can't tell 28.0 from 28
+    function pythonNumber(x) {
+        if (Number.isInteger(x) && Math.abs(x) < 1e16) return String(x);
+        var sign = x < 0 ? "-" : "", parts = Math.abs(x).toExponential().split("e");
+        var digits = parts[0].replace(".", ""), exponent = Number(parts[1]), point = exponent + 1;
+        if (point > -4 && point <= 16) {
+            if (point <= 0) return sign + "0." + new Array(1 - point).join("0") + digits;
+            if (point >= digits.length) return sign + digits + new Array(point - digits.length + 1).join("0") + ".0";
+            return sign + digits.slice(0, point) + "." + digits.slice(point);
+        }
+        var mantissa = digits.length > 1 ? digits[0] + "." + digits.slice(1) : digits;
+        return sign + mantissa + "e" + (exponent < 0 ? "-" : "+") + ("0" + Math.abs(exponent)).slice(-2);
+    }
+
+    // Strings as Python's json.dumps writes them with ensure_ascii
+    function pythonString(text) {
+        return JSON.stringify(text).replace(/[\u007f-\uffff]/g, function (c) {
+            return "\\u" + ("000" + c.charCodeAt(0).toString(16)).slice(-4);
+        });
+    }
+
+    // A record as navigator.sync writes it for checksums: sorted keys, no
+    // spaces, ASCII only
+    function canonicalJSON(value) {
+        if (value === null || value === undefined) return "null";
+        if (typeof value === "number") return pythonNumber(value);
+        if (typeof value === "boolean") return value ? "true" : "false";
+        if (typeof value === "string") return pythonString(value);
+        if (Array.isArray(value)) return "[" + value.map(canonicalJSON).join(",") + "]";
+        return "{" + Object.keys(value).sort().map(function (key) {
+            return pythonString(key) + ":" + canonicalJSON(value[key]);
+        }).join(",") + "}";
+    }
+
+    function recordDigest(id, record) {
+        return sha256(id + "\n" + canonicalJSON(record)).slice(0, DIGEST_LENGTH);
+    }
+
+    // Checksum of a set of records from their digests: their sum, so it can
+    // be updated record by record
+    function combine(digests) {
+        var total = 0;
+        Object.keys(digests).forEach(function (id) {
+            total = (total + parseInt(digests[id], 16)) % DIGEST_MODULUS;
+        });
+        return ("00000000000" + total.toString(16)).slice(-DIGEST_LENGTH);
+    }
+
+    function geohash(lat, lon) {
+        var latRange = [-90, 90], lonRange = [-180, 180], code = 0;
+        for (var bit = 0; bit < GEOHASH_PRECISION * 5; bit++) {
+            var range = bit % 2 === 0 ? lonRange : latRange, value = bit % 2 === 0 ? lon : lat;
+            var middle = (range[0] + range[1]) / 2, upper = value >= middle;
+            range[upper ? 0 : 1] = middle;
+            code = code * 2 + (upper ? 1 : 0);
+        }
+        var text = "";
+        for (var i = GEOHASH_PRECISION - 1; i >= 0; i--) text += GEOHASH_ALPHABET[Math.floor(code / Math.pow(32, i)) % 32];
+        return text;
+    }
+
+    // Coordinates rounded as numpy.round does: scaled, halves to even
+    function round(value) {
+        var scaled = value * COORDINATE_SCALE, rounded = Math.round(scaled);
+        if (rounded - scaled === 0.5 && rounded % 2 !== 0) rounded -= 1;
+        return rounded / COORDINATE_SCALE;
+    }
+
+    function titleCase(text) {
+        return text.replace(/[a-z\u00c0-\u024f]+/gi, function (word) {
+            return word[0].toUpperCase() + word.slice(1).toLowerCase();
+        });
+    }
+
+    // Languages of a record as the server's InvertedIndex names them
+    function languagesOf(text) {
+        if (typeof text !== "string") return [];
+        return text.toLowerCase().split(LIST_SEPARATORS).map(function (part) {
+            return part.split(/\s+/).filter(Boolean).join(" ");
+        }).filter(Boolean).map(titleCase);
+    }
+
+    // The index as one object per row, with term strings instead of ids
+    function rowsOf(index) {
+        var rows = index.rows, list = [];
+        for (var i = 0; i < rows.id.length; i++) {
+            list.push({
+                id: rows.id[i], name: rows.name[i], type: index.types[rows.type[i]], address: rows.address[i],
+                phone: rows.phone[i], hours: rows.hours[i], capacity: rows.capacity[i], services: rows.services[i],
+                lat: rows.lat[i], lon: rows.lon[i], svc: rows.svc[i], lang: rows.lang[i], digest: rows.digest[i],
+                terms: rows.terms[i].map(function (term) { return index.terms[term]; })
+            });
+        }
+        return list;
+    }
+
+    function rowFromRecord(id, record, index, digest) {
+        var patterns = index.service_patterns.map(function (pattern) { return new RegExp(pattern); });
+        var serviceText = ((record.services || "") + " " + (record.hours || "")).toLowerCase();
+        var svc = 0, lang = 0;
+        patterns.forEach(function (pattern, bit) { if (pattern.test(serviceText)) svc |= 1 << bit; });
+        languagesOf(record.languages).forEach(function (language) {
+            var bit = index.languages.indexOf(language);
+            if (bit < 0 && index.languages.length < MAX_LANGUAGES) bit = index.languages.push(language) - 1;
+            if (bit >= 0) lang |= 1 << bit;
+        });
+        var text = TERM_COLUMNS.map(function (column) { return record[column] || ""; }).join(" ").toLowerCase();
+        var terms = {};
+        (text.match(WORD) || []).forEach(function (term) { terms[term] = true; });
+        return {
+            id: id, name: record.name, type: record.type || "", address: record.address, phone: record.phone,
+            hours: record.hours, capacity: record.capacity === undefined ? null : record.capacity,
+            services: record.services, lat: round(record.latitude), lon: round(record.longitude),
+            svc: svc, lang: lang, digest: digest, terms: Object.keys(terms)
+        };
+    }
+
+    // Rows back into the columnar index: sorted by geohash bucket, then name,
+    // with fresh bucket bounds and term list
+    function indexOf(rows, index, version, checksum) {
+        rows.forEach(function (row) { row.bucket = geohash(row.lat, row.lon); });
+        rows.sort(function (a, b) {
+            if (a.bucket !== b.bucket) return a.bucket < b.bucket ? -1 : 1;
+            var an = String(a.name), bn = String(b.name);
+            return an < bn ? -1 : an > bn ? 1 : 0;
+        });
+        var termSet = {};
+        rows.forEach(function (row) { row.terms.forEach(function (term) { termSet[term] = true; }); });
+        var terms = Object.keys(termSet).sort(), termIds = {};
+        terms.forEach(function (term, i) { termIds[term] = i; });
+        var types = index.types.slice(), typeCodes = {};
+        types.forEach(function (type, code) { typeCodes[type] = code; });
+
+        var columns = { id: [], name: [], type: [], address: [], phone: [], hours: [], capacity: [], services: [],
+                        lat: [], lon: [], svc: [], lang: [], terms: [], digest: [] };
+        var buckets = [];
+        rows.forEach(function (row, i) {
+            if (!(row.type in typeCodes)) typeCodes[row.type] = types.push(row.type) - 1;
+            ["id", "name", "address", "phone", "hours", "capacity", "services", "lat", "lon", "svc", "lang", "digest"]
+                .forEach(function (column) { columns[column].push(row[column]); });
+            columns.type.push(typeCodes[row.type]);
+            columns.terms.push(row.terms.map(function (term) { return termIds[term]; }).sort(function (a, b) { return a - b; }));
+            var bucket = buckets[buckets.length - 1];
+            if (!bucket || bucket[0] !== row.bucket) {
+                buckets.push([row.bucket, i, i + 1, row.lat, row.lon, row.lat, row.lon]);
+            } else {
+                bucket[2] = i + 1;
+                bucket[3] = Math.min(bucket[3], row.lat); bucket[4] = Math.min(bucket[4], row.lon);
+                bucket[5] = Math.max(bucket[5], row.lat); bucket[6] = Math.max(bucket[6], row.lon);
+            }
+        });
+        var result = {};
+        Object.keys(index).forEach(function (key) { result[key] = index[key]; });
+        result.version = version;
+        result.checksum = checksum;
+        result.types = types;
+        result.terms = terms;
+        result.buckets = buckets;
+        result.rows = columns;
+        return result;
+    }
+
+    // A new index with the delta applied. Throws, leaving the index as it
+    // was, when the delta doesn't start at or before the index's version or
+    // the result wouldn't match the server's checksum.
+    function applyDelta(index, delta) {
+        if (!delta || !delta.added || !delta.changed || !delta.removed) throw new Error("This is not an update file.");
+        if (index.version !== null && index.version !== undefined) {
+            if (delta.to_version <= index.version) throw new Error("This page is already at version " + index.version + ".");
+            if (delta.from_version > index.version) {
+                throw new Error("This update starts at version " + delta.from_version + " but this page has version " +
+                                index.version + ". Download the full package instead.");
+            }
+        }
+        if (!index.rows.digest) throw new Error("This page is too old to update. Download the full package instead.");
+        var digests = {}, touched = {};
+        index.rows.id.forEach(function (id, i) { digests[id] = index.rows.digest[i]; });
+        delta.removed.forEach(function (id) { delete digests[id]; touched[id] = true; });
+        var updates = [];
+        [delta.added, delta.changed].forEach(function (records) {
+            Object.keys(records).forEach(function (id) {
+                digests[id] = recordDigest(id, records[id]);
+                touched[id] = true;
+                updates.push([id, records[id], digests[id]]);
+            });
+        });
+        if (combine(digests) !== delta.checksum) {
+            throw new Error("The update doesn't match this page's resources. Download the full package instead.");
+        }
+
+        var languages = index.languages.slice(), rowIndex = Object.create(index);
+        rowIndex.languages = languages;
+        var rows = rowsOf(index).filter(function (row) { return !touched[row.id]; });
+        updates.forEach(function (update) { rows.push(rowFromRecord(update[0], update[1], rowIndex, update[2])); });
+        var result = indexOf(rows, index, delta.to_version, delta.checksum);
+        result.languages = languages;
+        return result;
+    }
+
+    return {
+        sha256: sha256,
+        canonicalJSON: canonicalJSON,
+        recordDigest: recordDigest,
+        combine: combine,
+        geohash: geohash,
+        applyDelta: applyDelta
+    };
+})();
+
+if (typeof module !== "undefined" && module.exports) module.exports = OfflineSync;
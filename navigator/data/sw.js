@@ -0,0 +1,62 @@
+// Service worker of the installable offline app, generated by navigator.pwa
+"use strict";
+
+var CACHE_PREFIX = "gbv-navigator-";
+// Named after the dataset version and the precache list, so every update
+// gets a fresh cache and older ones are dropped once it takes over
+var CACHE_NAME = CACHE_PREFIX + "__CACHE_VERSION__";
+// [path, revision] of every file the app needs, relative to this script
+var PRECACHE = __PRECACHE__;
+
+// Cache entries are keyed by path and revision; requests are matched by path
+function cacheKey(entry) {
+    return new URL(entry[0] + "?rev=" + entry[1], self.location).href;
+}
+var KEYS = {};
+PRECACHE.forEach(function (entry) {
+    KEYS[new URL(entry[0], self.location).pathname] = cacheKey(entry);
+});
+KEYS[new URL("./", self.location).pathname] = KEYS[new URL("index.html", self.location).pathname];
+
+// Files whose revision is already held by an older cache are copied from it,
+// so an update only downloads what changed
+self.addEventListener("install", function (event) {
+    event.waitUntil(caches.open(CACHE_NAME).then(function (cache) {
+        return Promise.all(PRECACHE.map(function (entry) {
+            var key = cacheKey(entry);
+            return caches.match(key).then(function (cached) {
+                if (cached) return cache.put(key, cached);
+                return fetch(key, { cache: "no-cache" }).then(function (response) {
+                    if (!response.ok) throw new Error(entry[0] + ": HTTP " + response.status);
+                    return cache.put(key, response);
+                });
+            });
+        }));
+    }).then(function () {
+        return self.skipWaiting();
+    }));
+});
+
+self.addEventListener("activate", function (event) {
+    event.waitUntil(caches.keys().then(function (names) {
+        return Promise.all(names.filter(function (name) {
+            return name.lastIndexOf(CACHE_PREFIX, 0) === 0 && name !== CACHE_NAME;
+        }).map(function (name) {
+            return caches.delete(name);
+        }));
+    }).then(function () {
+        return self.clients.claim();
+    }));
+});
+
+// Precached files come from the cache, falling back to the network
+self.addEventListener("fetch", function (event) {
+    var url = new URL(event.request.url);
+    var key = event.request.method === "GET" && url.origin === self.location.origin && KEYS[url.pathname];
+    if (!key) return;
+    event.respondWith(caches.open(CACHE_NAME).then(function (cache) {
+        return cache.match(key);
+    }).then(function (cached) {
+        return cached || fetch(event.request);
+    }));
+});
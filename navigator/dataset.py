@@ -0,0 +1,72 @@
+import os
+
+import pandas as pd
+
+from navigator import settings
+
+# Columns of the resource dataset, in file order
+COLUMNS = ['name', 'type', 'address', 'phone', 'hours', 'capacity',
+           'latitude', 'longitude', 'services', 'languages']
+TEXT_COLUMNS = ['name', 'type', 'address', 'phone', 'hours', 'services', 'languages']
+
+
+# Built-in sample directory, used until an ingested dataset exists
+def sample_resources():
+    data = {
+        'name': [
+            'Hope Shelter', 
+            'Safe Haven Women\'s Center',
+            'New Beginnings Refuge',
+            'Legal Aid GBV Division',
+            'Survivor Support Legal Clinic'
+        ],
+        'type': ['Shelter', 'Shelter', 'Shelter', 'Legal Aid', 'Legal Aid'],
+        'address': [
+            '123 Safety St, Johannesburg',
+            '456 Protection Ave, Cape Town',
+            '789 Refuge Rd, Durban',
+            '101 Justice Blvd, Pretoria',
+            '202 Empowerment Way, Port Elizabeth'
+        ],
+        'phone': [
+            '0800 555 123',
+            '0800 555 456',
+            '0800 555 789',
+            '0800 555 101',
+            '0800 555 202'
+        ],
+        'hours': ['24/7', '24/7', '24/7', '9am-5pm Mon-Fri', '8:30am-4:30pm Mon-Fri'],
+        'capacity': [20, 35, 15, 'N/A', 'N/A'],
+        'latitude': [-26.2041, -33.9249, -29.8587, -25.7479, -33.9608],
+        'longitude': [28.0473, 18.4241, 31.0218, 28.2293, 25.6022],
+        'services': [
+            'Emergency shelter, counseling, medical assistance',
+            'Shelter, childcare, job training',
+            'Short-term housing, legal referrals',
+            'Free legal representation, protection orders',
+            'Legal counseling, court accompaniment'
+        ],
+        'languages': ['English, Zulu', 'English, Afrikaans', 'English, Zulu', 'English', 'English, Xhosa']
+    }
+    return pd.DataFrame(data)
+
+
+
+# Load resources data: the ingested dataset when there is one, otherwise the
+# sample directory. Capacity is a nullable integer either way.
+def load_resources(path=None):
+    path = path or settings.DATASET_PATH
+    if os.path.exists(path):
+        resources = pd.read_csv(path, dtype={column: "string" for column in TEXT_COLUMNS},
+                                keep_default_na=False, na_values={'capacity': ['', 'N/A']})
+    else:
+        resources = sample_resources()
+    resources['capacity'] = pd.to_numeric(resources['capacity'], errors='coerce').astype('Int64')
+    return resources
+
+
+# Capacity as shown on a resource card
+def format_capacity(capacity):
+    if pd.isna(capacity):
+        return "N/A"
+    return f"{capacity} people"
@@ -0,0 +1,124 @@
+import numpy as np
+
+# WGS-84 ellipsoid, the same model geopy's geodesic() uses by default
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = (1 - WGS84_F) * WGS84_A
+MEAN_EARTH_RADIUS_KM = 6371.0088
+
+VINCENTY_TOLERANCE = 1e-12
+VINCENTY_MAX_ITERATIONS = 200
+# Upper bound on pair count evaluated at once, to keep temporaries small
+MAX_PAIRS_PER_CHUNK = 1_000_000
+
+# Accuracy: geodesic_km() is Vincenty's inverse formula on WGS-84 and agrees
+# with geopy.distance.geodesic to well under 1 metre, so it gives the same
+# nearest-first ordering for any resources more than a metre apart. The rare
+# nearly antipodal pairs where Vincenty does not converge (never the case
+# within Southern Africa) fall back to haversine, which is within 0.5%.
+
+
+# Great-circle distance on a sphere of mean Earth radius, in km
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    h = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * MEAN_EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+# Ellipsoidal distance in km; arguments broadcast like any NumPy expression
+def geodesic_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(*(np.asarray(v, dtype=np.float64) for v in (lat1, lon1, lat2, lon2)))
+    if lat1.size == 0:
+        return np.zeros(lat1.shape)
+
+    L = np.radians(lon2 - lon1)
+    U1 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat1)))
+    U2 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat2)))
+    sinU1, cosU1 = np.sin(U1), np.cos(U1)
+    sinU2, cosU2 = np.sin(U2), np.cos(U2)
+
+    lam = L.copy()
+    converged = np.zeros(L.shape, dtype=bool)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for _ in range(VINCENTY_MAX_ITERATIONS):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(cosU2 * sin_lam, cosU1 * sinU2 - sinU1 * cosU2 * cos_lam)
+            cos_sigma = sinU1 * sinU2 + cosU1 * cosU2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cosU1 * cosU2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            # Equatorial lines have cos2_alpha == 0
+            cos_2sigma_m = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2 * sinU1 * sinU2 / cos2_alpha)
+            C = WGS84_F / 16 * cos2_alpha * (4 + WGS84_F * (4 - 3 * cos2_alpha))
+            lam_next = L + (1 - C) * WGS84_F * sin_alpha * (
+                sigma + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2))
+            )
+            step = np.abs(lam_next - lam)
+            lam = np.where(converged, lam, lam_next)
+            converged |= step < VINCENTY_TOLERANCE
+            if converged.all():
+                break
+
+        sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+        sin_sigma = np.hypot(cosU2 * sin_lam, cosU1 * sinU2 - sinU1 * cosU2 * cos_lam)
+        cos_sigma = sinU1 * sinU2 + cosU1 * cosU2 * cos_lam
+        sigma = np.arctan2(sin_sigma, cos_sigma)
+        sin_alpha = np.where(sin_sigma == 0, 0.0, cosU1 * cosU2 * sin_lam / sin_sigma)
+        cos2_alpha = 1 - sin_alpha ** 2
+        cos_2sigma_m = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2 * sinU1 * sinU2 / cos2_alpha)
+
+        u2 = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+        A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+        B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+        delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+            - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)
+        ))
+        meters = WGS84_B * A * (sigma - delta_sigma)
+
+    km = np.array(meters / 1000.0, dtype=np.float64)
+    if not converged.all():
+        fallback = ~converged
+        km[fallback] = haversine_km(lat1[fallback], lon1[fallback], lat2[fallback], lon2[fallback])
+    return km[()] if km.ndim == 0 else km
+
+
+# Distances in km from one (lat, lon) origin to arrays of coordinates
+def distances_from(origin, latitudes, longitudes):
+    return geodesic_km(origin[0], origin[1], latitudes, longitudes)
+
+
+# origins x targets distance matrix in km; both are sequences of (lat, lon)
+def distance_matrix(origins, targets):
+    origins = np.asarray(origins, dtype=np.float64).reshape(-1, 2)
+    targets = np.asarray(targets, dtype=np.float64).reshape(-1, 2)
+    matrix = np.empty((len(origins), len(targets)), dtype=np.float64)
+    for start, stop in _origin_chunks(len(origins), len(targets)):
+        matrix[start:stop] = geodesic_km(
+            origins[start:stop, 0, None], origins[start:stop, 1, None],
+            targets[None, :, 0], targets[None, :, 1]
+        )
+    return matrix
+
+
+# For every origin, the position of the closest target and its distance in km.
+# Used for bulk reports such as the nearest shelter to every clinic.
+def nearest(origins, targets):
+    origins = np.asarray(origins, dtype=np.float64).reshape(-1, 2)
+    targets = np.asarray(targets, dtype=np.float64).reshape(-1, 2)
+    positions = np.full(len(origins), -1, dtype=np.int64)
+    distances = np.full(len(origins), np.inf)
+    if len(targets) == 0:
+        return positions, distances
+    for start, stop in _origin_chunks(len(origins), len(targets)):
+        block = distance_matrix(origins[start:stop], targets)
+        positions[start:stop] = block.argmin(axis=1)
+        distances[start:stop] = block[np.arange(stop - start), positions[start:stop]]
+    return positions, distances
+
+
+def _origin_chunks(n_origins, n_targets):
+    rows = max(1, MAX_PAIRS_PER_CHUNK // max(n_targets, 1))
+    for start in range(0, n_origins, rows):
+        yield start, min(start + rows, n_origins)
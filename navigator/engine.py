@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+
+from navigator.dataset import load_resources
+from navigator.inverted_index import InvertedIndex
+from navigator.opening_hours import OpeningHours
+from navigator.search import SearchIndex
+from navigator.spatial_index import SpatialIndex
+from navigator.sync import resource_ids
+
+# Fields returned for each result by records()
+RECORD_FIELDS = ['id', 'name', 'type', 'address', 'phone', 'hours', 'capacity',
+                 'latitude', 'longitude', 'services', 'languages']
+
+
+# Type/service/language filters, radius and nearest-k search, and ranked text
+# search over one loaded dataset. The indexes are built once and only read
+# afterwards, so a single engine can serve any number of callers at once
+# (Streamlit sessions, API requests). Queries return positions into
+# `resources` and distances, never copies of the rows.
+class QueryEngine:
+    def __init__(self, resources, version=None):
+        self.resources = resources
+        self.version = version
+        self.spatial = SpatialIndex.from_resources(resources)
+        self.filters = InvertedIndex(resources)
+        self.hours = OpeningHours(resources)
+        self.search_index = SearchIndex(resources)
+        self._columns = None
+        self._positions = None
+
+    @classmethod
+    def load(cls, path=None, version=None):
+        return cls(load_resources(path), version)
+
+    def __len__(self):
+        return len(self.resources)
+
+    # Resources at the given positions, in that order
+    def rows(self, positions):
+        return self.resources.iloc[positions]
+
+    # Positions matching the filters and their distances from location
+    # (None without a location). With a location, radius_km limits the
+    # distance and nearest keeps only the k closest matches; results come
+    # nearest first. With open_at, only resources open at that time, or
+    # opening within open_within hours of it, are kept. stats, when given,
+    # receives the number of rows scanned.
+    def filter(self, location=None, radius_km=None, resource_type=None, services=(), languages=(),
+               nearest=None, stats=None, open_at=None, open_within=0):
+        mask = self.filters.mask(resource_type, services, languages)
+        if open_at is not None:
+            mask &= self.hours.mask(open_at, open_within)
+        if location is None:
+            if stats is not None:
+                stats['scanned'] = self.filters.size
+            return np.flatnonzero(mask), None
+
+        # Filters are applied before distances are computed, so only matching
+        # resources near the location cost a distance calculation
+        lat, lon = location
+        if nearest:
+            positions, distances = self.spatial.nearest(lat, lon, nearest, mask=mask)
+            if radius_km is not None:
+                keep = distances <= radius_km
+                positions, distances = positions[keep], distances[keep]
+        else:
+            positions, distances = self.spatial.within(lat, lon, radius_km if radius_km is not None else np.inf, mask)
+        if stats is not None:
+            stats['scanned'] = len(positions)
+        return positions, distances
+
+    # Reorder positions (and distances) by relevance to text, dropping those
+    # that don't match; equally relevant results stay nearest first
+    def search(self, text, positions, distances=None, limit=None):
+        hits, _ = self.search_index.search(text, candidates=positions, distances=distances, limit=limit)
+        return positions[hits], (distances[hits] if distances is not None else None)
+
+    # filter() followed by search() when there is text to rank by. With text,
+    # nearest keeps the k nearest of the matches, still in order of relevance,
+    # rather than searching only the k nearest resources.
+    def query(self, location=None, radius_km=None, resource_type=None, services=(), languages=(),
+              nearest=None, text=None, stats=None, open_at=None, open_within=0):
+        positions, distances = self.filter(location, radius_km, resource_type, services, languages,
+                                           None if text else nearest, stats, open_at, open_within)
+        if text:
+            positions, distances = self.search(text, positions, distances)
+            if nearest and distances is not None:
+                keep = np.sort(np.argsort(distances, kind="stable")[:nearest])
+                positions, distances = positions[keep], distances[keep]
+        return positions, distances
+
+    # Column values as plain Python lists (missing values as None), built on
+    # first use so records() never touches the DataFrame per request
+    def _column_values(self):
+        if self._columns is None:
+            columns = {'id': resource_ids(self.resources)}
+            for field in RECORD_FIELDS[1:]:
+                if field in self.resources.columns:
+                    values = self.resources[field].astype(object)
+                    columns[field] = values.where(pd.notna(values), None).tolist()
+            self._columns = columns
+        return self._columns
+
+    # Stable id of every resource, by position
+    def ids(self):
+        return self._column_values()['id']
+
+    # Position of every resource by id, built on first use and shared by
+    # every caller
+    def positions_by_id(self):
+        if self._positions is None:
+            self._positions = {resource_id: position for position, resource_id in enumerate(self.ids())}
+        return self._positions
+
+    # Results as dicts of RECORD_FIELDS, plus distance_km when known
+    def records(self, positions, distances=None, fields=RECORD_FIELDS):
+        columns = self._column_values()
+        fields = [field for field in fields if field in columns]
+        records = []
+        for i, position in enumerate(positions.tolist() if hasattr(positions, "tolist") else positions):
+            record = {field: columns[field][position] for field in fields}
+            if distances is not None:
+                record['distance_km'] = round(float(distances[i]), 2)
+            records.append(record)
+        return records
@@ -0,0 +1,129 @@
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from navigator.gazetteer import load_gazetteer
+
+# South Africa's rough bounding box, for made-up answers
+SA_BOUNDS = (-34.8, 16.5, -22.1, 32.9)
+
+
+# Local stand-in for Nominatim's /search endpoint, for tests and offline data
+# preparation. Addresses mentioning a gazetteer place resolve to it; other
+# addresses get stable made-up coordinates inside South Africa, except those
+# containing "nowhere", which are not found. Latency and a share of 503
+# responses can be injected to exercise retries.
+class FakeNominatim:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, failure_rate=0.0, seed=0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.gazetteer = load_gazetteer()
+        self.requests = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.request_times = []
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/search"
+
+    def answer(self, query):
+        if "nowhere" in query.casefold():
+            return []
+        place = self.gazetteer.lookup_address(query)
+        if place:
+            lat, lon = place.coordinates
+        else:
+            digest = hashlib.sha1(query.casefold().encode("utf-8")).digest()
+            south, west, north, east = SA_BOUNDS
+            lat = south + (north - south) * digest[0] / 255
+            lon = west + (east - west) * digest[1] / 255
+        return [{"lat": f"{lat:.6f}", "lon": f"{lon:.6f}", "display_name": query}]
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urllib.parse.urlsplit(self.path)
+                if url.path != "/search":
+                    self.send_error(404)
+                    return
+                with fake._lock:
+                    fake.requests += 1
+                    fake.in_flight += 1
+                    fake.max_in_flight = max(fake.max_in_flight, fake.in_flight)
+                    fake.request_times.append(time.monotonic())
+                    fail = fake.random.random() < fake.failure_rate
+                try:
+                    if fake.latency:
+                        time.sleep(fake.latency)
+                    if fail:
+                        with fake._lock:
+                            fake.failures += 1
+                        self.send_error(503)
+                        return
+                    query = urllib.parse.parse_qs(url.query).get("q", [""])[0]
+                    body = json.dumps(fake.answer(query)).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                finally:
+                    with fake._lock:
+                        fake.in_flight -= 1
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a local stand-in Nominatim server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of requests answered with 503")
+    args = parser.parse_args(argv)
+
+    fake = FakeNominatim(args.host, args.port, args.latency, args.failure_rate)
+    print(f"Fake Nominatim listening on {fake.url}")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fake.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
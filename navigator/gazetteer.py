@@ -0,0 +1,110 @@
+import csv
+import os
+import re
+from bisect import bisect_left
+from functools import lru_cache
+
+from navigator.geocoding import normalize_query
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "gazetteer.csv")
+
+# Suggestions list bigger places first
+KIND_RANK = {"city": 0, "town": 1, "suburb": 2}
+
+
+# A bundled place: town, suburb or city centroid
+class Place:
+    __slots__ = ("name", "aliases", "kind", "province", "postal_code", "latitude", "longitude")
+
+    def __init__(self, name, kind, province, postal_code, latitude, longitude, aliases=()):
+        self.name = name
+        self.aliases = tuple(aliases)
+        self.kind = kind
+        self.province = province
+        self.postal_code = postal_code
+        self.latitude = latitude
+        self.longitude = longitude
+
+    @property
+    def coordinates(self):
+        return (self.latitude, self.longitude)
+
+    @property
+    def label(self):
+        return f"{self.name}, {self.province}"
+
+
+# South African places searchable by name, alias and postal code without any
+# network access. Keys live in one sorted list, so exact lookups and prefix
+# scans are a binary search away.
+class Gazetteer:
+    def __init__(self, places):
+        self.places = list(places)
+        pairs = set()
+        for i, place in enumerate(self.places):
+            for name in (place.name,) + place.aliases:
+                pairs.add((normalize_query(name), i))
+            if place.postal_code:
+                pairs.add((place.postal_code, i))
+        pairs = sorted(pairs, key=lambda pair: (pair[0], KIND_RANK.get(self.places[pair[1]].kind, 3)))
+        self.keys = [key for key, _ in pairs]
+        self.place_ids = [i for _, i in pairs]
+
+    @classmethod
+    def from_csv(cls, path=GAZETTEER_PATH):
+        with open(path, encoding="utf-8", newline="") as f:
+            return cls(
+                Place(row["name"], row["kind"], row["province"], row["postal_code"],
+                      float(row["latitude"]), float(row["longitude"]),
+                      aliases=[alias for alias in row["aliases"].split("|") if alias])
+                for row in csv.DictReader(f)
+            )
+
+    def __len__(self):
+        return len(self.places)
+
+    # Exact match on a whole name, alias or postal code
+    def lookup(self, query):
+        key = normalize_query(query)
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            return self.places[self.place_ids[i]]
+        return None
+
+    # Best-effort match for a full address such as "12 Main Rd, Soweto, 1804":
+    # the first comma-separated part or postal code that is a known place
+    def lookup_address(self, address):
+        place = self.lookup(address)
+        if place:
+            return place
+        for part in str(address).split(","):
+            place = self.lookup(part)
+            if place:
+                return place
+        for code in re.findall(r"\b\d{4}\b", str(address)):
+            place = self.lookup(code)
+            if place:
+                return place
+        return None
+
+    # Typeahead: places whose name, alias or postal code starts with prefix
+    def suggest(self, prefix, limit=5):
+        key = normalize_query(prefix)
+        if not key:
+            return []
+        seen = set()
+        matches = []
+        i = bisect_left(self.keys, key)
+        while i < len(self.keys) and self.keys[i].startswith(key):
+            place_id = self.place_ids[i]
+            if place_id not in seen:
+                seen.add(place_id)
+                matches.append(self.places[place_id])
+            i += 1
+        matches.sort(key=lambda place: (KIND_RANK.get(place.kind, 3), place.name))
+        return matches[:limit]
+
+
+@lru_cache(maxsize=1)
+def load_gazetteer():
+    return Gazetteer.from_csv()
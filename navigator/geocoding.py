@@ -0,0 +1,209 @@
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from navigator import settings
+
+# How long answers are kept. Misses are kept for less time than hits, and
+# network failures for less still, so a flaky connection recovers quickly.
+FOUND_TTL = 30 * 24 * 3600
+NOT_FOUND_TTL = 3600
+FAILURE_TTL = 60
+MAX_ENTRIES = 5000
+# Minimum number of seconds between writes of the cache file
+SAVE_INTERVAL = 5
+
+_geolocator = None
+_geolocator_lock = threading.Lock()
+
+
+# Cache key for a free-text location: case, punctuation and spacing ignored
+def normalize_query(query):
+    return re.sub(r"[\W_]+", " ", str(query).casefold()).strip()
+
+
+# A geocoding request in progress; other callers asking for the same query
+# wait on it instead of starting their own.
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+# Geocoding results shared across sessions: normalized-query keys, TTL and
+# LRU eviction, single-flight requests and a JSON file so answers survive
+# restarts. None is a cached answer too (unknown place or failed request);
+# failures are marked so callers that retry them can skip them.
+class GeocodeCache:
+    def __init__(self, path=None, max_entries=MAX_ENTRIES, found_ttl=FOUND_TTL,
+                 not_found_ttl=NOT_FOUND_TTL, failure_ttl=FAILURE_TTL, clock=time.time):
+        self.path = path
+        self.max_entries = max_entries
+        self.found_ttl = found_ttl
+        self.not_found_ttl = not_found_ttl
+        self.failure_ttl = failure_ttl
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = 0.0
+        if path:
+            self._load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    # Cached coordinates for the query; raises KeyError when not cached, or
+    # when only a failed request is cached and failures aren't wanted
+    def get(self, query, failures=True):
+        key = normalize_query(query)
+        with self._lock:
+            return self._get_locked(key, failures)
+
+    def _get_locked(self, key, failures=True):
+        coords, expires_at, failed = self._entries[key]
+        if expires_at <= self.clock():
+            del self._entries[key]
+            raise KeyError(key)
+        if failed and not failures:
+            raise KeyError(key)
+        self._entries.move_to_end(key)
+        return coords
+
+    def put(self, query, coords, ttl=None, failed=False):
+        key = normalize_query(query)
+        if ttl is None:
+            ttl = self.failure_ttl if failed else self.found_ttl if coords else self.not_found_ttl
+        with self._lock:
+            self._put_locked(key, coords, ttl, failed)
+        self._maybe_save()
+
+    def _put_locked(self, key, coords, ttl, failed=False):
+        self._entries[key] = (tuple(coords) if coords else None, self.clock() + ttl, failed)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self._dirty = True
+
+    # Cached answer for the query, calling resolver(query) on a miss. Only one
+    # resolver call per normalized query is outstanding at any time.
+    def lookup(self, query, resolver):
+        key = normalize_query(query)
+        if not key:
+            return None
+        with self._lock:
+            try:
+                return self._get_locked(key)
+            except KeyError:
+                pass
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+        if not leader:
+            flight.done.wait()
+            return flight.result
+
+        try:
+            try:
+                coords = resolver(query)
+                ttl, failed = self.found_ttl if coords else self.not_found_ttl, False
+            except Exception:
+                coords, ttl, failed = None, self.failure_ttl, True
+            with self._lock:
+                self._put_locked(key, coords, ttl, failed)
+            flight.result = tuple(coords) if coords else None
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.done.set()
+        self._maybe_save()
+        return flight.result
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = self.clock()
+        # Files written before failures were marked have three fields
+        live = [(entry + [False])[:4] for entry in stored.get("entries", []) if entry[2] > now]
+        for key, coords, expires_at, failed in live[-self.max_entries:]:
+            self._entries[key] = (tuple(coords) if coords else None, expires_at, failed)
+
+    def _maybe_save(self):
+        if self.path and self._dirty and self.clock() - self._last_save >= SAVE_INTERVAL:
+            self.save()
+
+    # Write the cache file atomically so concurrent readers never see half a file
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            entries = [[key, list(coords) if coords else None, expires_at, failed]
+                       for key, (coords, expires_at, failed) in self._entries.items()]
+            self._dirty = False
+            self._last_save = self.clock()
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"entries": entries}, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+# One Nominatim client per process instead of one per call
+def _nominatim():
+    global _geolocator
+    with _geolocator_lock:
+        if _geolocator is None:
+            from geopy.geocoders import Nominatim
+            _geolocator = Nominatim(user_agent=settings.GEOCODER_USER_AGENT,
+                                    timeout=settings.GEOCODER_TIMEOUT)
+        return _geolocator
+
+
+# Ask Nominatim for an address. Returns None when the place is unknown and
+# lets network errors propagate so callers can tell the two apart.
+def geocode_with_nominatim(address):
+    location = _nominatim().geocode(address)
+    if location:
+        return (location.latitude, location.longitude)
+    return None
+
+
+# Get coordinates from address. Places in the bundled gazetteer resolve
+# locally; Nominatim is only asked about addresses it cannot place, and never
+# in offline mode. If Nominatim has no answer either, fall back to the town
+# or postal code mentioned in the address.
+def get_coordinates(address, cache=None, gazetteer=None, offline=False):
+    if gazetteer is not None:
+        place = gazetteer.lookup(address)
+        if place:
+            return place.coordinates
+
+    coords = None
+    if not offline:
+        if cache is not None:
+            coords = cache.lookup(address, geocode_with_nominatim)
+        else:
+            try:
+                coords = geocode_with_nominatim(address)
+            except Exception:
+                coords = None
+
+    if coords is None and gazetteer is not None:
+        place = gazetteer.lookup_address(address)
+        if place:
+            return place.coordinates
+    return coords
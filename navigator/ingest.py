@@ -0,0 +1,354 @@
+import argparse
+import hashlib
+import os
+import re
+import sys
+import tempfile
+from functools import lru_cache
+
+import pandas as pd
+
+from navigator import settings
+from navigator.dataset import COLUMNS
+from navigator.opening_hours import parse_hours
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# Header spellings seen in partner spreadsheets, mapped to dataset columns
+COLUMN_ALIASES = {
+    'name': ['name', 'organisation', 'organization', 'service name', 'facility', 'facility name'],
+    'type': ['type', 'category', 'service type', 'resource type'],
+    'address': ['address', 'physical address', 'street address', 'location'],
+    'phone': ['phone', 'telephone', 'tel', 'contact number', 'phone number', 'contact'],
+    'hours': ['hours', 'opening hours', 'operating hours', 'opening times'],
+    'capacity': ['capacity', 'beds', 'bed capacity', 'number of beds'],
+    'latitude': ['latitude', 'lat'],
+    'longitude': ['longitude', 'lng', 'lon', 'long'],
+    'services': ['services', 'services offered', 'service', 'offerings'],
+    'languages': ['languages', 'language', 'languages spoken', 'language(s)'],
+}
+_HEADER_LOOKUP = {alias: column for column, aliases in COLUMN_ALIASES.items() for alias in aliases}
+
+RESOURCE_TYPES = {
+    'Shelter': r"shelter|safe ?house|refuge|place of safety",
+    'Legal Aid': r"legal|law clinic|paralegal",
+    'Counseling': r"counsel|therap|psycho",
+    'Medical': r"medical|clinic|hospital|health|thuthuzela",
+}
+_TYPE_PATTERNS = {rtype: re.compile(pattern, re.IGNORECASE) for rtype, pattern in RESOURCE_TYPES.items()}
+
+# Hours written as "24 hours", "24hrs", "open 24/7"...
+_ALWAYS_OPEN = re.compile(r"^(open\s*)?(24\s*/\s*7|24\s*h(ou)?rs?(\s*a\s*day)?|24\s*hours?(\s*a\s*day)?|always open)$",
+                          re.IGNORECASE)
+_DAY_NAMES = {'monday': 'Mon', 'tuesday': 'Tue', 'wednesday': 'Wed', 'thursday': 'Thu', 'friday': 'Fri',
+              'saturday': 'Sat', 'sunday': 'Sun', 'tues': 'Tue', 'thurs': 'Thu', 'mon': 'Mon', 'tue': 'Tue',
+              'wed': 'Wed', 'thu': 'Thu', 'fri': 'Fri', 'sat': 'Sat', 'sun': 'Sun'}
+
+
+def _text(value):
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ""
+    return " ".join(str(value).split())
+
+
+def normalize_header(header):
+    key = " ".join(str(header).casefold().replace("_", " ").split())
+    return _HEADER_LOOKUP.get(key)
+
+
+# South African numbers as "0XX XXX XXXX" (or "0800 XXX XXX" for toll-free);
+# short codes such as 10111 are kept as they are
+@lru_cache(maxsize=4096)
+def normalize_phone(phone):
+    text = _text(phone)
+    digits = re.sub(r"\D", "", text)
+    # Spreadsheets storing numbers as numbers drop the leading zero
+    if isinstance(phone, int) and len(digits) == 9:
+        digits = "0" + digits
+    if digits.startswith("27") and len(digits) == 11:
+        digits = "0" + digits[2:]
+    if len(digits) == 10 and digits.startswith("0"):
+        if digits[:4] in ("0800", "0860", "0861"):
+            return f"{digits[:4]} {digits[4:7]} {digits[7:]}"
+        return f"{digits[:3]} {digits[3:6]} {digits[6:]}"
+    if 3 <= len(digits) <= 6 and digits == re.sub(r"\s", "", text):
+        return digits
+    return text
+
+
+# Number of people a resource can take, or None for 'N/A', blanks and text
+def normalize_capacity(capacity):
+    if isinstance(capacity, (int, float)) and not pd.isna(capacity):
+        return int(capacity)
+    match = re.search(r"\d+", _text(capacity))
+    return int(match.group()) if match else None
+
+
+@lru_cache(maxsize=4096)
+def normalize_hours(hours):
+    text = _text(hours)
+    if not text:
+        return ""
+    if _ALWAYS_OPEN.match(text):
+        return "24/7"
+    text = re.sub(r"\s*(–|—|-|\bto\b|\btill\b|\buntil\b)\s*", "-", text, flags=re.IGNORECASE)
+    text = re.sub(r"(\d)\s*([ap])\.?m\.?", lambda m: f"{m.group(1)}{m.group(2).lower()}m", text, flags=re.IGNORECASE)
+    text = re.sub(r"[A-Za-z]+", lambda m: _DAY_NAMES.get(m.group().casefold(), m.group()), text)
+    return text
+
+
+@lru_cache(maxsize=4096)
+def normalize_type(resource_type):
+    text = _text(resource_type)
+    for canonical, pattern in _TYPE_PATTERNS.items():
+        if pattern.search(text):
+            return canonical
+    return text.title()
+
+
+def _coordinate(value, low, high):
+    try:
+        number = float(str(value).replace(",", "."))
+    except (TypeError, ValueError):
+        return None
+    if pd.isna(number) or not low <= number <= high:
+        return None
+    return number
+
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def _fingerprint(*parts):
+    text = "|".join(_NON_WORD.sub("", part.casefold()) for part in parts)
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+
+
+# Rows of a CSV or XLSX file in DataFrame chunks of raw strings, so memory
+# stays bounded however large the file is. Chunks are indexed by the row
+# number the file's own spreadsheet view shows, and blank rows are left out.
+def read_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        yield from _read_xlsx_chunks(path, chunk_size)
+        return
+    # Blank lines are read rather than skipped so the index keeps counting
+    # them; the header is row 1
+    for chunk in pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_size,
+                             encoding_errors="replace", skip_blank_lines=False):
+        chunk.index = chunk.index + 2
+        chunk = chunk[(chunk != "").any(axis=1)]
+        if len(chunk):
+            yield chunk
+
+
+def _read_xlsx_chunks(path, chunk_size):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        rows = sheet.iter_rows(values_only=True)
+        header = [str(cell) if cell is not None else "" for cell in next(rows, [])]
+        batch, row_numbers = [], []
+        for row_number, row in enumerate(rows, start=(sheet.min_row or 1) + 1):
+            if row is None or all(cell is None for cell in row):
+                continue
+            batch.append(["" if cell is None else cell for cell in row[:len(header)]])
+            row_numbers.append(row_number)
+            if len(batch) >= chunk_size:
+                yield pd.DataFrame(batch, columns=header[:len(batch[0])], index=row_numbers)
+                batch, row_numbers = [], []
+        if batch:
+            yield pd.DataFrame(batch, columns=header[:len(batch[0])], index=row_numbers)
+    finally:
+        workbook.close()
+
+
+# Ingestion counters and rejected rows
+class IngestReport:
+    def __init__(self):
+        self.read = 0
+        self.written = 0
+        self.duplicates = 0
+        self.geocoded = 0
+        self.unreadable_hours = 0
+        self.rejected = []
+
+    def reject(self, source, row_number, reason):
+        self.rejected.append((source, row_number, reason))
+
+    def summary(self):
+        return (f"read {self.read}, written {self.written}, duplicates {self.duplicates}, "
+                f"geocoded {self.geocoded}, rejected {len(self.rejected)}, unreadable hours {self.unreadable_hours}")
+
+
+# Stream partner files into one normalized dataset. Rows are validated and
+# normalized per chunk, rows without coordinates are batch-geocoded, and
+# near-duplicates are dropped by fingerprint (same name and phone, name and
+# address, or name and position to ~100 m). Only fingerprints of written rows
+# are kept across chunks, so memory stays bounded and a copy rejected for a
+# bad address doesn't hide a later good one.
+def ingest(paths, output_path=None, geocoder=None, chunk_size=DEFAULT_CHUNK_SIZE, rejects_path=None,
+           checkpoint=None):
+    output_path = output_path or settings.DATASET_PATH
+    report = IngestReport()
+    seen = set()
+    directory = os.path.dirname(output_path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".csv.tmp")
+    os.close(fd)
+    try:
+        header = True
+        for path in paths:
+            source = os.path.basename(path)
+            for chunk in read_chunks(path, chunk_size):
+                report.read += len(chunk)
+                rows = _normalize_chunk(chunk, source, report)
+                # Copies of rows already written need no geocoding
+                rows = _drop_duplicates(rows, seen, report, ("name", "phone"), ("name", "address"), record=False)
+                rows = _geocode_missing(rows, geocoder, source, report, checkpoint)
+                rows = _drop_duplicates(rows, seen, report, ("name", "phone"), ("name", "address"),
+                                        ("name", "latitude", "longitude"))
+                if rows:
+                    frame = pd.DataFrame(rows, columns=COLUMNS)
+                    frame['capacity'] = frame['capacity'].astype('Int64')
+                    frame.to_csv(tmp_path, mode="a", header=header, index=False)
+                    header = False
+                    report.written += len(frame)
+        if header:
+            pd.DataFrame(columns=COLUMNS).to_csv(tmp_path, index=False)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    if rejects_path and report.rejected:
+        pd.DataFrame(report.rejected, columns=['source', 'row', 'reason']).to_csv(rejects_path, index=False)
+    return report
+
+
+def _normalize_chunk(chunk, source, report):
+    columns = {}
+    for header in chunk.columns:
+        column = normalize_header(header)
+        if column and column not in columns:
+            columns[column] = header
+
+    rows = []
+    for row_number, raw in zip(chunk.index.tolist(), chunk.itertuples(index=False, name=None)):
+        record = dict(zip(chunk.columns, raw))
+        value = lambda column: record.get(columns.get(column), "")
+        name = _text(value('name'))
+        if not name:
+            report.reject(source, row_number, "missing name")
+            continue
+        address = _text(value('address'))
+        latitude = _coordinate(value('latitude'), -90, 90)
+        longitude = _coordinate(value('longitude'), -180, 180)
+        if (latitude is None or longitude is None) and not address:
+            report.reject(source, row_number, "no coordinates or address")
+            continue
+        # Kept as written, but counted: the open-now filter can't use them
+        hours = normalize_hours(value('hours'))
+        if hours and parse_hours(hours) is None:
+            report.unreadable_hours += 1
+        rows.append({
+            'name': name,
+            'type': normalize_type(value('type')),
+            'address': address,
+            'phone': normalize_phone(value('phone')),
+            'hours': hours,
+            'capacity': normalize_capacity(value('capacity')),
+            'latitude': latitude,
+            'longitude': longitude,
+            'services': _text(value('services')),
+            'languages': _text(value('languages')),
+            '_row': row_number,
+        })
+    return rows
+
+
+# Rows whose fingerprints haven't been seen; with record, the kept rows'
+# fingerprints are added to seen, so later copies (in this chunk too) drop
+def _drop_duplicates(rows, seen, report, *keys, record=True):
+    kept = []
+    for row in rows:
+        fingerprints = []
+        for key in keys:
+            parts = []
+            for column in key:
+                value = row[column]
+                if value is None or value == "":
+                    break
+                parts.append(f"{value:.3f}" if isinstance(value, float) else str(value))
+            else:
+                fingerprints.append(_fingerprint(*parts))
+        if any(fingerprint in seen for fingerprint in fingerprints):
+            report.duplicates += 1
+            continue
+        if record:
+            seen.update(fingerprints)
+        kept.append(row)
+    return kept
+
+
+# A checkpoint (navigator.batch_geocoder.Checkpoint) opened once for the
+# whole run is passed to every chunk's batch rather than re-read per chunk
+def _geocode_missing(rows, geocoder, source, report, checkpoint=None):
+    missing = sorted({row['address'] for row in rows if row['latitude'] is None or row['longitude'] is None})
+    if not geocoder or not missing:
+        found = {}
+    elif checkpoint is not None:
+        found = geocoder.resolve_many(missing, checkpoint=checkpoint)
+    else:
+        found = geocoder.resolve_many(missing)
+    kept = []
+    for row in rows:
+        if row['latitude'] is None or row['longitude'] is None:
+            coords = found.get(row['address'])
+            if not coords:
+                report.reject(source, row['_row'], "address could not be geocoded")
+                continue
+            row['latitude'], row['longitude'] = coords
+            report.geocoded += 1
+        kept.append(row)
+    return kept
+
+
+def main(argv=None):
+    from navigator.batch_geocoder import BatchGeocoder, Checkpoint, DEFAULT_CONCURRENCY, DEFAULT_RATE_LIMIT
+    from navigator.gazetteer import load_gazetteer
+    from navigator.geocoding import GeocodeCache
+
+    parser = argparse.ArgumentParser(description="Ingest partner resource directories (CSV/XLSX).")
+    parser.add_argument("paths", nargs="+", help="CSV or XLSX files to ingest")
+    parser.add_argument("-o", "--output", default=settings.DATASET_PATH, help="dataset CSV to write")
+    parser.add_argument("--rejects", help="CSV file listing rejected rows and why")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--no-geocode", action="store_true", help="reject rows without coordinates")
+    parser.add_argument("--geocoder-url", default=settings.GEOCODER_URL, help="Nominatim-compatible search URL")
+    parser.add_argument("--rate-limit", type=float, default=DEFAULT_RATE_LIMIT, help="geocoding requests per second")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="geocoding requests in flight")
+    parser.add_argument("--checkpoint", default=os.path.join(settings.CACHE_DIR, "geocode_checkpoint.jsonl"),
+                        help="file recording finished lookups, so an interrupted run can resume")
+    args = parser.parse_args(argv)
+
+    geocoder = checkpoint = None
+    if not args.no_geocode:
+        cache = GeocodeCache(os.path.join(settings.CACHE_DIR, "geocode_cache.json"))
+        geocoder = BatchGeocoder(args.geocoder_url, args.rate_limit, args.concurrency,
+                                 checkpoint_path=args.checkpoint, cache=cache, gazetteer=load_gazetteer())
+        # Read once for the whole run, not once per chunk
+        checkpoint = Checkpoint(args.checkpoint)
+    try:
+        report = ingest(args.paths, args.output, geocoder, args.chunk_size, args.rejects, checkpoint)
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+    if geocoder:
+        geocoder.cache.save()
+    print(report.summary(), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
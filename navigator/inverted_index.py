@@ -0,0 +1,100 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Service tags offered in the Resource Finder, and the words in a resource's
+# services or hours that imply them
+SERVICE_TAGS = {
+    "24/7 Access": r"24\s*/\s*7|24[\s-]*hours?|around the clock",
+    "Child-Friendly": r"child|kids?\b|youth|famil",
+    "Legal Assistance": r"legal|court|protection order|lawyer|paralegal",
+    "Counseling": r"counsel|therap|psycho|trauma support|support group",
+    "Medical Care": r"medical|clinic|health|doctor|nurs|hiv|\bpep\b",
+    "Transportation": r"transport|shuttle|\btravel",
+}
+LIST_SEPARATORS = r",|;|/|\band\b|&"
+
+
+# Split a free-text comma list into normalized tokens
+def tokenize_list(text):
+    if not isinstance(text, str):
+        return []
+    parts = re.split(LIST_SEPARATORS, text.casefold())
+    return [" ".join(part.split()) for part in parts if part.strip()]
+
+
+def _column(resources, name):
+    if name in resources.columns:
+        return resources[name].reset_index(drop=True).astype("string").fillna("")
+    return pd.Series([""] * len(resources), dtype="string")
+
+
+# Bitsets per resource type, service tag and language, built once per
+# dataset. Filters combine by AND-ing bitsets instead of scanning strings.
+# Directories repeat the same service and language strings a lot, so text is
+# only parsed once per distinct value.
+class InvertedIndex:
+    def __init__(self, resources):
+        self.size = len(resources)
+
+        codes, values = pd.factorize(_column(resources, 'type'))
+        self.type_bits = {
+            rtype: np.packbits(codes == code)
+            for code, rtype in enumerate(values) if rtype
+        }
+
+        codes, values = pd.factorize((_column(resources, 'services') + " " + _column(resources, 'hours')).str.casefold())
+        self.service_bits = {}
+        for tag, pattern in SERVICE_TAGS.items():
+            matching = re.compile(pattern)
+            hits = np.array([bool(matching.search(value)) for value in values], dtype=bool)
+            self.service_bits[tag] = np.packbits(hits[codes] if len(values) else np.zeros(self.size, dtype=bool))
+
+        codes, values = pd.factorize(_column(resources, 'languages'))
+        postings = {}
+        for code, value in enumerate(values):
+            for language in tokenize_list(value):
+                postings.setdefault(language.title(), []).append(code)
+        self.language_bits = {
+            language: np.packbits(np.isin(codes, value_codes))
+            for language, value_codes in postings.items()
+        }
+        self._all = np.packbits(np.ones(self.size, dtype=bool))
+        self._none = np.zeros_like(self._all)
+
+    @property
+    def languages(self):
+        return sorted(self.language_bits)
+
+    @property
+    def types(self):
+        return sorted(self.type_bits)
+
+    # Bitset of resources matching every criterion: the type (None or "All"
+    # for any), all of the service tags, and at least one of the languages
+    def match_bits(self, resource_type=None, services=(), languages=()):
+        bits = self._all
+        if resource_type and resource_type != "All":
+            bits = bits & self.type_bits.get(resource_type, self._none)
+        for tag in services:
+            bits = bits & self.service_bits.get(tag, self._none)
+        if languages:
+            spoken = self._none
+            for language in languages:
+                spoken = spoken | self.language_bits.get(language, self._none)
+            bits = bits & spoken
+        return bits
+
+    # Boolean mask over all resources
+    def mask(self, resource_type=None, services=(), languages=()):
+        return np.unpackbits(self.match_bits(resource_type, services, languages), count=self.size).astype(bool)
+
+    # Positions of matching resources, optionally restricted to candidates
+    # (for example the hits of a radius query), keeping their order
+    def positions(self, resource_type=None, services=(), languages=(), candidates=None):
+        mask = self.mask(resource_type, services, languages)
+        if candidates is None:
+            return np.flatnonzero(mask)
+        candidates = np.asarray(candidates, dtype=np.int64)
+        return candidates[mask[candidates]]
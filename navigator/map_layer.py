@@ -0,0 +1,192 @@
+import html
+import math
+
+import folium
+import numpy as np
+
+TILE_SIZE = 256
+# Markers closer than this many screen pixels are merged into one cluster
+CLUSTER_CELL_PX = 60
+# From this zoom level on every resource gets its own marker
+MAX_CLUSTER_ZOOM = 15
+# Extra margin around the viewport, as a share of its size, so small pans
+# don't leave the edges empty
+VIEWPORT_PADDING = 0.25
+
+SOUTH_AFRICA_CENTER = (-28.4793, 24.6727)
+
+
+# Web Mercator pixel coordinates at a zoom level
+def _project(latitudes, longitudes, zoom):
+    scale = TILE_SIZE * 2 ** zoom
+    lat = np.radians(np.clip(latitudes, -85.0511, 85.0511))
+    x = (np.asarray(longitudes) + 180.0) / 360.0 * scale
+    y = (1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / math.pi) / 2 * scale
+    return x, y
+
+
+def _unproject(x, y, zoom):
+    scale = TILE_SIZE * 2 ** zoom
+    lon = x / scale * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / scale))))
+    return lat, lon
+
+
+# (south, west, north, east) seen by a map of the given pixel size
+def viewport_bounds(center, zoom, width_px, height_px):
+    x, y = _project(np.array([center[0]]), np.array([center[1]]), zoom)
+    south, west = _unproject(x[0] - width_px / 2, y[0] + height_px / 2, zoom)
+    north, east = _unproject(x[0] + width_px / 2, y[0] - height_px / 2, zoom)
+    return south, west, north, east
+
+
+# Bounds as returned by st_folium, or None when the map hasn't reported yet
+def bounds_from_st_folium(state):
+    try:
+        south_west = state["bounds"]["_southWest"]
+        north_east = state["bounds"]["_northEast"]
+        bounds = (south_west["lat"], south_west["lng"], north_east["lat"], north_east["lng"])
+    except (KeyError, TypeError):
+        return None
+    if any(value is None for value in bounds):
+        return None
+    return bounds
+
+
+# Mask of points inside the (padded) viewport
+def in_viewport(latitudes, longitudes, bounds, padding=VIEWPORT_PADDING):
+    south, west, north, east = bounds
+    lat_pad = (north - south) * padding
+    lon_pad = (east - west) * padding
+    return ((latitudes >= south - lat_pad) & (latitudes <= north + lat_pad)
+            & (longitudes >= west - lon_pad) & (longitudes <= east + lon_pad))
+
+
+# Group points that would overlap on screen at this zoom. Returns a list of
+# (latitude, longitude, positions) with positions into the input arrays.
+def cluster_points(latitudes, longitudes, zoom, cell_px=CLUSTER_CELL_PX):
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    if len(latitudes) == 0:
+        return []
+    if zoom >= MAX_CLUSTER_ZOOM:
+        return [(lat, lon, np.array([i])) for i, (lat, lon) in enumerate(zip(latitudes, longitudes))]
+
+    x, y = _project(latitudes, longitudes, zoom)
+    cells = np.stack([np.floor(x / cell_px), np.floor(y / cell_px)], axis=1).astype(np.int64)
+    _, cluster_ids = np.unique(cells, axis=0, return_inverse=True)
+    cluster_ids = cluster_ids.ravel()
+    order = np.argsort(cluster_ids, kind="stable")
+    splits = np.flatnonzero(np.diff(cluster_ids[order])) + 1
+    return [
+        (latitudes[members].mean(), longitudes[members].mean(), members)
+        for members in np.split(order, splits)
+    ]
+
+
+# Base map without resource markers; cheap to cache per filter state
+def build_base_map(user_location=None):
+    if user_location:
+        m = folium.Map(location=user_location, zoom_start=10)
+        folium.Marker(
+            location=user_location,
+            popup="Your Location",
+            icon=folium.Icon(color="blue", icon="user", prefix="fa")
+        ).add_to(m)
+    else:
+        m = folium.Map(location=SOUTH_AFRICA_CENTER, zoom_start=5)  # Default to South Africa view
+    return m
+
+
+def _resource_marker(row, status=None):
+    popup = f"<b>{html.escape(str(row['name']))}</b><br>{html.escape(str(row['type']))}<br>📞 {html.escape(str(row['phone']))}"
+    if status:
+        popup += f"<br>{html.escape(status)}"
+    return folium.Marker(
+        location=[row['latitude'], row['longitude']],
+        popup=popup,
+        icon=folium.Icon(
+            color="red" if row['type'] == "Shelter" else "green",
+            icon="home" if row['type'] == "Shelter" else "balance-scale",
+            prefix="fa"
+        )
+    )
+
+
+def _cluster_marker(lat, lon, count):
+    size = 30 if count < 10 else 38 if count < 100 else 46
+    return folium.Marker(
+        location=[lat, lon],
+        popup=f"{count} resources here - zoom in to see them",
+        icon=folium.DivIcon(
+            icon_size=(size, size),
+            icon_anchor=(size // 2, size // 2),
+            html=(f'<div style="background:rgba(142, 68, 173, 0.85); color:white; border-radius:50%; '
+                  f'width:{size}px; height:{size}px; line-height:{size}px; text-align:center; '
+                  f'font-weight:bold; border:2px solid white;">{count}</div>'),
+        )
+    )
+
+
+# Resource markers for the visible part of the map, clustered for the zoom
+# level. Only points inside the viewport are sent to the browser. describe,
+# when given, maps a row's position in resources to a status line for its
+# popup; it is only called for the markers actually drawn.
+def build_marker_layer(resources, bounds, zoom, describe=None):
+    latitudes = resources['latitude'].to_numpy(dtype=np.float64)
+    longitudes = resources['longitude'].to_numpy(dtype=np.float64)
+    visible = np.flatnonzero(in_viewport(latitudes, longitudes, bounds))
+    layer = folium.FeatureGroup(name="Resources")
+    markers = 0
+    for lat, lon, members in cluster_points(latitudes[visible], longitudes[visible], zoom):
+        if len(members) == 1:
+            position = visible[members[0]]
+            _resource_marker(resources.iloc[position], describe(position) if describe else None).add_to(layer)
+        else:
+            _cluster_marker(lat, lon, len(members)).add_to(layer)
+        markers += 1
+    return layer, markers
+
+
+# The base map as st_folium sends it to the browser: Leaflet script, sibling
+# HTML, element id and st_folium's default return value. Built with
+# streamlit-folium's own helpers (the version is pinned in requirements.txt),
+# so the result can be cached and shown with show_rendered_map without
+# rendering the map again.
+def render_base_map(user_location=None):
+    from streamlit_folium import _get_map_string, _get_siblings, get_full_id
+
+    m = build_base_map(user_location)
+    m.render()
+    (south, west), (north, east) = m.get_bounds()
+    return {
+        'script': _get_map_string(m),
+        'html': _get_siblings(m),
+        'id': get_full_id(m),
+        'default': {'bounds': {'_southWest': {'lat': south, 'lng': west}, '_northEast': {'lat': north, 'lng': east}},
+                    'zoom': m.options.get('zoom')},
+    }
+
+
+# Leaflet script adding a marker layer to a rendered base map, as st_folium's
+# feature_group_to_add sends it. Rendering the markers is the slow part of
+# st_folium. The layer is attached to a throwaway map, so no shared map is
+# modified.
+def render_marker_layer(layer):
+    from streamlit_folium import _get_feature_group_string
+
+    return _get_feature_group_string(layer, folium.Map())
+
+
+# Show a rendered base map and marker layer; returns the map state as
+# st_folium does
+def show_rendered_map(base, layer_script, key, width, height, returned_objects):
+    from streamlit_folium import _component_func, generate_js_hash
+
+    return _component_func(
+        script=base['script'], html=base['html'], id=base['id'],
+        key=generate_js_hash(base['script'], key, False), height=height, width=width,
+        returned_objects=returned_objects,
+        default={name: value for name, value in base['default'].items() if name in returned_objects},
+        zoom=None, center=None, feature_group=layer_script, return_on_hover=False,
+    )
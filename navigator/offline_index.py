@@ -0,0 +1,129 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from navigator.inverted_index import SERVICE_TAGS, InvertedIndex
+from navigator.search import TOKEN_PATTERN
+from navigator.sync import combine_digests, record_digest, resource_ids, to_records
+
+INDEX_FORMAT = 2
+# Geohash length of one bucket; 4 characters is about 39 x 20 km
+GEOHASH_PRECISION = 4
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+# Languages beyond this many are left out of the language filter: the
+# offline page combines them as 31-bit JavaScript integer masks
+MAX_LANGUAGES = 31
+COORDINATE_DECIMALS = 5
+# Columns searched by the offline page's text box
+TERM_COLUMNS = ['name', 'services', 'address']
+
+
+# Geohash of each point as an integer of precision * 5 bits
+def geohash_codes(latitudes, longitudes, precision=GEOHASH_PRECISION):
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    lat_range = [np.full(len(latitudes), -90.0), np.full(len(latitudes), 90.0)]
+    lon_range = [np.full(len(longitudes), -180.0), np.full(len(longitudes), 180.0)]
+    codes = np.zeros(len(latitudes), dtype=np.int64)
+    for bit in range(precision * 5):
+        # Bits alternate between longitude and latitude, longitude first
+        values, (low, high) = (longitudes, lon_range) if bit % 2 == 0 else (latitudes, lat_range)
+        middle = (low + high) / 2
+        upper = values >= middle
+        low[:] = np.where(upper, middle, low)
+        high[:] = np.where(upper, high, middle)
+        codes = (codes << 1) | upper
+    return codes
+
+
+def geohash_string(code, precision=GEOHASH_PRECISION):
+    return "".join(GEOHASH_ALPHABET[(int(code) >> 5 * (precision - 1 - i)) & 31] for i in range(precision))
+
+
+def _bitmasks(bitsets, names, size):
+    masks = np.zeros(size, dtype=np.int64)
+    for bit, name in enumerate(names):
+        masks |= np.unpackbits(bitsets[name], count=size).astype(np.int64) << bit
+    return masks.tolist()
+
+
+def _text(series):
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+# Compact columnar index for the offline page. Rows are sorted by geohash so
+# every bucket is a contiguous run, stored with the bounding box of its
+# points; the page searches nearest buckets first and stops once no bucket
+# can hold anything closer. Types are codes, service tags and languages are
+# bitmasks, and names, services and addresses are pre-tokenized into ids of
+# a sorted term list so prefix search is a binary search. Each row carries
+# its navigator.sync record digest so the page can check updates it applies.
+def build_offline_index(resources, version=None):
+    resources = resources.reset_index(drop=True)
+    if 'id' not in resources.columns:
+        resources = resources.assign(id=resource_ids(resources))
+    # Taken before sorting so duplicate ids resolve as SnapshotStore does
+    digests = {rid: record_digest(rid, record) for rid, record in to_records(resources).items()}
+    codes = geohash_codes(resources['latitude'], resources['longitude'])
+    order = np.lexsort((resources['name'].astype(str).to_numpy(), codes))
+    resources, codes = resources.iloc[order].reset_index(drop=True), codes[order]
+
+    index = InvertedIndex(resources)
+    type_codes, types = pd.factorize(resources['type'].fillna(""))
+    languages = sorted(index.language_bits, key=lambda language: -int(np.unpackbits(index.language_bits[language]).sum()))
+    languages = sorted(languages[:MAX_LANGUAGES])
+
+    tokens = resources[TERM_COLUMNS[0]].astype("string").fillna("")
+    for column in TERM_COLUMNS[1:]:
+        tokens = tokens + " " + resources[column].astype("string").fillna("")
+    tokens = tokens.str.casefold().str.findall(TOKEN_PATTERN.pattern)
+    terms = sorted({term for row in tokens for term in row})
+    term_ids = {term: i for i, term in enumerate(terms)}
+
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    ends = np.r_[starts[1:], len(codes)]
+    latitudes = resources['latitude'].to_numpy(dtype=np.float64)
+    longitudes = resources['longitude'].to_numpy(dtype=np.float64)
+    buckets = [
+        [geohash_string(codes[start]), int(start), int(end),
+         round(float(latitudes[start:end].min()), COORDINATE_DECIMALS),
+         round(float(longitudes[start:end].min()), COORDINATE_DECIMALS),
+         round(float(latitudes[start:end].max()), COORDINATE_DECIMALS),
+         round(float(longitudes[start:end].max()), COORDINATE_DECIMALS)]
+        for start, end in zip(starts, ends)
+    ]
+
+    return {
+        'format': INDEX_FORMAT,
+        'version': version,
+        'checksum': combine_digests(digests.values()),
+        'types': [str(rtype) for rtype in types],
+        'service_tags': list(SERVICE_TAGS),
+        'service_patterns': list(SERVICE_TAGS.values()),
+        'languages': languages,
+        'terms': terms,
+        'buckets': buckets,
+        'rows': {
+            'id': [str(value) for value in resources['id']],
+            'name': _text(resources['name']),
+            'type': type_codes.tolist(),
+            'address': _text(resources['address']),
+            'phone': _text(resources['phone']),
+            'hours': _text(resources['hours']),
+            'capacity': _text(resources['capacity']),
+            'services': _text(resources['services']),
+            'lat': np.round(latitudes, COORDINATE_DECIMALS).tolist(),
+            'lon': np.round(longitudes, COORDINATE_DECIMALS).tolist(),
+            'svc': _bitmasks(index.service_bits, list(SERVICE_TAGS), len(resources)),
+            'lang': _bitmasks(index.language_bits, languages, len(resources)),
+            'terms': [sorted({term_ids[term] for term in row}) for row in tokens],
+            'digest': [f"{digests[str(value)]:012x}" for value in resources['id']],
+        },
+    }
+
+
+# The index as JSON that is safe to embed in a <script> element
+def offline_index_json(resources, version=None):
+    text = json.dumps(build_offline_index(resources, version), separators=(",", ":"), ensure_ascii=False)
+    return text.replace("</", "<\\/")
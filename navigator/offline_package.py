@@ -0,0 +1,157 @@
+import hashlib
+import html
+import json
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+from io import BytesIO
+
+import pandas as pd
+
+from navigator import settings
+from navigator.gazetteer import load_gazetteer
+from navigator.offline_index import offline_index_json
+from navigator.sync import resource_ids
+from navigator.tiles import TileDirectory, build_tile_pack, resource_regions
+
+# Bump whenever the offline page template or the archive layout changes, so cached
+# packages built from the old template are not served again
+TEMPLATE_VERSION = 6
+# Number of distinct packages (dataset versions) kept in memory
+MAX_CACHED_PACKAGES = 8
+
+# Offline page template. The offline package embeds the resource index and
+# place list in it, so it works when opened straight from the unzipped
+# folder; the installable app (navigator.pwa) points it at separate files.
+OFFLINE_TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "offline.html")
+# Applies update files on the offline page; inlined into it
+OFFLINE_SYNC_SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "offline_sync.js")
+
+_packages = OrderedDict()
+# Builds in progress by package key; sessions asking for the same package
+# wait for that build instead of starting their own
+_building = {}
+_packages_lock = threading.Lock()
+
+
+# A package build in progress, and its result or error once done
+class _Build:
+    def __init__(self):
+        self.done = threading.Event()
+        self.package = None
+        self.error = None
+
+
+# Gazetteer places for the offline page's town picker, as embeddable JSON
+def offline_places_json():
+    places = [[place.name, place.province, place.latitude, place.longitude] for place in load_gazetteer().places]
+    return json.dumps(places, separators=(",", ":")).replace("</", "<\\/")
+
+
+# Fill in the offline page template: each of the resource index and place
+# list is either embedded JSON or the URL to fetch it from
+def fill_offline_template(resource_index="", places="", resource_index_url="", places_url="", head=""):
+    with open(OFFLINE_TEMPLATE_PATH, encoding="utf-8") as f:
+        template = f.read()
+    with open(OFFLINE_SYNC_SCRIPT_PATH, encoding="utf-8") as f:
+        sync_script = f.read()
+    return (template
+            .replace("__PWA_HEAD__", head)
+            .replace("__SYNC_SCRIPT__", sync_script)
+            .replace("__PLACES_URL__", html.escape(places_url))
+            .replace("__RESOURCE_INDEX_URL__", html.escape(resource_index_url))
+            .replace("__PLACES__", places)
+            .replace("__RESOURCE_INDEX__", resource_index))
+
+
+# The offline page with the dataset's index embedded
+def render_offline_page(resources, version=None):
+    return fill_offline_template(offline_index_json(resources, version), offline_places_json())
+
+
+# Content hash of the dataset, independent of row labels
+def dataset_digest(resources):
+    digest = hashlib.sha256()
+    digest.update("\x1f".join(map(str, resources.columns)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(resources, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+# Cache key for a package: dataset content, sync version, tile settings and
+# template version
+def package_key(resources, manifest=None, tile_dir=None):
+    version = manifest["version"] if manifest else 0
+    tiles = f"{tile_dir}:{settings.TILE_MIN_ZOOM}-{settings.TILE_MAX_ZOOM}" if tile_dir else ""
+    return f"{dataset_digest(resources)}-{version}-{tiles}-v{TEMPLATE_VERSION}"
+
+
+# Build the ZIP archive entirely in memory. Rows carry their sync id and the
+# manifest records the dataset version and checksum, so the package can be
+# brought up to date later with a delta instead of a full download. With a
+# tile directory, map tiles around the resources are added as MBTiles.
+def build_offline_package(resources, manifest=None, tile_dir=None):
+    if 'id' not in resources.columns:
+        resources = resources.assign(id=resource_ids(resources))
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as zipf:
+        zipf.writestr('resources.csv', resources.to_csv(index=False))
+        zipf.writestr('offline.html', render_offline_page(resources, manifest["version"] if manifest else None))
+        if manifest:
+            zipf.writestr('manifest.json', json.dumps(manifest, indent=2))
+        if tile_dir:
+            archive, report = build_tile_pack(
+                resource_regions(resources, settings.TILE_BUFFER_KM), TileDirectory(tile_dir),
+                settings.TILE_MIN_ZOOM, settings.TILE_MAX_ZOOM,
+                int(settings.TILE_REGION_BUDGET_MB * 1024 * 1024)
+            )
+            # Tiles are already compressed images; deflating them again is wasted work
+            zipf.writestr('tiles/resources.mbtiles', archive, compress_type=zipfile.ZIP_STORED)
+            zipf.writestr('tiles/report.json', json.dumps(report, indent=2))
+    return buffer.getvalue()
+
+
+# Create a downloadable offline package. Packages are cached by content, so
+# every session downloading the same dataset shares one build. The lock only
+# covers lookups and inserts: a build runs outside it, so sessions after
+# other packages (or cached ones) are never held up by it.
+def create_offline_package(resources, manifest=None, tile_dir=settings.TILE_DIR):
+    key = package_key(resources, manifest, tile_dir)
+    with _packages_lock:
+        package = _packages.get(key)
+        if package is not None:
+            _packages.move_to_end(key)
+            return package
+        build = _building.get(key)
+        leader = build is None
+        if leader:
+            build = _building[key] = _Build()
+    if not leader:
+        build.done.wait()
+        if build.error is not None:
+            raise build.error
+        return build.package
+
+    try:
+        build.package = build_offline_package(resources, manifest, tile_dir)
+    except Exception as e:
+        build.error = e
+        raise
+    else:
+        with _packages_lock:
+            _packages[key] = build.package
+            while len(_packages) > MAX_CACHED_PACKAGES:
+                _packages.popitem(last=False)
+    finally:
+        with _packages_lock:
+            del _building[key]
+        build.done.set()
+    return build.package
+
+
+# Per-region tile size report stored in a package, or None without tiles
+def tile_report(package):
+    with zipfile.ZipFile(BytesIO(package)) as zipf:
+        if 'tiles/report.json' not in zipf.namelist():
+            return None
+        return json.loads(zipf.read('tiles/report.json'))
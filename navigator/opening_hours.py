@@ -0,0 +1,258 @@
+import argparse
+import re
+import sys
+from datetime import datetime, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+from navigator import settings
+
+# A week as 15-minute slots from Monday 00:00
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+SLOTS_PER_WEEK = 7 * SLOTS_PER_DAY
+# Slots to wait for a resource that never opens or whose hours are unknown
+NEVER = np.iinfo(np.int16).max
+
+DAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+_DAY_GROUPS = {'weekdays': range(5), 'weekends': range(5, 7), 'weekend': range(5, 7),
+               'daily': range(7), 'everyday': range(7), 'every day': range(7), '7 days': range(7)}
+
+_TIME = r"(\d{1,2})(?:[:h.](\d{2}))?\s*([ap]m)?"
+_RANGE = re.compile(rf"{_TIME}\s*-\s*{_TIME}")
+_DAY = r"(?:mon|tue|wed|thu|fri|sat|sun)[a-z]*\.?"
+_TOKEN = re.compile(rf"""
+    (?P<always>24\s*/\s*7|24\s*h(?:ou)?rs?(?:\s*a\s*day)?|always\s+open|around\s+the\s+clock)
+  | (?P<range>{_RANGE.pattern})
+  | (?P<group>{'|'.join(_DAY_GROUPS)})\b
+  | (?P<days>{_DAY}(?:\s*-\s*{_DAY})?)
+  | (?P<closed>closed)\b
+  | (?P<skip>[\s,;&]+|and\b|open\b|from\b|:)
+""", re.VERBOSE)
+
+
+# Minutes after midnight, or None for an impossible time
+def _minutes(hour, minute, meridiem):
+    hour, minute = int(hour), int(minute or 0)
+    if minute >= 60 or hour > 24 or (meridiem and not 1 <= hour <= 12):
+        return None
+    if meridiem:
+        hour = hour % 12 + (12 if meridiem == "pm" else 0)
+    return hour * 60 + minute
+
+
+# Start and end of a range such as "9am-5pm", "8:30-16:30" or "9-5pm" in
+# minutes; an end at or before the start runs past midnight
+def _time_range(text):
+    start_hour, start_minute, start_meridiem, end_hour, end_minute, end_meridiem = _RANGE.match(text).groups()
+    end = _minutes(end_hour, end_minute, end_meridiem)
+    if start_meridiem is None and end_meridiem is not None:
+        # "9-11am", "1-5pm": the start shares the end's am/pm unless that
+        # would put it after the end, as in "9-5pm"
+        start = _minutes(start_hour, start_minute, end_meridiem)
+        if start is not None and end is not None and start > end:
+            start = _minutes(start_hour, start_minute, "am")
+    else:
+        start = _minutes(start_hour, start_minute, start_meridiem)
+    if start is None or end is None:
+        return None
+    if start_meridiem is None and end_meridiem is None and start_minute is None and end_minute is None \
+            and end < start < 12 * 60 and end <= 12 * 60:
+        # "9-5" means 9am to 5pm
+        end += 12 * 60
+    return start, end
+
+
+def _day_range(text):
+    names = [name.strip()[:3] for name in text.split("-")]
+    first, last = DAYS.index(names[0]), DAYS.index(names[-1])
+    return [(first + i) % 7 for i in range((last - first) % 7 + 1)]
+
+
+# Weekly schedule of an opening-hours string as a read-only boolean array of
+# SLOTS_PER_WEEK slots, or None when the string can't be understood. Accepts
+# "24/7", "9am-5pm Mon-Fri", "Mon-Fri 08:00-17:00, Sat 09:00-13:00",
+# "Weekdays 8:30am-4:30pm", "18:00-06:00 daily" and the like; times without
+# days apply every day.
+@lru_cache(maxsize=4096)
+def parse_hours(text):
+    text = " ".join(str(text).casefold().split())
+    text = re.sub(r"\s*(–|—|\bto\b|\btill\b|\buntil\b)\s*", "-", text)
+    text = text.replace("noon", "12pm").replace("midnight", "12am")
+
+    # Ranges and days in order, grouped as "times then days" or "days then
+    # times", whichever the string starts with
+    groups, leading, position = [], None, 0
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if match is None:
+            return None
+        position = match.end()
+        kind = match.lastgroup
+        if kind == "skip":
+            continue
+        if kind == "always":
+            kind, value = "range", (0, 24 * 60)
+        elif kind == "range":
+            value = _time_range(match.group())
+            if value is None:
+                return None
+        elif kind == "group":
+            kind, value = "days", list(_DAY_GROUPS[match.group()])
+        elif kind == "days":
+            value = _day_range(match.group())
+        else:
+            value = None
+        slot = "range" if kind == "range" else "days"
+        leading = leading or slot
+        if not groups or (slot == leading and groups[-1]['trailing']):
+            groups.append({'range': [], 'days': [], 'closed': False, 'trailing': False})
+        group = groups[-1]
+        if slot != leading:
+            group['trailing'] = True
+        if kind == "closed":
+            group['closed'] = True
+        else:
+            group[kind].append(value)
+    if not groups:
+        return None
+
+    # Only whole slots inside a range count as open: a start is rounded up
+    # and an end down, so "08:10-16:50" is open 08:15-16:45 and nobody is
+    # sent to a door that is still shut
+    schedule = np.zeros(SLOTS_PER_WEEK, dtype=bool)
+    for group in groups:
+        if not group['range']:
+            if group['closed']:
+                continue
+            return None
+        days = sorted({day for days in group['days'] for day in days}) or range(7)
+        for start, end in group['range']:
+            if end <= start:
+                end += 24 * 60
+            first, last = -(-start // SLOT_MINUTES), end // SLOT_MINUTES
+            for day in days:
+                slots = np.arange(first, last) + day * SLOTS_PER_DAY
+                schedule[slots % SLOTS_PER_WEEK] = True
+    schedule.flags.writeable = False
+    return schedule
+
+
+def local_time(when=None):
+    zone = ZoneInfo(settings.TIMEZONE)
+    if when is None:
+        return datetime.now(zone)
+    return when.astimezone(zone) if when.tzinfo else when.replace(tzinfo=zone)
+
+
+# Slot of the week a moment falls in, in the directory's time zone
+def week_slot(when=None):
+    when = local_time(when)
+    return when.weekday() * SLOTS_PER_DAY + (when.hour * 60 + when.minute) // SLOT_MINUTES
+
+
+def _column(resources):
+    if 'hours' in resources.columns:
+        return resources['hours'].reset_index(drop=True).astype("string").fillna("")
+    return pd.Series([""] * len(resources), dtype="string")
+
+
+# Opening hours of every resource, compiled once per dataset. Each distinct
+# hours string is parsed once, and strings that parse to the same schedule
+# ("9am-5pm", "09:00 - 17:00") share one schedule code. For each schedule
+# the table holds, per slot of the week, how many slots remain until it is
+# next open (0 while open). "Open at T" and "opens within N hours" for the
+# whole dataset are then one column lookup and one gather.
+class OpeningHours:
+    def __init__(self, resources):
+        text_codes, values = pd.factorize(_column(resources))
+        parsed = [parse_hours(value) if value else None for value in values]
+        counts = np.bincount(text_codes, minlength=len(values))
+        self.unparsed = {value: int(counts[code]) for code, value in enumerate(values)
+                         if value and parsed[code] is None}
+
+        # Schedule code 0 is "unknown": blank or unreadable hours
+        schedules = [None]
+        schedule_codes = {}
+        text_schedule = np.zeros(len(values), dtype=np.int32)
+        for code, schedule in enumerate(parsed):
+            if schedule is None:
+                continue
+            key = schedule.tobytes()
+            if key not in schedule_codes:
+                schedule_codes[key] = len(schedules)
+                schedules.append(schedule)
+            text_schedule[code] = schedule_codes[key]
+        self.codes = text_schedule[text_codes]
+        self.readable = np.array([schedule is not None for schedule in schedules], dtype=bool)
+        self.known = int(np.count_nonzero(self.codes))
+
+        # Slots until next open, scanning two weeks backwards so schedules
+        # wrap from Sunday night into Monday
+        opened = np.zeros((len(schedules), 2 * SLOTS_PER_WEEK), dtype=bool)
+        for code, schedule in enumerate(schedules):
+            if schedule is not None:
+                opened[code] = np.tile(schedule, 2)
+        wait = np.full((len(schedules), 2 * SLOTS_PER_WEEK), NEVER, dtype=np.int32)
+        following = np.full(len(schedules), NEVER, dtype=np.int32)
+        for slot in range(2 * SLOTS_PER_WEEK - 1, -1, -1):
+            following = np.where(opened[:, slot], 0, np.minimum(following + 1, NEVER))
+            wait[:, slot] = following
+        # Slot-major, so a query reads one contiguous row
+        self.wait = np.ascontiguousarray(wait[:, :SLOTS_PER_WEEK].T.astype(np.int16))
+
+    def __len__(self):
+        return len(self.codes)
+
+    # Boolean mask of resources open at `when` (default now) or opening
+    # within `within_hours` of it. Unknown and unreadable hours never match.
+    def mask(self, when=None, within_hours=0):
+        limit = min(int(round((within_hours or 0) * 60 / SLOT_MINUTES)), NEVER - 1)
+        return (self.wait[week_slot(when)] <= limit)[self.codes]
+
+    # "Open now", "Opens 14:30" or "Opens Mon 08:00" for one resource, or
+    # None when its hours are unknown or unreadable
+    def describe(self, position, when=None):
+        when = local_time(when)
+        code = self.codes[position]
+        wait = int(self.wait[week_slot(when), code])
+        if wait == 0:
+            return "Open now"
+        if wait >= NEVER:
+            return "Closed" if self.readable[code] else None
+        slot_start = when.replace(minute=when.minute - when.minute % SLOT_MINUTES, second=0, microsecond=0)
+        opens = slot_start + timedelta(minutes=wait * SLOT_MINUTES)
+        if opens.date() == when.date():
+            return f"Opens {opens:%H:%M}"
+        return f"Opens {opens:%a %H:%M}"
+
+    # Unreadable hours strings and how many resources use each, most used first
+    def report(self):
+        return sorted(self.unparsed.items(), key=lambda item: (-item[1], item[0]))
+
+
+def main(argv=None):
+    from navigator.dataset import load_resources
+
+    parser = argparse.ArgumentParser(description="Check that resources' opening hours can be understood.")
+    parser.add_argument("--dataset", help="dataset CSV (default: NAVIGATOR_DATASET)")
+    parser.add_argument("--at", help="also count resources open at this local time, e.g. '2024-05-06 02:00'")
+    args = parser.parse_args(argv)
+
+    hours = OpeningHours(load_resources(args.dataset))
+    blank = len(hours) - hours.known - sum(hours.unparsed.values())
+    print(f"{hours.known} of {len(hours)} resources have readable hours, {blank} have none")
+    if args.at:
+        when = datetime.fromisoformat(args.at)
+        print(f"{int(hours.mask(when).sum())} open at {local_time(when):%a %Y-%m-%d %H:%M %Z}")
+    for value, count in hours.report():
+        print(f"{count:>7}  {value}")
+    if hours.unparsed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from navigator import settings
+from navigator.dataset import load_resources
+from navigator.distance import haversine_km
+from navigator.engine import QueryEngine
+from navigator.gazetteer import load_gazetteer
+from navigator.inverted_index import InvertedIndex
+from navigator.offline_index import geohash_codes, geohash_string
+from navigator.search import SCORE_PRECISION
+from navigator.snapshot import dataset_key, open_snapshot, write_snapshot
+
+PARTITION_FORMAT = 1
+# Geohash length of one partition; 3 characters is about 156 x 156 km, so a
+# search of up to 100 km around a point touches a handful of partitions
+PARTITION_PRECISION = 3
+SUMMARY_FILE = "summary.json"
+EMPTY_PARTITION = "empty"
+
+
+# Province of each resource, taken from the nearest gazetteer place
+def nearest_provinces(latitudes, longitudes):
+    places = load_gazetteer().places
+    best = np.full(len(latitudes), np.inf)
+    provinces = np.empty(len(latitudes), dtype=object)
+    for place in places:
+        distances = haversine_km(place.latitude, place.longitude, latitudes, longitudes)
+        closer = distances < best
+        best[closer] = distances[closer]
+        provinces[closer] = place.province
+    return provinces
+
+
+# Write the dataset as one snapshot file per geohash cell plus a summary:
+# each partition's row count, bounding box and centre, the national counts
+# by province and type, and the languages and types of the whole dataset
+def write_partitions(resources, directory, precision=PARTITION_PRECISION):
+    resources = resources.reset_index(drop=True)
+    latitudes = resources['latitude'].to_numpy(dtype=np.float64)
+    longitudes = resources['longitude'].to_numpy(dtype=np.float64)
+    codes = geohash_codes(latitudes, longitudes, precision)
+    os.makedirs(directory, exist_ok=True)
+    # Schema-only partition for searches that touch no partition at all
+    write_snapshot(resources.iloc[:0], os.path.join(directory, f"{EMPTY_PARTITION}.arrow"))
+
+    partitions = {}
+    for code in np.unique(codes):
+        rows = np.flatnonzero(codes == code)
+        key = geohash_string(code, precision)
+        write_snapshot(resources.iloc[rows], os.path.join(directory, f"{key}.arrow"))
+        partitions[key] = {
+            'rows': len(rows),
+            'bounds': [float(latitudes[rows].min()), float(longitudes[rows].min()),
+                       float(latitudes[rows].max()), float(longitudes[rows].max())],
+            'center': [float(latitudes[rows].mean()), float(longitudes[rows].mean())],
+        }
+
+    provinces = pd.crosstab(nearest_provinces(latitudes, longitudes), resources['type'].fillna("").to_numpy())
+    index = InvertedIndex(resources)
+    summary = {
+        'format': PARTITION_FORMAT,
+        'precision': precision,
+        'rows': len(resources),
+        'types': index.types,
+        'languages': index.languages,
+        'partitions': partitions,
+        'provinces': {province: {rtype: int(count) for rtype, count in counts.items() if count}
+                      for province, counts in provinces.iterrows()},
+    }
+    with open(os.path.join(directory, SUMMARY_FILE), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+
+
+# Query engines over several partitions' engines, answering as one engine
+# whose positions run through the partitions in order. Each partition keeps
+# its own memory-mapped rows and indexes, so regions that overlap share them
+# and nothing is copied; results are merged per query. Text relevance is
+# scored within each partition, which ranks close to scoring the region as
+# a whole.
+class RegionEngine:
+    def __init__(self, engines, version):
+        self.engines = engines
+        self.version = version
+        self.offsets = np.concatenate([[0], np.cumsum([len(engine) for engine in engines])]).astype(np.int64)
+        self.hours = RegionHours(self)
+        self._positions = None
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    # Partition index and position within it of each region position
+    def locate(self, positions):
+        positions = np.asarray(positions, dtype=np.int64)
+        parts = np.searchsorted(self.offsets, positions, side="right") - 1
+        return parts, positions - self.offsets[parts]
+
+    # Resources at the given positions, in that order
+    def rows(self, positions):
+        parts, local = self.locate(positions)
+        if not len(parts):
+            return self.engines[0].resources.iloc[:0] if self.engines else pd.DataFrame()
+        frames, order = [], []
+        for part in np.unique(parts):
+            chosen = np.flatnonzero(parts == part)
+            frames.append(self.engines[part].resources.iloc[local[chosen]])
+            order.append(chosen)
+        rows = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0].reset_index(drop=True)
+        return rows.iloc[np.argsort(np.concatenate(order), kind="stable")]
+
+    # QueryEngine.filter() over every partition, merged nearest first
+    def filter(self, location=None, radius_km=None, resource_type=None, services=(), languages=(),
+               nearest=None, stats=None, open_at=None, open_within=0):
+        positions, distances, scanned = [], [], 0
+        for engine, offset in zip(self.engines, self.offsets):
+            part_stats = {}
+            found, found_distances = engine.filter(location, radius_km, resource_type, services, languages,
+                                                   nearest, part_stats, open_at, open_within)
+            positions.append(found + offset)
+            if found_distances is not None:
+                distances.append(found_distances)
+            scanned += part_stats['scanned']
+        if stats is not None:
+            stats['scanned'] = scanned
+        positions = np.concatenate(positions) if positions else np.zeros(0, dtype=np.int64)
+        if location is None:
+            return positions, None
+        distances = np.concatenate(distances) if distances else np.zeros(0)
+        order = np.argsort(distances, kind="stable")[:nearest or None]
+        return positions[order], distances[order]
+
+    # QueryEngine.search() within each partition, merged by relevance with
+    # equally relevant results nearest first
+    def search(self, text, positions, distances=None, limit=None):
+        parts, local = self.locate(positions)
+        found, scores = [], []
+        for part in np.unique(parts):
+            chosen = np.flatnonzero(parts == part)
+            hits, hit_scores = self.engines[part].search_index.search(
+                text, candidates=local[chosen], distances=distances[chosen] if distances is not None else None,
+                limit=limit)
+            found.append(chosen[hits])
+            scores.append(hit_scores)
+        if not found:
+            return positions[:0], (distances[:0] if distances is not None else None)
+        found, scores = np.concatenate(found), np.round(np.concatenate(scores), SCORE_PRECISION)
+        if distances is not None:
+            order = np.lexsort((distances[found], -scores))
+        else:
+            order = np.lexsort((found, -scores))
+        found = found[order][:limit]
+        return positions[found], (distances[found] if distances is not None else None)
+
+    # Built on filter() and search() exactly as QueryEngine.query() is
+    query = QueryEngine.query
+
+    def positions_by_id(self):
+        if self._positions is None:
+            self._positions = {resource_id: int(offset) + position
+                               for engine, offset in zip(self.engines, self.offsets)
+                               for resource_id, position in engine.positions_by_id().items()}
+        return self._positions
+
+
+# Opening hours of a region, read from its partitions' OpeningHours
+class RegionHours:
+    def __init__(self, region):
+        self.region = region
+        self.known = sum(engine.hours.known for engine in region.engines)
+
+    def describe(self, position, when=None):
+        parts, local = self.region.locate([position])
+        return self.region.engines[parts[0]].hours.describe(int(local[0]), when)
+
+
+# The dataset split into geographic partitions, loaded on demand. Each
+# partition is indexed once, straight from its memory map, and kept in an
+# LRU shared by every session, so popular areas are indexed once and cold
+# ones are dropped. A search gets a RegionEngine over the partitions its
+# circle touches; widening the circle only indexes the partitions it adds.
+class PartitionSet:
+    def __init__(self, directory, max_partitions=None):
+        self.directory = directory
+        self.max_partitions = max_partitions or settings.PARTITION_CACHE_SIZE
+        with open(os.path.join(directory, SUMMARY_FILE), encoding="utf-8") as f:
+            self.summary = json.load(f)
+        self.partitions = self.summary['partitions']
+        self._engines = OrderedDict()
+        # Region engines only hold references to partition engines, and are
+        # dropped with any partition evicted from under them
+        self._regions = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return self.summary['rows']
+
+    @property
+    def languages(self):
+        return self.summary['languages']
+
+    # Partitions with any resource within radius_km of the point, judged by
+    # the distance to the nearest edge of each partition's bounding box
+    def covering(self, lat, lon, radius_km):
+        keys = []
+        for key, partition in self.partitions.items():
+            south, west, north, east = partition['bounds']
+            nearest_lat = min(max(lat, south), north)
+            nearest_lon = min(max(lon, west), east)
+            # The nearest point of a lat/lon box can sit slightly off its
+            # corner on a sphere; the slack keeps partitions from being missed
+            if haversine_km(lat, lon, nearest_lat, nearest_lon) * 0.95 <= radius_km:
+                keys.append(key)
+        return sorted(keys)
+
+    # Query engine over one partition, from the LRU when possible
+    def partition_engine(self, key):
+        with self._lock:
+            engine = self._engines.get(key)
+            if engine is not None:
+                self._engines.move_to_end(key)
+                self.hits += 1
+                return engine
+            self.misses += 1
+        engine = QueryEngine(open_snapshot(os.path.join(self.directory, f"{key}.arrow")), key)
+        with self._lock:
+            engine = self._engines.setdefault(key, engine)
+            while len(self._engines) > self.max_partitions:
+                evicted, _ = self._engines.popitem(last=False)
+                self._regions = {keys: region for keys, region in self._regions.items() if evicted not in keys}
+        return engine
+
+    # Engine over the given partitions. The same set of partitions always
+    # gets the same engine while its partitions stay cached.
+    def engine(self, keys):
+        keys = tuple(sorted(keys)) or (EMPTY_PARTITION,)
+        with self._lock:
+            region = self._regions.get(keys)
+        if region is not None:
+            for key in keys:
+                self.partition_engine(key)
+            return region
+        engines = [self.partition_engine(key) for key in keys]
+        region = RegionEngine(engines, "+".join(keys))
+        with self._lock:
+            if all(self._engines.get(key) is engine for key, engine in zip(keys, engines)):
+                region = self._regions.setdefault(keys, region)
+        return region
+
+    # Query engine for a search circle
+    def engine_near(self, lat, lon, radius_km):
+        return self.engine(self.covering(lat, lon, radius_km))
+
+    # National counts by province (rows) and resource type (columns)
+    def national_summary(self):
+        summary = pd.DataFrame.from_dict(self.summary['provinces'], orient="index").fillna(0).astype(int)
+        summary = summary.reindex(columns=[rtype for rtype in self.summary['types'] if rtype in summary.columns])
+        summary['Total'] = summary.sum(axis=1)
+        return summary.sort_index()
+
+    def stats(self):
+        with self._lock:
+            return {'partitions': len(self.partitions), 'indexed_partitions': len(self._engines),
+                    'regions': len(self._regions), 'hits': self.hits, 'misses': self.misses}
+
+
+# Partitions of the dataset file, written by the first process to see this
+# version of it and opened by the rest
+def load_partitions(path=None, directory=None, max_partitions=None):
+    path = path or settings.DATASET_PATH
+    directory = directory or settings.SNAPSHOT_DIR
+    key = dataset_key(path)
+    target = os.path.join(directory, f"partitions-{key}")
+    if not os.path.exists(os.path.join(target, SUMMARY_FILE)):
+        temporary = f"{target}.{os.getpid()}.tmp"
+        write_partitions(load_resources(path), temporary)
+        try:
+            os.rename(temporary, target)
+        except OSError:
+            # Another process got there first
+            shutil.rmtree(temporary, ignore_errors=True)
+        source = key.split("-")[0]
+        for stale in os.listdir(directory):
+            if stale.startswith(f"partitions-{source}-") and stale != os.path.basename(target) \
+                    and not stale.endswith(".tmp"):
+                shutil.rmtree(os.path.join(directory, stale), ignore_errors=True)
+    return PartitionSet(target, max_partitions)
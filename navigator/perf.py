@@ -0,0 +1,201 @@
+import hmac
+import json
+import re
+import threading
+import time
+import urllib.parse
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from navigator import settings
+
+PERCENTILES = (50, 90, 95, 99)
+# Recent samples kept per phase and counter; percentiles cover this window
+WINDOW = 2000
+METRIC_PREFIX = "navigator"
+
+
+# Timings and counters of one script run. Phases may repeat within a run;
+# their times add up.
+class Rerun:
+    enabled = True
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.counters = {}
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - started
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    # Time from the start of the run until now, recorded as a phase; used for
+    # milestones such as the first content of a page being sent
+    def mark(self, name):
+        self.phases[name] = time.perf_counter() - self.started
+
+    def finish(self):
+        if self.recorder is not None:
+            self.phases['total'] = time.perf_counter() - self.started
+            self.recorder.record(self.phases, self.counters)
+            self.recorder = None
+
+
+# Stand-in used when instrumentation is off: every call is a no-op
+class _NullRerun:
+    enabled = False
+    _phase = nullcontext()
+
+    def phase(self, name):
+        return self._phase
+
+    def count(self, name, value=1):
+        pass
+
+    def mark(self, name):
+        pass
+
+    def finish(self):
+        pass
+
+
+NULL_RERUN = _NullRerun()
+
+
+def _stats(samples, total, count):
+    stats = {'count': count, 'sum': total, 'mean': total / count if count else 0.0}
+    if samples:
+        import numpy as np
+        for p, value in zip(PERCENTILES, np.percentile(np.fromiter(samples, float), PERCENTILES)):
+            stats[f"p{p}"] = float(value)
+    return stats
+
+
+# Per-phase timings and counters from every session's reruns. Sums and counts
+# cover the whole process lifetime; percentiles the last WINDOW samples.
+class PerfRecorder:
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.started_at = time.time()
+        self.reruns = 0
+        self._phases = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def start_rerun(self):
+        return Rerun(self)
+
+    def record(self, phases, counters):
+        with self._lock:
+            self.reruns += 1
+            for series, values in ((self._phases, phases), (self._counters, counters)):
+                for name, value in values.items():
+                    entry = series.get(name)
+                    if entry is None:
+                        entry = series[name] = [deque(maxlen=self.window), 0.0, 0]
+                    entry[0].append(value)
+                    entry[1] += value
+                    entry[2] += 1
+
+    def snapshot(self):
+        with self._lock:
+            phases = {name: (list(samples), total, count) for name, (samples, total, count) in self._phases.items()}
+            counters = {name: (list(samples), total, count) for name, (samples, total, count) in self._counters.items()}
+            reruns = self.reruns
+        return {
+            'reruns': reruns,
+            'uptime_s': time.time() - self.started_at,
+            'phases_s': {name: _stats(*entry) for name, entry in sorted(phases.items())},
+            'counters': {name: _stats(*entry) for name, entry in sorted(counters.items())},
+        }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    # Prometheus text exposition format: phases as a summary in seconds,
+    # counters as per-rerun summaries
+    def to_prometheus(self):
+        snapshot = self.snapshot()
+        lines = [
+            f"# HELP {METRIC_PREFIX}_reruns_total Script runs recorded.",
+            f"# TYPE {METRIC_PREFIX}_reruns_total counter",
+            f"{METRIC_PREFIX}_reruns_total {snapshot['reruns']}",
+            f"# HELP {METRIC_PREFIX}_phase_seconds Time spent per rerun in each phase.",
+            f"# TYPE {METRIC_PREFIX}_phase_seconds summary",
+        ]
+        for name, stats in snapshot['phases_s'].items():
+            lines.extend(_summary_lines(f"{METRIC_PREFIX}_phase_seconds", f'phase="{name}"', stats))
+        for name, stats in snapshot['counters'].items():
+            metric = f"{METRIC_PREFIX}_{re.sub(r'[^a-zA-Z0-9_]', '_', name)}"
+            lines.append(f"# HELP {metric} {name} per rerun.")
+            lines.append(f"# TYPE {metric} summary")
+            lines.extend(_summary_lines(metric, "", stats))
+        return "\n".join(lines) + "\n"
+
+
+def _summary_lines(metric, labels, stats):
+    lines = []
+    for p in PERCENTILES:
+        if f"p{p}" in stats:
+            quantile = f'quantile="{p / 100:g}"'
+            lines.append(f"{metric}{{{','.join(filter(None, [labels, quantile]))}}} {stats[f'p{p}']:.6g}")
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{metric}_sum{suffix} {stats['sum']:.6g}")
+    lines.append(f"{metric}_count{suffix} {stats['count']}")
+    return lines
+
+
+# Whether a token supplied by a visitor matches the operator token. Without a
+# configured token nobody is an operator.
+def authorized(token, expected=None):
+    expected = expected or settings.PERF_TOKEN
+    if not expected or not token:
+        return False
+    return hmac.compare_digest(str(token), expected)
+
+
+# Serve /metrics (Prometheus text) and /metrics.json from a background thread
+# on a side port, since Streamlit cannot add routes to its own server. When a
+# token is configured, requests must send it as a bearer token or ?token=.
+def serve_metrics(recorder, host, port, token=None):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urllib.parse.urlsplit(self.path)
+            if token:
+                supplied = urllib.parse.parse_qs(url.query).get("token", [""])[0]
+                header = self.headers.get("Authorization", "")
+                if header.startswith("Bearer "):
+                    supplied = header[len("Bearer "):]
+                if not authorized(supplied, token):
+                    self.send_error(403)
+                    return
+            if url.path == "/metrics":
+                body, content_type = recorder.to_prometheus(), "text/plain; version=0.0.4"
+            elif url.path == "/metrics.json":
+                body, content_type = recorder.to_json(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            body = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
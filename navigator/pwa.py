@@ -0,0 +1,184 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from navigator import settings
+from navigator.offline_index import offline_index_json
+from navigator.offline_package import fill_offline_template, offline_places_json
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+ICON_DIR = os.path.join(settings.BASE_DIR, "static")
+ICON_SIZES = [192, 512]
+# Content-hashed files go here; their names change whenever their content
+# does, so they can be cached forever
+ASSET_DIR = "assets"
+HASH_LENGTH = 12
+# Written last, once every file it lists is in place
+SERVICE_WORKER = "sw.js"
+
+APP_NAME = "GBV Resource Navigator"
+SHORT_NAME = "SafePath"
+THEME_COLOR = "#8e44ad"
+
+PWA_HEAD = (
+    '<link rel="manifest" href="manifest.webmanifest">\n'
+    f'    <meta name="theme-color" content="{THEME_COLOR}">\n'
+    '    <link rel="apple-touch-icon" href="{icon}">'
+)
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def _hashed_name(name, data):
+    stem, extension = os.path.splitext(name)
+    return f"{ASSET_DIR}/{stem}.{_digest(data)}{extension}"
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+# Every file of the installable app as {path: bytes}. The offline UI,
+# emergency contacts page and manifest keep fixed names so they can be
+# bookmarked; the resource index, place list and icons are content-hashed.
+# The service worker precaches all of them under their revision and is
+# named after the dataset version, so a new dataset always installs as an
+# update while unchanged files are reused from the previous cache.
+def build_pwa_files(resources, version):
+    files = {}
+
+    def asset(name, data):
+        path = _hashed_name(name, data)
+        files[path] = data
+        return path
+
+    index_path = asset("resources.json", offline_index_json(resources, version).encode("utf-8"))
+    places_path = asset("places.json", offline_places_json().encode("utf-8"))
+    icons = {size: asset(f"icon-{size}.png", _read(os.path.join(ICON_DIR, f"icon-{size}.png")))
+             for size in ICON_SIZES}
+
+    files["index.html"] = fill_offline_template(
+        resource_index_url=index_path, places_url=places_path, head=PWA_HEAD.format(icon=icons[ICON_SIZES[0]])
+    ).encode("utf-8")
+    files["emergency.html"] = _read(os.path.join(DATA_DIR, "emergency.html"))
+    files["manifest.webmanifest"] = json.dumps({
+        'name': APP_NAME,
+        'short_name': SHORT_NAME,
+        'start_url': "./index.html",
+        'scope': "./",
+        'display': "standalone",
+        'background_color': "#ffffff",
+        'theme_color': THEME_COLOR,
+        'icons': [{'src': path, 'sizes': f"{size}x{size}", 'type': "image/png"} for size, path in icons.items()],
+        'shortcuts': [{'name': "Emergency contacts", 'url': "./emergency.html"}],
+    }, indent=2).encode("utf-8")
+
+    precache = [[path, _digest(data)] for path, data in sorted(files.items())]
+    precache_json = json.dumps(precache, separators=(",", ":"))
+    cache_version = f"v{version}-{_digest(precache_json.encode('utf-8'))[:8]}"
+    with open(os.path.join(DATA_DIR, SERVICE_WORKER), encoding="utf-8") as f:
+        files[SERVICE_WORKER] = (f.read()
+                                 .replace("__CACHE_VERSION__", cache_version)
+                                 .replace("__PRECACHE__", precache_json)).encode("utf-8")
+    return files
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(data)
+    os.replace(temporary, path)
+
+
+# Write the app into out_dir, touching only files whose content changed, and
+# remove hashed assets no longer referenced. Files are replaced atomically,
+# so a static server never serves a half-written one.
+def build_pwa(resources, out_dir=settings.PWA_DIR, version=None):
+    files = build_pwa_files(resources, version)
+    written = []
+    for path in sorted(files, key=lambda path: path == SERVICE_WORKER):
+        target = os.path.join(out_dir, path)
+        try:
+            unchanged = _read(target) == files[path]
+        except OSError:
+            unchanged = False
+        if not unchanged:
+            _write_atomic(target, files[path])
+            written.append(path)
+
+    removed = []
+    asset_dir = os.path.join(out_dir, ASSET_DIR)
+    for name in sorted(os.listdir(asset_dir)):
+        if f"{ASSET_DIR}/{name}" not in files:
+            os.remove(os.path.join(asset_dir, name))
+            removed.append(f"{ASSET_DIR}/{name}")
+    return {
+        'version': version,
+        'files': len(files),
+        'bytes': sum(len(data) for data in files.values()),
+        'written': written,
+        'removed': removed,
+    }
+
+
+# Static file handler with the headers the app relies on: a JavaScript type
+# for the service worker, the manifest type, and caching that lets hashed
+# assets live forever while fixed names are revalidated on every visit
+class PWARequestHandler(SimpleHTTPRequestHandler):
+    extensions_map = dict(SimpleHTTPRequestHandler.extensions_map, **{
+        ".js": "text/javascript",
+        ".json": "application/json",
+        ".webmanifest": "application/manifest+json",
+    })
+
+    def end_headers(self):
+        if self.path.lstrip("/").startswith(ASSET_DIR + "/"):
+            self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+        else:
+            self.send_header("Cache-Control", "no-cache")
+        super().end_headers()
+
+
+def serve(out_dir, host, port):
+    server = ThreadingHTTPServer((host, port), partial(PWARequestHandler, directory=out_dir))
+    print(f"Serving the offline app on http://{host}:{server.server_port}/", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main(argv=None):
+    from navigator.dataset import load_resources
+    from navigator.sync import SnapshotStore
+
+    parser = argparse.ArgumentParser(description="Generate the installable offline app.")
+    parser.add_argument("--dataset", default=settings.DATASET_PATH, help="resource dataset CSV")
+    parser.add_argument("-o", "--output", default=settings.PWA_DIR, help="directory to write the app to")
+    parser.add_argument("--serve", action="store_true", help="serve the directory after building it")
+    parser.add_argument("--host", default=settings.PWA_HOST)
+    parser.add_argument("--port", type=int, default=settings.PWA_PORT)
+    args = parser.parse_args(argv)
+
+    resources = load_resources(args.dataset)
+    # Same version numbers as the app's offline packages
+    version = SnapshotStore(settings.SYNC_STATE).publish(resources)
+    report = build_pwa(resources, args.output, version)
+    print(f"Offline app version {version}: {report['files']} files, {report['bytes'] / 1024:.0f} KB; "
+          f"{len(report['written'])} written, {len(report['removed'])} removed", file=sys.stderr)
+    if args.serve:
+        serve(args.output, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
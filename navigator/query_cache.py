@@ -0,0 +1,84 @@
+import threading
+from collections import OrderedDict
+
+from navigator import settings
+
+# Decimal places a location is rounded to in cache keys; 3 is about 100 m,
+# finer than a geocoded address or a phone's location fix is worth
+LOCATION_PRECISION = 3
+
+
+def round_location(location, precision=LOCATION_PRECISION):
+    if location is None:
+        return None
+    return round(float(location[0]), precision), round(float(location[1]), precision)
+
+
+# The inputs that decide a Resource Finder result list, normalized so that
+# equivalent queries share a key: "All" and no type are the same, services
+# and languages are unordered, search text ignores case and spacing, and the
+# location is rounded
+def query_key(version, location, radius_km, resource_type, services, languages, text=None,
+              open_slot=None, open_within=None):
+    return (
+        version,
+        round_location(location),
+        float(radius_km) if location is not None and radius_km is not None else None,
+        None if resource_type in (None, "", "All") else resource_type,
+        tuple(sorted(set(services))),
+        tuple(sorted(set(languages))),
+        " ".join(text.casefold().split()) if text else "",
+        (open_slot, open_within) if open_within is not None else None,
+    )
+
+
+# Bounded LRU of computed values shared by every session of the server
+# process. Everything in it was computed from one version of the dataset;
+# validate() empties it when the version changes. Values must not be
+# modified by callers, since other sessions get the same objects.
+class QueryCache:
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or settings.QUERY_CACHE_SIZE
+        self.version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def validate(self, version):
+        with self._lock:
+            if version != self.version:
+                if self._entries:
+                    self.invalidations += 1
+                    self._entries.clear()
+                self.version = version
+
+    # Cached value for key, or compute() stored under it. Returns the value
+    # and whether it came from the cache. Two sessions missing the same key
+    # at once both compute it; the values are equal, so either may be kept.
+    def get(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key], True
+            self.misses += 1
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value, False
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'entries': len(self._entries), 'max_entries': self.max_entries, 'hits': self.hits,
+                    'misses': self.misses, 'hit_rate': self.hits / lookups if lookups else 0.0,
+                    'evictions': self.evictions, 'invalidations': self.invalidations}
@@ -0,0 +1,21 @@
+import hashlib
+
+# Result cards shown per page in the Resource Finder
+PAGE_SIZE = 10
+
+
+# One page of a sorted result list. The cursor is the offset of the page's
+# first row; returns (start, stop, previous_cursor, next_cursor) with None
+# where there is no previous or next page.
+def paginate(total, cursor, page_size=PAGE_SIZE):
+    cursor = max(0, min(int(cursor), max(total - 1, 0)))
+    cursor -= cursor % page_size
+    stop = min(cursor + page_size, total)
+    previous_cursor = cursor - page_size if cursor > 0 else None
+    next_cursor = stop if stop < total else None
+    return cursor, stop, previous_cursor, next_cursor
+
+
+# Fingerprint of an ordered result list, so paging restarts when it changes
+def result_signature(positions):
+    return hashlib.blake2b(positions.tobytes(), digest_size=8).hexdigest()
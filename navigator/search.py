@@ -0,0 +1,158 @@
+import re
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+# Searchable columns and how much a match in each counts
+FIELD_WEIGHTS = {'name': 2.0, 'services': 1.0, 'address': 1.0, 'languages': 0.5}
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# Discount for query words matched only approximately
+PREFIX_WEIGHT = 0.8
+FUZZY_WEIGHT = 0.7
+# Words shorter than this are only matched exactly
+MIN_FUZZY_LENGTH = 4
+MAX_PREFIX_EXPANSIONS = 20
+# Scores closer than this count as tied and are ordered by distance
+SCORE_PRECISION = 3
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(str(text).casefold())
+
+
+def _deletes(term):
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+# Optimal string alignment distance, enough to confirm a fuzzy candidate
+def edit_distance(a, b):
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+# Allowed typos for a query word of this length
+def max_edits(length):
+    if length < MIN_FUZZY_LENGTH:
+        return 0
+    return 1 if length < 8 else 2
+
+
+# In-memory BM25 index over name, services, address and languages. Postings
+# are stored per term as CSR arrays; single-character deletions of every term
+# give typo-tolerant lookups (symmetric delete), and the sorted vocabulary
+# gives prefix matches for the word still being typed.
+class SearchIndex:
+    def __init__(self, resources):
+        self.size = len(resources)
+        frames = []
+        for field, weight in FIELD_WEIGHTS.items():
+            if field not in resources.columns:
+                continue
+            tokens = (resources[field].reset_index(drop=True).astype("string").fillna("")
+                      .str.casefold().str.findall(TOKEN_PATTERN.pattern).explode().dropna())
+            frames.append(pd.DataFrame({'doc': tokens.index.to_numpy(), 'term': tokens.to_numpy(dtype=object),
+                                        'weight': weight}))
+        pairs = pd.concat(frames) if frames else pd.DataFrame({'doc': [], 'term': [], 'weight': []})
+        pairs = pairs.groupby(['term', 'doc'], sort=True)['weight'].sum().reset_index()
+
+        term_codes, vocabulary = pd.factorize(pairs['term'], sort=True)
+        self.vocabulary = list(vocabulary)
+        self.term_ids = {term: i for i, term in enumerate(self.vocabulary)}
+        self.docs = pairs['doc'].to_numpy(dtype=np.int64)
+        self.tfs = pairs['weight'].to_numpy(dtype=np.float64)
+        self.offsets = np.searchsorted(term_codes, np.arange(len(self.vocabulary) + 1))
+
+        doc_lengths = np.bincount(self.docs, weights=self.tfs, minlength=self.size)
+        self.length_norm = K1 * (1 - B + B * doc_lengths / max(doc_lengths.mean() if self.size else 1.0, 1e-9))
+        doc_freq = np.diff(self.offsets)
+        self.idf = np.log(1 + (self.size - doc_freq + 0.5) / (doc_freq + 0.5))
+
+        self.deletes = {}
+        for term_id, term in enumerate(self.vocabulary):
+            if len(term) >= MIN_FUZZY_LENGTH and not term.isdigit():
+                for variant in _deletes(term):
+                    self.deletes.setdefault(variant, []).append(term_id)
+
+    # Vocabulary terms matching one query word, with their match weight
+    def expand(self, word, prefix=False):
+        matches = {}
+        if word in self.term_ids:
+            matches[self.term_ids[word]] = 1.0
+
+        # Numbers (street numbers, postal codes) must match exactly
+        allowed = 0 if word.isdigit() else max_edits(len(word))
+        if allowed:
+            candidates = set(self.deletes.get(word, ()))
+            for variant in _deletes(word):
+                candidates.update(self.deletes.get(variant, ()))
+                if variant in self.term_ids:
+                    candidates.add(self.term_ids[variant])
+            for term_id in candidates:
+                if term_id not in matches and edit_distance(word, self.vocabulary[term_id]) <= allowed:
+                    matches[term_id] = FUZZY_WEIGHT
+
+        if prefix:
+            i = bisect_left(self.vocabulary, word)
+            for term_id in range(i, min(i + MAX_PREFIX_EXPANSIONS, len(self.vocabulary))):
+                if not self.vocabulary[term_id].startswith(word):
+                    break
+                matches.setdefault(term_id, PREFIX_WEIGHT)
+        return matches
+
+    # BM25 score of every resource for the query; the last word also matches
+    # as a prefix so results follow the user's typing
+    def scores(self, query):
+        words = tokenize(query)
+        total = np.zeros(self.size)
+        for n, word in enumerate(words):
+            word_scores = np.zeros(self.size)
+            for term_id, weight in self.expand(word, prefix=n == len(words) - 1).items():
+                start, stop = self.offsets[term_id], self.offsets[term_id + 1]
+                docs, tfs = self.docs[start:stop], self.tfs[start:stop]
+                contribution = weight * self.idf[term_id] * tfs * (K1 + 1) / (tfs + self.length_norm[docs])
+                # A word counts once per resource, through its best match
+                word_scores[docs] = np.maximum(word_scores[docs], contribution)
+            total += word_scores
+        return total
+
+    # Matching results, best first, as indices into candidates (or positions
+    # when no candidates are given) plus their scores. candidates limits the
+    # search to given positions, such as filter results; distances, aligned
+    # with candidates, order equally relevant results nearest first.
+    def search(self, query, candidates=None, distances=None, limit=None):
+        scores = self.scores(query)
+        if candidates is None:
+            candidates = np.arange(self.size)
+        candidates = np.asarray(candidates, dtype=np.int64)
+        candidate_scores = scores[candidates]
+        # A term found in nearly every resource scores close to zero, so hits
+        # are picked on the raw score; rounding only decides ties
+        hits = np.flatnonzero(candidate_scores > 0)
+        rank = np.round(candidate_scores[hits], SCORE_PRECISION)
+
+        # Only results that can still make the cut need a full sort
+        if limit is not None and len(hits) > limit:
+            cutoff = np.partition(rank, len(hits) - limit)[len(hits) - limit]
+            keep = rank >= cutoff
+            hits, rank = hits[keep], rank[keep]
+
+        if distances is not None:
+            order = np.lexsort((np.asarray(distances)[hits], -rank))
+        else:
+            order = np.argsort(-rank, kind="stable")
+        hits = hits[order][:limit]
+        return hits, candidate_scores[hits]
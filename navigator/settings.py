@@ -0,0 +1,74 @@
+import os
+
+# Settings shared by the app and the offline tooling. Each can be overridden
+# with an environment variable so deployments don't need code changes.
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Writable directory for caches that should survive restarts
+CACHE_DIR = os.environ.get("NAVIGATOR_CACHE_DIR", os.path.join(BASE_DIR, ".cache"))
+
+# Geocoding
+GEOCODER_USER_AGENT = os.environ.get("NAVIGATOR_GEOCODER_USER_AGENT", "gbv_resource_navigator")
+GEOCODER_TIMEOUT = float(os.environ.get("NAVIGATOR_GEOCODER_TIMEOUT", "5"))
+# Nominatim-compatible search endpoint for batch geocoding; point it at
+# `python -m navigator.fake_nominatim` to prepare data without the network
+GEOCODER_URL = os.environ.get("NAVIGATOR_GEOCODER_URL", "https://nominatim.openstreetmap.org/search")
+
+# Offline map tiles: a local {z}/{x}/{y} tile directory to package tiles from.
+# Leave unset to build offline packages without map tiles.
+TILE_DIR = os.environ.get("NAVIGATOR_TILE_DIR") or None
+TILE_MIN_ZOOM = int(os.environ.get("NAVIGATOR_TILE_MIN_ZOOM", "10"))
+TILE_MAX_ZOOM = int(os.environ.get("NAVIGATOR_TILE_MAX_ZOOM", "14"))
+TILE_BUFFER_KM = float(os.environ.get("NAVIGATOR_TILE_BUFFER_KM", "5"))
+TILE_REGION_BUDGET_MB = float(os.environ.get("NAVIGATOR_TILE_REGION_BUDGET_MB", "20"))
+
+# Resource dataset produced by `python -m navigator.ingest`. The app falls
+# back to the built-in sample directory when this file does not exist.
+DATASET_PATH = os.environ.get("NAVIGATOR_DATASET", os.path.join(BASE_DIR, "data", "resources.csv"))
+
+# Performance instrumentation: per-rerun phase timings, an operator panel
+# opened with ?perf=<token>, and optionally a metrics endpoint on a side port
+# serving /metrics (Prometheus text) and /metrics.json
+PERF_ENABLED = os.environ.get("NAVIGATOR_PERF", "").lower() in ("1", "true", "yes")
+PERF_TOKEN = os.environ.get("NAVIGATOR_PERF_TOKEN") or None
+PERF_HOST = os.environ.get("NAVIGATOR_PERF_HOST", "127.0.0.1")
+PERF_PORT = int(os.environ.get("NAVIGATOR_PERF_PORT", "0")) or None
+
+# Headless query API (`python -m navigator.api`) for SMS/USSD gateways and
+# partner apps; radius used when a query gives a location but no radius or k
+API_HOST = os.environ.get("NAVIGATOR_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("NAVIGATOR_API_PORT", "8600"))
+API_DEFAULT_RADIUS_KM = float(os.environ.get("NAVIGATOR_API_DEFAULT_RADIUS_KM", "20"))
+
+# Installable offline app (`python -m navigator.pwa`): the directory its files
+# are generated into, the address `--serve` listens on, and the public URL
+# where the directory is served. The Offline Access page links to PWA_URL
+# and keeps the directory up to date when it is set.
+PWA_DIR = os.environ.get("NAVIGATOR_PWA_DIR", os.path.join(CACHE_DIR, "pwa"))
+PWA_HOST = os.environ.get("NAVIGATOR_PWA_HOST", "127.0.0.1")
+PWA_PORT = int(os.environ.get("NAVIGATOR_PWA_PORT", "8700"))
+PWA_URL = os.environ.get("NAVIGATOR_PWA_URL") or None
+
+# Live shelter availability (free beds, open/full/closed), shared by all
+# server processes; update it with `python -m navigator.availability set`
+AVAILABILITY_DB = os.environ.get("NAVIGATOR_AVAILABILITY_DB", os.path.join(CACHE_DIR, "availability.sqlite3"))
+
+# Memory-mapped snapshots of the dataset, shared by every session and
+# server process on the machine
+SNAPSHOT_DIR = os.environ.get("NAVIGATOR_SNAPSHOT_DIR", os.path.join(CACHE_DIR, "snapshots"))
+
+# Dataset versions and deltas for offline updates (navigator.sync), shared by
+# the app, the API and the offline app build so they number versions alike
+SYNC_STATE = os.environ.get("NAVIGATOR_SYNC_STATE", os.path.join(CACHE_DIR, "sync_state.json"))
+
+# Number of geographic partitions each server process keeps indexed in
+# memory; a search covers a handful, a 100 km one a dozen or so
+PARTITION_CACHE_SIZE = int(os.environ.get("NAVIGATOR_PARTITION_CACHE_SIZE", "64"))
+
+# Time zone that resources' opening hours are written in
+TIMEZONE = os.environ.get("NAVIGATOR_TIMEZONE", "Africa/Johannesburg")
+
+# Resource Finder result lists and rendered maps kept per server process,
+# shared by every session
+QUERY_CACHE_SIZE = int(os.environ.get("NAVIGATOR_QUERY_CACHE_SIZE", "256"))
+MAP_CACHE_SIZE = int(os.environ.get("NAVIGATOR_MAP_CACHE_SIZE", "64"))
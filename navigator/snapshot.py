@@ -0,0 +1,89 @@
+import glob
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+
+from navigator import settings
+from navigator.dataset import load_resources
+
+# Bump when the snapshot layout changes, so old files are not opened again
+SNAPSHOT_FORMAT = 1
+
+
+# Identifies the dataset file as it is now: a hash of its path, then a hash
+# of its size and modification time too, so a process can find an existing
+# snapshot without parsing the CSV
+def dataset_key(path=None):
+    path = os.path.abspath(path or settings.DATASET_PATH)
+    try:
+        stat = os.stat(path)
+        state = f"{stat.st_size}|{stat.st_mtime_ns}"
+    except OSError:
+        state = "sample"
+    source = hashlib.sha256(path.encode("utf-8")).hexdigest()[:8]
+    return f"{source}-{hashlib.sha256(f'{path}|{state}|{SNAPSHOT_FORMAT}'.encode('utf-8')).hexdigest()[:12]}"
+
+
+def snapshot_path(key, directory=None):
+    return os.path.join(directory or settings.SNAPSHOT_DIR, f"resources-{key}.arrow")
+
+
+# Write resources as an Arrow IPC file, atomically so other processes never
+# map a half-written one
+def write_snapshot(resources, path):
+    table = pa.Table.from_pandas(resources, preserve_index=False)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(temporary, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(temporary, path)
+
+
+# A pandas column over an Arrow column without copying its data: text stays
+# Arrow-backed, numbers become NumPy views of the buffers
+def _column(chunked):
+    if pa.types.is_string(chunked.type) or pa.types.is_large_string(chunked.type):
+        return pd.arrays.ArrowStringArray(chunked)
+    array = chunked.chunk(0) if chunked.num_chunks == 1 else chunked.combine_chunks()
+    if pa.types.is_floating(array.type) or pa.types.is_integer(array.type):
+        if array.null_count == 0:
+            return array.to_numpy(zero_copy_only=True)
+        if pa.types.is_integer(array.type):
+            dtype = np.dtype(array.type.to_pandas_dtype())
+            values = np.frombuffer(array.buffers()[1], dtype=dtype, count=len(array),
+                                   offset=array.offset * dtype.itemsize)
+            return pd.arrays.IntegerArray(values, array.is_null().to_numpy(zero_copy_only=False))
+    return chunked.to_pandas()
+
+
+# The resources in a snapshot file as a DataFrame over a memory map. The
+# pages come from the OS page cache and are shared by every process mapping
+# the file, so one copy of the data serves all sessions and workers. The
+# frame is read-only: nothing may modify it in place.
+def open_snapshot(path):
+    table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    return pd.DataFrame({name: _column(table.column(name)) for name in table.column_names}, copy=False)
+
+
+# Shared read-only snapshot of the dataset. The first process to see a
+# dataset file parses it and writes the snapshot; every other process just
+# maps it. Snapshots of older versions of the same file are removed.
+def load_snapshot(path=None, directory=None):
+    path = path or settings.DATASET_PATH
+    key = dataset_key(path)
+    target = snapshot_path(key, directory)
+    if not os.path.exists(target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        write_snapshot(load_resources(path), target)
+        source = key.split("-")[0]
+        for stale in glob.glob(os.path.join(os.path.dirname(target), f"resources-{source}-*.arrow")):
+            if stale != target:
+                try:
+                    os.remove(stale)
+                except OSError:
+                    # Still mapped by a process on a platform that forbids it
+                    pass
+    return open_snapshot(target)
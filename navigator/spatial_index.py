@@ -0,0 +1,120 @@
+import math
+
+import numpy as np
+
+from navigator.distance import distances_from, haversine_km
+
+# Size of one grid cell in degrees (~28 km north-south)
+CELL_DEG = 0.25
+# Conservative lower bound for the length of one degree, in km
+KM_PER_DEG = 110.5
+EARTH_HALF_CIRCUMFERENCE_KM = 20040.0
+# Haversine is within 0.5% of the ellipsoidal distance; with this margin it
+# safely rules out points before the exact (and costlier) distance is computed
+SPHERE_MARGIN = 1.01
+
+
+# Fixed lat/lon grid over resource coordinates. Points are bucketed by cell
+# once, so radius and nearest queries only look at cells near the query and
+# run exact distance checks on that short list.
+class SpatialIndex:
+    def __init__(self, latitudes, longitudes, cell_deg=CELL_DEG):
+        self.cell_deg = cell_deg
+        self.n_rows = int(math.ceil(180 / cell_deg)) + 1
+        self.n_cols = int(math.ceil(360 / cell_deg))
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+
+        keys = self._cell_keys(self.latitudes, self.longitudes)
+        # Positions sorted by cell, plus the start offset of each cell's run
+        self.order = np.argsort(keys, kind="stable")
+        self.cell_keys, self.cell_starts = np.unique(keys[self.order], return_index=True)
+        self.cell_ends = np.append(self.cell_starts[1:], len(self.order))
+
+    @classmethod
+    def from_resources(cls, resources, cell_deg=CELL_DEG):
+        if resources.empty:
+            return cls([], [], cell_deg)
+        return cls(resources['latitude'].to_numpy(), resources['longitude'].to_numpy(), cell_deg)
+
+    def __len__(self):
+        return len(self.latitudes)
+
+    def _cell_keys(self, latitudes, longitudes):
+        rows = np.floor((np.asarray(latitudes) + 90) / self.cell_deg).astype(np.int64)
+        cols = np.floor((np.asarray(longitudes) + 180) / self.cell_deg).astype(np.int64) % self.n_cols
+        return rows * self.n_cols + cols
+
+    # Positions of all points in cells overlapping the bounding box of the circle
+    def candidates(self, lat, lon, radius_km):
+        if len(self) == 0:
+            return np.empty(0, dtype=np.int64)
+
+        lat_span = radius_km / KM_PER_DEG
+        lat_min = max(lat - lat_span, -90.0)
+        lat_max = min(lat + lat_span, 90.0)
+        widest = max(abs(lat_min), abs(lat_max))
+        if widest >= 89.9 or radius_km >= EARTH_HALF_CIRCUMFERENCE_KM / 2:
+            lon_span = 180.0
+        else:
+            lon_span = min(lat_span / math.cos(math.radians(widest)), 180.0)
+
+        row_min = int(math.floor((lat_min + 90) / self.cell_deg))
+        row_max = int(math.floor((lat_max + 90) / self.cell_deg))
+        if lon_span >= 180.0:
+            col_ranges = [(0, self.n_cols - 1)]
+        else:
+            col_min = int(math.floor((lon - lon_span + 180) / self.cell_deg))
+            col_max = int(math.floor((lon + lon_span + 180) / self.cell_deg))
+            col_ranges = self._wrap_columns(col_min, col_max)
+
+        chunks = []
+        for row in range(row_min, row_max + 1):
+            for col_min, col_max in col_ranges:
+                first = np.searchsorted(self.cell_keys, row * self.n_cols + col_min, side="left")
+                last = np.searchsorted(self.cell_keys, row * self.n_cols + col_max, side="right")
+                if first < last:
+                    chunks.append(self.order[self.cell_starts[first]:self.cell_ends[last - 1]])
+        if not chunks:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(chunks)
+
+    def _wrap_columns(self, col_min, col_max):
+        if col_max - col_min + 1 >= self.n_cols:
+            return [(0, self.n_cols - 1)]
+        if col_min < 0:
+            return [(0, col_max), (col_min + self.n_cols, self.n_cols - 1)]
+        if col_max >= self.n_cols:
+            return [(col_min, self.n_cols - 1), (0, col_max - self.n_cols)]
+        return [(col_min, col_max)]
+
+    # Positions within radius_km of (lat, lon) and their distances, nearest
+    # first. With a boolean mask over all points, only points where it is set
+    # are considered, and distances are only computed for those.
+    def within(self, lat, lon, radius_km, mask=None):
+        positions = self.candidates(lat, lon, radius_km)
+        if mask is not None:
+            positions = positions[mask[positions]]
+        rough = haversine_km(lat, lon, self.latitudes[positions], self.longitudes[positions])
+        positions = positions[rough <= radius_km * SPHERE_MARGIN]
+        distances = distances_from((lat, lon), self.latitudes[positions], self.longitudes[positions])
+        keep = distances <= radius_km
+        positions, distances = positions[keep], distances[keep]
+        ordering = np.argsort(distances, kind="stable")
+        return positions[ordering], distances[ordering]
+
+    # The k positions nearest to (lat, lon) and their distances, nearest first.
+    # With a boolean mask over all points, only points where it is set count.
+    def nearest(self, lat, lon, k, mask=None):
+        k = min(k, len(self) if mask is None else int(np.count_nonzero(mask)))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        # Grow the search radius until it holds k points; anything outside the
+        # final radius is farther than all of them, so the top k are exact.
+        radius_km = self.cell_deg * KM_PER_DEG
+        while True:
+            positions, distances = self.within(lat, lon, radius_km, mask)
+            if len(positions) >= k or radius_km >= EARTH_HALF_CIRCUMFERENCE_KM:
+                return positions[:k], distances[:k]
+            radius_km = min(radius_km * 2, EARTH_HALF_CIRCUMFERENCE_KM)
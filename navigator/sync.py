@@ -0,0 +1,275 @@
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Number of deltas kept before the oldest ones are compacted together
+MAX_DELTAS = 20
+# A delta touching more than this share of the dataset is no cheaper than a
+# full package, so it is dropped rather than kept around
+MAX_DELTA_SHARE = 0.5
+SYNC_FORMAT = 1
+# Record digests are the first 12 hex digits of a SHA-256, summed modulo
+# 2**48 so the sum stays exact in JavaScript numbers
+DIGEST_LENGTH = 12
+DIGEST_MODULUS = 2 ** 48
+
+
+# Stable identifier per resource: the dataset's own 'id' column when present,
+# otherwise a hash of name and address
+def resource_ids(resources):
+    if 'id' in resources.columns:
+        return [str(value) for value in resources['id']]
+    return [
+        hashlib.sha1(f"{name}|{address}".encode("utf-8")).hexdigest()[:12]
+        for name, address in zip(resources['name'], resources['address'])
+    ]
+
+
+def _json_value(value):
+    if pd.isna(value):
+        return None
+    if hasattr(value, "item"):
+        value = value.item()
+    return value
+
+
+# Resources as {id: record} with JSON-safe values
+def to_records(resources):
+    columns = [column for column in resources.columns if column != 'id']
+    return {
+        rid: {column: _json_value(value) for column, value in zip(columns, row)}
+        for rid, row in zip(resource_ids(resources), resources[columns].itertuples(index=False, name=None))
+    }
+
+
+# Whole floats are written as integers: the offline page's JavaScript can't
+# tell 28.0 from 28, and both sides must serialize records identically
+def _canonical(value):
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e16:
+        return int(value)
+    return value
+
+
+# Digest of one record, as navigator/data/offline_sync.js computes it
+def record_digest(rid, record):
+    canonical = {column: _canonical(value) for column, value in record.items()}
+    text = rid + "\n" + json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:DIGEST_LENGTH], 16)
+
+
+# Checksum of a dataset from its record digests. A sum rather than a hash of
+# hashes, so a client can check a delta by adjusting the checksum it holds.
+def combine_digests(digests):
+    return f"{sum(digests) % DIGEST_MODULUS:0{DIGEST_LENGTH}x}"
+
+
+# Checksum over a {id: record} mapping, the same on server and client
+def records_checksum(records):
+    return combine_digests(record_digest(rid, record) for rid, record in records.items())
+
+
+# Bring a client's {id: record} mapping up to date with a delta, in place.
+# Upserts and removals are idempotent, so a delta starting at an older version
+# is also safe to apply to any version it spans.
+def apply_delta(records, delta):
+    records.update(delta["added"])
+    records.update(delta["changed"])
+    for rid in delta["removed"]:
+        records.pop(rid, None)
+    return records
+
+
+def _diff(old, new, from_version, to_version):
+    return {
+        "from_version": from_version,
+        "to_version": to_version,
+        "added": {rid: record for rid, record in new.items() if rid not in old},
+        "changed": {rid: record for rid, record in new.items() if rid in old and old[rid] != record},
+        "removed": sorted(rid for rid in old if rid not in new),
+    }
+
+
+# Merge two consecutive deltas into one spanning both. Every id touched by
+# either is kept, so the result is correct for clients at any version between.
+def compose_deltas(first, second):
+    added = dict(first["added"])
+    changed = dict(first["changed"])
+    removed = set(first["removed"])
+    for rid, record in second["added"].items():
+        if rid in removed:
+            removed.discard(rid)
+            changed[rid] = record
+        else:
+            added[rid] = record
+    for rid, record in second["changed"].items():
+        if rid in added:
+            added[rid] = record
+        else:
+            changed[rid] = record
+    for rid in second["removed"]:
+        added.pop(rid, None)
+        changed.pop(rid, None)
+        removed.add(rid)
+    return {
+        "from_version": first["from_version"],
+        "to_version": second["to_version"],
+        "added": added,
+        "changed": changed,
+        "removed": sorted(removed),
+    }
+
+
+def _delta_size(delta):
+    return len(delta["added"]) + len(delta["changed"]) + len(delta["removed"])
+
+
+# Exclusive lock on a file shared by every process on the machine
+@contextlib.contextmanager
+def _file_lock(path):
+    with open(path, "a+b") as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# Versioned snapshots of the resource dataset. Each publish of changed data
+# bumps the version and records a delta from the previous one; clients ask
+# for the delta from the version they hold instead of the whole package.
+class SnapshotStore:
+    def __init__(self, path=None, max_deltas=MAX_DELTAS, clock=time.time):
+        self.path = path
+        self.max_deltas = max_deltas
+        self.clock = clock
+        self.version = 0
+        self.records = {}
+        self.checksum = records_checksum({})
+        self.published_at = None
+        self.deltas = []
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+
+    # Publish a dataset; returns its version (unchanged if the data is).
+    # Server processes share the state file, so the latest state is re-read
+    # under a file lock first: a version read at startup may have been taken
+    # by another process since, for different data.
+    def publish(self, resources):
+        records = to_records(resources)
+        checksum = records_checksum(records)
+        with self._lock, self._shared():
+            if self.path:
+                self._load()
+            if checksum == self.checksum and self.version:
+                return self.version
+            version = self.version + 1
+            if self.version:
+                self.deltas.append(_diff(self.records, records, self.version, version))
+                self._compact()
+            self.version = version
+            self.records = records
+            self.checksum = checksum
+            self.published_at = self.clock()
+            self._save()
+            return version
+
+    def manifest(self):
+        with self._lock:
+            return {
+                "format": SYNC_FORMAT,
+                "version": self.version,
+                "checksum": self.checksum,
+                "count": len(self.records),
+                "published_at": self.published_at,
+                "oldest_delta_version": self.deltas[0]["from_version"] if self.deltas else self.version,
+            }
+
+    # Delta taking a client from `version` to the latest one, or None when
+    # that version is unknown or too old and a full package is needed
+    def delta_since(self, version):
+        with self._lock:
+            if version == self.version:
+                delta = _diff({}, {}, version, version)
+            else:
+                span = [d for d in self.deltas if d["to_version"] > version]
+                if not span or span[0]["from_version"] > version or version > self.version:
+                    return None
+                delta = span[0]
+                for following in span[1:]:
+                    delta = compose_deltas(delta, following)
+                delta = dict(delta, from_version=version)
+            return dict(delta, format=SYNC_FORMAT, checksum=self.checksum)
+
+    # Keep the history bounded: merge the oldest deltas together, and drop
+    # ones grown so large that a full download is as cheap
+    def _compact(self):
+        while len(self.deltas) > self.max_deltas:
+            merged = compose_deltas(self.deltas[0], self.deltas[1])
+            self.deltas[:2] = [merged]
+        limit = max(1, int(len(self.records) * MAX_DELTA_SHARE))
+        while self.deltas and _delta_size(self.deltas[0]) > limit and len(self.deltas) > 1:
+            self.deltas.pop(0)
+
+    def _shared(self):
+        if not self.path:
+            return contextlib.nullcontext()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        return _file_lock(self.path + ".lock")
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        if state.get("format") != SYNC_FORMAT:
+            return
+        self.version = state["version"]
+        self.records = state["records"]
+        self.checksum = state["checksum"]
+        self.published_at = state.get("published_at")
+        self.deltas = state["deltas"]
+
+    # Persist so versions stay meaningful to clients across restarts
+    def _save(self):
+        if not self.path:
+            return
+        state = {
+            "format": SYNC_FORMAT,
+            "version": self.version,
+            "checksum": self.checksum,
+            "published_at": self.published_at,
+            "records": self.records,
+            "deltas": self.deltas,
+        }
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(state, f, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
@@ -0,0 +1,268 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import tempfile
+from collections import Counter
+
+import numpy as np
+
+# Defaults for the offline tile pack: street-level detail around resources
+DEFAULT_MIN_ZOOM = 10
+DEFAULT_MAX_ZOOM = 14
+# Distance around each resource covered by tiles
+DEFAULT_BUFFER_KM = 5.0
+# Size budget per region, in bytes
+DEFAULT_REGION_BUDGET = 20 * 1024 * 1024
+TILE_EXTENSIONS = ("png", "jpg", "jpeg", "webp", "pbf")
+KM_PER_DEG_LAT = 110.574
+
+
+# Slippy-map tile containing a point
+def tile_for(lat, lon, zoom):
+    n = 2 ** zoom
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+# All (x, y) tiles covering a (south, west, north, east) box at a zoom level
+def tiles_in_bbox(bbox, zoom):
+    south, west, north, east = bbox
+    x_min, y_min = tile_for(north, west, zoom)
+    x_max, y_max = tile_for(south, east, zoom)
+    for x in range(x_min, x_max + 1):
+        for y in range(y_min, y_max + 1):
+            yield x, y
+
+
+# Tiles laid out as {z}/{x}/{y}.<ext> on local disk, as written by most tile
+# exporters and tile caches. Also serves as the stand-in source for tests.
+class TileDirectory:
+    def __init__(self, root):
+        self.root = root
+        self.format = None
+
+    def get(self, z, x, y):
+        for ext in TILE_EXTENSIONS:
+            path = os.path.join(self.root, str(z), str(x), f"{y}.{ext}")
+            if os.path.exists(path):
+                self.format = self.format or ("jpg" if ext == "jpeg" else ext)
+                with open(path, "rb") as f:
+                    return f.read()
+        return None
+
+
+# A named area to package tiles for. `bbox` bounds the whole region; tiles
+# are only packaged within `boxes`, the buffer around each of its resources,
+# so the empty ground between far-apart resources in one region is left out.
+class Region:
+    def __init__(self, name, bbox, resource_count, boxes=None):
+        self.name = name
+        self.bbox = bbox
+        self.resource_count = resource_count
+        self.boxes = boxes or [bbox]
+
+    # The region's (x, y) tiles at a zoom level, each once
+    def tiles(self, zoom):
+        tiles = set()
+        for bbox in self.boxes:
+            tiles.update(tiles_in_bbox(bbox, zoom))
+        return sorted(tiles)
+
+
+def _overlaps(a, b):
+    return not (a[2] < b[0] or b[2] < a[0] or a[3] < b[1] or b[3] < a[1])
+
+
+def _merge(a, b):
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+# One sweep from west to east over [bbox, members] items, merging each box
+# into the boxes it overlaps among those still open at its west edge. Boxes
+# that no longer overlap are closed, so a sweep only compares a box with the
+# few regions beside it rather than with every other box.
+def _sweep_merge(boxes):
+    boxes.sort(key=lambda item: item[0][1])
+    open_boxes, closed = [], []
+    for bbox, members in boxes:
+        still_open = []
+        for item in open_boxes:
+            (closed if item[0][3] < bbox[1] else still_open).append(item)
+        touching = [item for item in still_open if _overlaps(item[0], bbox)]
+        if not touching:
+            still_open.append([bbox, members])
+        else:
+            target = max(touching, key=lambda item: len(item[1]))
+            target[0] = _merge(target[0], bbox)
+            target[1].extend(members)
+            for item in touching:
+                if item is not target:
+                    target[0] = _merge(target[0], item[0])
+                    target[1].extend(item[1])
+            absorbed = {id(item) for item in touching if item is not target}
+            still_open = [item for item in still_open if id(item) not in absorbed]
+        open_boxes = still_open
+    return closed + open_boxes
+
+
+def _region_name(address):
+    parts = [part.strip() for part in str(address).split(",") if part.strip()]
+    return parts[-1] if parts else "Region"
+
+
+# Boxes of buffer_km around each resource, merged where they overlap, so a
+# city with many services becomes one region instead of dozens. The merged
+# box only names and groups the region; each region keeps its resources' own
+# boxes for the tiles.
+def resource_regions(resources, buffer_km=DEFAULT_BUFFER_KM):
+    lats = resources['latitude'].to_numpy(dtype=float)
+    lons = resources['longitude'].to_numpy(dtype=float)
+    lat_pad = buffer_km / KM_PER_DEG_LAT
+    lon_pads = buffer_km / (KM_PER_DEG_LAT * np.maximum(np.cos(np.radians(lats)), 0.01))
+    boxes = [[bbox, [(address, bbox)]] for bbox, address in zip(
+        zip((lats - lat_pad).tolist(), (lons - lon_pads).tolist(), (lats + lat_pad).tolist(),
+            (lons + lon_pads).tolist()), resources['address'])]
+
+    # A merged box can reach back over a region the sweep already closed, so
+    # sweep again until no two boxes overlap; that settles in a pass or two
+    while True:
+        merged = _sweep_merge(boxes)
+        if len(merged) == len(boxes):
+            break
+        boxes = merged
+
+    regions = []
+    used_names = {}
+    for bbox, members in boxes:
+        name = Counter(_region_name(address) for address, _ in members).most_common(1)[0][0]
+        used_names[name] = used_names.get(name, 0) + 1
+        if used_names[name] > 1:
+            name = f"{name} ({used_names[name]})"
+        regions.append(Region(name, bbox, len(members), [member for _, member in members]))
+    return regions
+
+
+_SCHEMA = """
+CREATE TABLE metadata (name TEXT, value TEXT);
+CREATE TABLE images (tile_id TEXT PRIMARY KEY, tile_data BLOB);
+CREATE TABLE map (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_id TEXT,
+                  PRIMARY KEY (zoom_level, tile_column, tile_row));
+CREATE VIEW tiles AS
+    SELECT map.zoom_level AS zoom_level, map.tile_column AS tile_column,
+           map.tile_row AS tile_row, images.tile_data AS tile_data
+    FROM map JOIN images ON images.tile_id = map.tile_id;
+"""
+
+
+# Build an MBTiles archive for the regions. Identical tiles (open sea, empty
+# veld) are stored once in `images` and referenced from `map`. Returns the
+# archive bytes and a size report: each region's bytes are those of the
+# distinct tile images it needs on its own, whatever order regions come in,
+# and the report's bytes are the deduplicated total actually stored.
+def build_tile_pack(regions, source, min_zoom=DEFAULT_MIN_ZOOM, max_zoom=DEFAULT_MAX_ZOOM,
+                    region_budget=DEFAULT_REGION_BUDGET, name="SafePath Navigator offline tiles"):
+    fd, path = tempfile.mkstemp(suffix=".mbtiles")
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(path)
+        conn.executescript(_SCHEMA)
+        # Tile id and size of every tile stored so far
+        stored_tiles = {}
+        stored_images = set()
+        report = {"regions": [], "min_zoom": min_zoom, "max_zoom": max_zoom, "region_budget": region_budget,
+                  "bytes": 0}
+
+        for region in regions:
+            entry = {"name": region.name, "bbox": list(region.bbox), "resources": region.resource_count,
+                     "tiles": 0, "missing": 0, "shared": 0, "images": 0, "bytes": 0}
+            region_images = set()
+            for z in range(min_zoom, max_zoom + 1):
+                for x, y in region.tiles(z):
+                    if (z, x, y) in stored_tiles:
+                        # Also in an earlier region: stored once, counted in both
+                        tile_id, size = stored_tiles[(z, x, y)]
+                        entry["shared"] += 1
+                    else:
+                        data = source.get(z, x, y)
+                        if data is None:
+                            entry["missing"] += 1
+                            continue
+                        tile_id, size = hashlib.sha1(data).hexdigest(), len(data)
+                        if tile_id not in stored_images:
+                            conn.execute("INSERT INTO images VALUES (?, ?)", (tile_id, data))
+                            stored_images.add(tile_id)
+                            report["bytes"] += size
+                        # MBTiles rows count from the south (TMS scheme)
+                        conn.execute("INSERT INTO map VALUES (?, ?, ?, ?)", (z, x, 2 ** z - 1 - y, tile_id))
+                        stored_tiles[(z, x, y)] = (tile_id, size)
+                    entry["tiles"] += 1
+                    if tile_id not in region_images:
+                        region_images.add(tile_id)
+                        entry["images"] += 1
+                        entry["bytes"] += size
+            entry["over_budget"] = entry["bytes"] > region_budget
+            report["regions"].append(entry)
+
+        bounds = _overall_bounds(regions)
+        metadata = {
+            "name": name,
+            "format": source.format or "png",
+            "type": "baselayer",
+            "version": "1",
+            "minzoom": str(min_zoom),
+            "maxzoom": str(max_zoom),
+            "bounds": ",".join(f"{v:.5f}" for v in (bounds[1], bounds[0], bounds[3], bounds[2])),
+        }
+        conn.executemany("INSERT INTO metadata VALUES (?, ?)", metadata.items())
+        conn.commit()
+        conn.execute("VACUUM")
+        conn.close()
+
+        with open(path, "rb") as f:
+            archive = f.read()
+        report["tiles"] = len(stored_tiles)
+        report["unique_images"] = len(stored_images)
+        report["archive_bytes"] = len(archive)
+        return archive, report
+    finally:
+        os.remove(path)
+
+
+def _overall_bounds(regions):
+    if not regions:
+        return (0.0, 0.0, 0.0, 0.0)
+    boxes = np.array([region.bbox for region in regions])
+    return (boxes[:, 0].min(), boxes[:, 1].min(), boxes[:, 2].max(), boxes[:, 3].max())
+
+
+# Command line use: package tiles for a dataset from a local tile directory
+def main(argv=None):
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Build an offline MBTiles pack around resources.")
+    parser.add_argument("dataset", help="resource CSV with latitude, longitude and address columns")
+    parser.add_argument("tile_dir", help="directory of {z}/{x}/{y} tiles")
+    parser.add_argument("-o", "--output", default="resources.mbtiles")
+    parser.add_argument("--min-zoom", type=int, default=DEFAULT_MIN_ZOOM)
+    parser.add_argument("--max-zoom", type=int, default=DEFAULT_MAX_ZOOM)
+    parser.add_argument("--buffer-km", type=float, default=DEFAULT_BUFFER_KM)
+    parser.add_argument("--budget-mb", type=float, default=DEFAULT_REGION_BUDGET / 1024 / 1024)
+    args = parser.parse_args(argv)
+
+    resources = pd.read_csv(args.dataset)
+    archive, report = build_tile_pack(
+        resource_regions(resources, args.buffer_km), TileDirectory(args.tile_dir),
+        args.min_zoom, args.max_zoom, int(args.budget_mb * 1024 * 1024)
+    )
+    with open(args.output, "wb") as f:
+        f.write(archive)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import pandas as pd
+
+from navigator.api import QueryAPI
+from navigator.engine import QueryEngine
+
+
+def _engine():
+    resources = pd.DataFrame({
+        'name': ["Legal Aid Clinic A", "Shelter B", "Shelter C", "Legal Aid Clinic D", "Counselling E",
+                 "Legal Aid Clinic F"],
+        'type': ["Legal Aid", "Shelter", "Shelter", "Legal Aid", "Counseling", "Legal Aid"],
+        'address': ["1 Main Rd", "2 Main Rd", "3 Main Rd", "4 Main Rd", "5 Main Rd", "6 Main Rd"],
+        'phone': ["011 000 0001"] * 6,
+        'hours': ["24/7"] * 6,
+        'capacity': [None] * 6,
+        # Nearest first: the shelters and counselling are nearer than clinics D and F
+        'latitude': [-26.30, -26.201, -26.202, -26.25, -26.203, -26.40],
+        'longitude': [28.04] * 6,
+        'services': ["protection orders", "emergency shelter", "emergency shelter", "protection orders",
+                     "trauma counselling", "protection orders"],
+        'languages': ["English, Zulu"] * 6,
+    })
+    engine = QueryEngine(resources)
+    engine.version = "test"
+    return QueryAPI(engine)
+
+
+# k applies to the matches of q, not to the resources searched
+def test_nearest_with_text_keeps_nearest_matches():
+    status, body = _engine().handle("GET", "/v1/resources?lat=-26.2&lon=28.04&k=2&q=legal+aid")
+    assert status == 200
+    assert body['total'] == 2
+    assert sorted(result['name'] for result in body['results']) == ["Legal Aid Clinic A", "Legal Aid Clinic D"]
+
+
+def test_nearest_without_text():
+    status, body = _engine().handle("GET", "/v1/resources?lat=-26.2&lon=28.04&k=3")
+    assert status == 200
+    assert [result['name'] for result in body['results']] == ["Shelter B", "Shelter C", "Counselling E"]
+
+
+def test_names_match_in_any_case():
+    status, body = _engine().handle("GET", "/v1/resources?type=legal+aid&language=zulu")
+    assert status == 200
+    assert body['total'] == 3
+
+
+def test_non_finite_numbers_are_rejected():
+    status, _ = _engine().handle("GET", "/v1/resources?lat=nan&lon=28")
+    assert status == 400
@@ -0,0 +1,22 @@
+import time
+from datetime import datetime, timezone
+
+from navigator import settings
+from navigator.availability import LiveAvailability
+
+
+# Update times read in the directory's time zone whatever the server's is
+def test_describe_uses_directory_time_zone(monkeypatch):
+    monkeypatch.setattr(settings, "TIMEZONE", "Africa/Johannesburg")
+    # A server clock set elsewhere, where the platform allows changing it
+    tzset = getattr(time, "tzset", lambda: None)
+    monkeypatch.setenv("TZ", "America/New_York")
+    tzset()
+    try:
+        live = LiveAvailability({"a": 0}, 1)
+        live.status[0], live.beds[0] = 0, 3
+        live.updated_at[0] = datetime(2024, 1, 1, 12, 5, tzinfo=timezone.utc).timestamp()
+        assert live.describe(0).endswith("3 beds free (updated 14:05)")
+    finally:
+        monkeypatch.undo()
+        tzset()
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+
+from navigator.batch_geocoder import FAILED, FOUND, NOT_FOUND, BatchGeocoder, Checkpoint
+from navigator.fake_nominatim import FakeNominatim
+from navigator.geocoding import GeocodeCache
+from navigator.ingest import ingest
+
+ADDRESSES = [f"{i} Church Street, Town {i}" for i in range(12)]
+
+
+def _geocoder(fake, **options):
+    options = dict({'rate_limit': 200, 'concurrency': 4, 'backoff': 0.01}, **options)
+    return BatchGeocoder(fake.url, **options)
+
+
+def test_requests_respect_the_rate_limit():
+    with FakeNominatim() as fake:
+        results = _geocoder(fake, rate_limit=20).resolve_many(ADDRESSES)
+    assert all(results[address] for address in ADDRESSES)
+    assert fake.requests == len(ADDRESSES)
+    gaps = np.diff(sorted(fake.request_times))
+    # Arrival times jitter a little around the limiter's slots
+    assert gaps.min() > 0.8 / 20
+    assert fake.max_in_flight <= 4
+
+
+def test_failed_requests_are_retried():
+    with FakeNominatim(failure_rate=0.4, seed=3) as fake:
+        geocoder = _geocoder(fake, max_retries=8)
+        results = geocoder.resolve_many(ADDRESSES)
+    assert all(results[address] for address in ADDRESSES)
+    assert fake.failures > 0
+    assert geocoder.requests == fake.requests == len(ADDRESSES) + fake.failures
+
+
+# A run that failed is resumed from its checkpoint: failures are looked up
+# again, even with the shared cache in between, and finished lookups aren't
+def test_resume_retries_failures_only(tmp_path):
+    checkpoint = str(tmp_path / "checkpoint.jsonl")
+    cache = GeocodeCache()
+    addresses = ADDRESSES + ["1 Nowhere Lane"]
+    with FakeNominatim(failure_rate=1.0) as fake:
+        results = _geocoder(fake, max_retries=0, checkpoint_path=checkpoint, cache=cache).resolve_many(addresses)
+    assert results == {address: None for address in addresses}
+    assert {entry['status'] for entry in Checkpoint(checkpoint).results.values()} == {FAILED}
+
+    with FakeNominatim() as fake:
+        results = _geocoder(fake, checkpoint_path=checkpoint, cache=cache).resolve_many(addresses)
+    assert fake.requests == len(addresses)
+    assert all(results[address] for address in ADDRESSES)
+    assert results["1 Nowhere Lane"] is None
+    statuses = {query: entry['status'] for query, entry in Checkpoint(checkpoint).results.items()}
+    assert statuses == dict({address: FOUND for address in ADDRESSES}, **{"1 Nowhere Lane": NOT_FOUND})
+
+    with FakeNominatim() as fake:
+        again = _geocoder(fake, checkpoint_path=checkpoint).resolve_many(addresses)
+    assert fake.requests == 0
+    assert again == results
+
+
+# A failed interactive lookup cached for a minute isn't read as "not found"
+def test_cached_failures_are_looked_up(tmp_path):
+    cache = GeocodeCache()
+
+    def unreachable(query):
+        raise OSError("network down")
+
+    assert cache.lookup(ADDRESSES[0], unreachable) is None
+    with FakeNominatim() as fake:
+        results = _geocoder(fake, cache=cache).resolve_many(ADDRESSES[:1])
+    assert fake.requests == 1
+    assert results[ADDRESSES[0]] is not None
+    assert cache.get(ADDRESSES[0]) == results[ADDRESSES[0]]
+
+
+# One checkpoint serves every chunk of an ingest run, and a later run
+# resumes from it without any request
+def test_ingest_shares_one_checkpoint(tmp_path):
+    path = tmp_path / "partners.csv"
+    pd.DataFrame({'name': [f"Centre {i}" for i in range(len(ADDRESSES))], 'address': ADDRESSES}).to_csv(path, index=False)
+    checkpoint_path = str(tmp_path / "checkpoint.jsonl")
+
+    with FakeNominatim() as fake:
+        checkpoint = Checkpoint(checkpoint_path)
+        try:
+            report = ingest([str(path)], str(tmp_path / "out.csv"), _geocoder(fake), chunk_size=5, checkpoint=checkpoint)
+        finally:
+            checkpoint.close()
+    assert report.geocoded == len(ADDRESSES)
+    assert sorted(checkpoint.results) == sorted(ADDRESSES)
+
+    with FakeNominatim() as fake:
+        checkpoint = Checkpoint(checkpoint_path)
+        report = ingest([str(path)], str(tmp_path / "again.csv"), _geocoder(fake), chunk_size=5, checkpoint=checkpoint)
+        checkpoint.close()
+    assert fake.requests == 0
+    assert report.geocoded == len(ADDRESSES)
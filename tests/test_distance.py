@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from geopy.distance import geodesic
+
+from navigator.distance import distance_matrix, distances_from, geodesic_km, nearest
+
+# Johannesburg, Cape Town, Durban, Gqeberha, a Karoo farm, two Soweto clinics
+# 50 m apart, and points near both poles and on the equator
+POINTS = [(-26.2041, 28.0473), (-33.9249, 18.4241), (-29.8587, 31.0218), (-33.9608, 25.6022),
+          (-31.5, 22.25), (-26.2485, 27.8540), (-26.2489, 27.8543), (89.99, 10.0), (89.9, -170.0),
+          (-89.5, 20.0), (-89.5, -160.0), (0.0, 0.0), (0.0, 90.0)]
+# Nearly antipodal pairs, where Vincenty's formula may not converge and the
+# haversine fallback is used instead
+ANTIPODAL = [((0.0, 0.0), (0.0, 180.0)), ((0.0, 0.0), (0.5, 179.7)), ((0.0, 0.0), (0.0, 179.5)),
+             ((10.0, 20.0), (-10.0, -160.0)), ((45.0, 0.0), (-45.0, 179.9)), ((89.99, 10.0), (-89.99, -170.0))]
+
+
+def _geopy_km(a, b):
+    return geodesic(a, b).km
+
+
+def test_matches_geopy_within_a_metre():
+    for a in POINTS:
+        for b in POINTS:
+            assert abs(float(geodesic_km(a[0], a[1], b[0], b[1])) - _geopy_km(a, b)) < 1e-3
+
+
+def test_near_antipodal_points_within_half_a_percent():
+    for a, b in ANTIPODAL:
+        expected = _geopy_km(a, b)
+        assert float(geodesic_km(a[0], a[1], b[0], b[1])) == pytest.approx(expected, rel=0.005)
+
+
+def test_vectorized_distances_match_geopy():
+    latitudes, longitudes = np.array(POINTS).T
+    for origin in POINTS:
+        distances = distances_from(origin, latitudes, longitudes)
+        assert np.allclose(distances, [_geopy_km(origin, point) for point in POINTS], atol=1e-3, rtol=0)
+
+    matrix = distance_matrix(POINTS, POINTS)
+    assert matrix.shape == (len(POINTS), len(POINTS))
+    assert np.allclose(matrix, [[_geopy_km(a, b) for b in POINTS] for a in POINTS], atol=1e-3, rtol=0)
+
+
+# Nearest-first order is geopy's, down to the two clinics 50 m apart
+def test_ordering_matches_geopy():
+    latitudes, longitudes = np.array(POINTS).T
+    for origin in POINTS[:7]:
+        order = np.argsort(distances_from(origin, latitudes, longitudes), kind="stable")
+        expected = sorted(range(len(POINTS)), key=lambda i: _geopy_km(origin, POINTS[i]))
+        assert list(order) == expected
+
+
+def test_nearest_matches_geopy():
+    origins = [(-26.25, 27.85), (-33.0, 19.0), (89.95, 0.0), (-89.0, -150.0)]
+    positions, distances = nearest(origins, POINTS)
+    for origin, position, distance in zip(origins, positions, distances):
+        expected = min(range(len(POINTS)), key=lambda i: _geopy_km(origin, POINTS[i]))
+        assert position == expected
+        assert distance == pytest.approx(_geopy_km(origin, POINTS[expected]), abs=1e-3)
@@ -0,0 +1,140 @@
+import json
+import shutil
+import subprocess
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from navigator.offline_index import build_offline_index
+from navigator.offline_package import OFFLINE_SYNC_SCRIPT_PATH
+from navigator.sync import SnapshotStore, apply_delta, records_checksum, to_records
+
+NODE = shutil.which("node")
+
+# Reads an index and a delta as JSON on stdin, prints the updated index or the
+# error that stopped it
+APPLY_SCRIPT = """
+const OfflineSync = require(process.argv[1]);
+const input = JSON.parse(require("fs").readFileSync(0, "utf8"));
+try {
+    console.log(JSON.stringify({index: OfflineSync.applyDelta(input.index, input.delta)}));
+} catch (error) {
+    console.log(JSON.stringify({error: error.message}));
+}
+"""
+
+
+def _resources(n, seed):
+    rng = np.random.default_rng(seed)
+    types = ["Shelter", "Clinic", "Legal Aid", "Counselling Centre"]
+    services = ["24 hour helpline, counselling", "legal advice; court support", "medical care and HIV testing",
+                "shelter for women & children", "transport to clinic"]
+    languages = ["English, isiZulu", "English / Afrikaans", "Sesotho and English", "isiXhosa", None]
+    return pd.DataFrame({
+        'name': [f"Centre {i} Ikhaya Lethemba – Sóweto" if i % 7 == 0 else f"Centre {i}" for i in range(n)],
+        'type': [types[i % len(types)] for i in range(n)],
+        'address': [f"{i} Main Rd, Town {i % 5}" for i in range(n)],
+        'phone': [f"011 555 {i:04d}" for i in range(n)],
+        'hours': ["24/7" if i % 3 == 0 else "Mon-Fri 08:00-17:00" for i in range(n)],
+        'capacity': [float(i % 40) if i % 4 else np.nan for i in range(n)],
+        'latitude': np.round(rng.uniform(-34.5, -22.5, n), 6),
+        'longitude': np.round(rng.uniform(17.0, 32.5, n), 6),
+        'services': [services[i % len(services)] for i in range(n)],
+        'languages': [languages[i % len(languages)] for i in range(n)],
+    })
+
+
+# Old and new datasets with rows removed, changed and added, including a new
+# type, a new language and a whole-number coordinate
+def _datasets():
+    old = _resources(60, seed=1)
+    new = old.drop(index=[3, 10, 11]).copy()
+    new.loc[5, 'phone'] = "011 555 9999"
+    new.loc[6, 'services'] = "paralegal help"
+    new.loc[7, 'capacity'] = 12.0
+    added = _resources(5, seed=2).assign(name=[f"New centre {i}" for i in range(5)], type="Police Station",
+                                         languages="Tshivenda")
+    added.loc[0, 'latitude'] = -26.0
+    return old, pd.concat([new, added], ignore_index=True)
+
+
+def _apply(index, delta):
+    result = subprocess.run([NODE, "-e", APPLY_SCRIPT, OFFLINE_SYNC_SCRIPT_PATH], input=json.dumps({"index": index, "delta": delta}),
+                            capture_output=True, text=True, encoding="utf-8", check=True)
+    return json.loads(result.stdout)
+
+
+# Rows keyed by id with codes and term ids resolved to names
+def _rows(index):
+    rows = index['rows']
+    return {
+        rid: {
+            'name': rows['name'][i], 'type': index['types'][rows['type'][i]], 'address': rows['address'][i],
+            'phone': rows['phone'][i], 'hours': rows['hours'][i], 'capacity': rows['capacity'][i],
+            'services': rows['services'][i], 'lat': rows['lat'][i], 'lon': rows['lon'][i], 'svc': rows['svc'][i],
+            'languages': {name for bit, name in enumerate(index['languages']) if rows['lang'][i] >> bit & 1},
+            'terms': {index['terms'][term] for term in rows['terms'][i]}, 'digest': rows['digest'][i],
+        }
+        for i, rid in enumerate(rows['id'])
+    }
+
+
+def _publish(old, new):
+    store = SnapshotStore()
+    old_version = store.publish(old)
+    store.publish(new)
+    return old_version, store.delta_since(old_version)
+
+
+def test_delta_round_trip_on_records():
+    old, new = _datasets()
+    _, delta = _publish(old, new)
+    records = apply_delta(to_records(old), delta)
+    assert records == to_records(new)
+    assert records_checksum(records) == delta['checksum']
+
+
+def test_index_checksum_matches_snapshot_store():
+    old, new = _datasets()
+    store = SnapshotStore()
+    store.publish(new)
+    assert build_offline_index(new)['checksum'] == store.checksum
+
+
+@pytest.mark.skipif(NODE is None, reason="needs node")
+def test_offline_page_applies_delta():
+    old, new = _datasets()
+    old_version, delta = _publish(old, new)
+    updated = _apply(build_offline_index(old, old_version), delta)['index']
+    expected = build_offline_index(new, delta['to_version'])
+
+    assert updated['version'] == expected['version']
+    assert updated['checksum'] == expected['checksum']
+    assert _rows(updated) == _rows(expected)
+    # Rows stay in bucket order and every bucket's box holds its rows
+    rows = updated['rows']
+    assert [bucket[0] for bucket in updated['buckets']] == sorted(bucket[0] for bucket in updated['buckets'])
+    assert updated['buckets'][-1][2] == len(rows['id'])
+    for _, start, end, min_lat, min_lon, max_lat, max_lon in updated['buckets']:
+        assert all(min_lat <= lat <= max_lat for lat in rows['lat'][start:end])
+        assert all(min_lon <= lon <= max_lon for lon in rows['lon'][start:end])
+
+
+@pytest.mark.skipif(NODE is None, reason="needs node")
+def test_offline_page_rejects_bad_deltas():
+    old, new = _datasets()
+    old_version, delta = _publish(old, new)
+    index = build_offline_index(old, old_version)
+
+    tampered = json.loads(json.dumps(delta))
+    rid = next(iter(tampered['changed']))
+    tampered['changed'][rid]['phone'] = "000"
+    assert "doesn't match" in _apply(index, tampered)['error']
+
+    # An index from another dataset at the same version doesn't match either
+    other = build_offline_index(_resources(60, seed=3), old_version)
+    assert "doesn't match" in _apply(other, delta)['error']
+
+    current = build_offline_index(new, delta['to_version'])
+    assert "already at version" in _apply(current, delta)['error']
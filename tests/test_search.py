@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from navigator.search import SearchIndex
+
+
+def _resources(n):
+    return pd.DataFrame({
+        'name': [f"Centre {i}" for i in range(n)],
+        'services': ["counselling" if i % 2 else "legal advice" for i in range(n)],
+        'address': [f"{i} Main Rd" for i in range(n)],
+        'languages': ["English, Zulu" if i == 0 else "English" for i in range(n)],
+    })
+
+
+# A term every resource contains has an IDF close to zero, but it still matches
+def test_term_in_every_row_matches_all_rows():
+    for n in (5, 1000, 10000):
+        hits, scores = SearchIndex(_resources(n)).search("english")
+        assert len(hits) == n
+        assert (scores > 0).all()
+
+
+def test_common_term_ties_order_by_distance():
+    distances = np.arange(100, 0, -1, dtype=float)
+    hits, _ = SearchIndex(_resources(100)).search("english", distances=distances, limit=10)
+    assert len(hits) == 10
+    assert list(hits[1:]) == sorted(hits[1:], key=lambda hit: distances[hit])
+
+
+def test_limit_keeps_best_matches():
+    hits, scores = SearchIndex(_resources(1000)).search("zulu", limit=5)
+    assert list(hits) == [0]
+    assert scores[0] > 0
@@ -0,0 +1,22 @@
+import pandas as pd
+
+from navigator.sync import SnapshotStore
+
+
+def _resources(phone):
+    return pd.DataFrame({'name': ["Centre A", "Centre B"], 'address': ["1 Main Rd", "2 Main Rd"],
+                         'phone': ["011 555 0001", phone]})
+
+
+# Stores opened before either publishes stand for two server processes
+# started together; each must see the other's publish
+def test_processes_never_share_a_version(tmp_path):
+    path = str(tmp_path / "sync_state.json")
+    first, second = SnapshotStore(path), SnapshotStore(path)
+    assert first.publish(_resources("011 555 0002")) == 1
+    assert second.publish(_resources("011 555 9999")) == 2
+    assert first.publish(_resources("011 555 9999")) == 2
+
+    delta = SnapshotStore(path).delta_since(1)
+    assert delta['to_version'] == 2
+    assert [record['phone'] for record in delta['changed'].values()] == ["011 555 9999"]
@@ -0,0 +1,80 @@
+import sqlite3
+
+import pandas as pd
+
+from navigator.tiles import Region, TileDirectory, build_tile_pack, resource_regions, tiles_in_bbox
+
+SOWETO = (-26.30, 27.80, -26.20, 27.95)
+ALEXANDRA = (-26.12, 28.05, -26.05, 28.15)
+ZOOMS = (10, 12)
+
+
+# A {z}/{x}/{y}.png tree covering both areas. Tiles with an even x are the
+# same "open veld" image; the rest are unique.
+def _tile_tree(root):
+    tiles = {}
+    for z in range(ZOOMS[0], ZOOMS[1] + 1):
+        for bbox in (SOWETO, ALEXANDRA, (-26.35, 27.75, -26.0, 28.2)):
+            for x, y in tiles_in_bbox(bbox, z):
+                data = b"veld" * 64 if x % 2 == 0 else f"tile {z}/{x}/{y}".encode() * 16
+                path = root / str(z) / str(x) / f"{y}.png"
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(data)
+                tiles[(z, x, y)] = data
+    return TileDirectory(str(root)), tiles
+
+
+def _open(archive, tmp_path):
+    path = tmp_path / "pack.mbtiles"
+    path.write_bytes(archive)
+    return sqlite3.connect(str(path))
+
+
+def test_identical_tiles_are_stored_once(tmp_path):
+    source, tiles = _tile_tree(tmp_path / "tiles")
+    regions = [Region("Soweto", SOWETO, 1), Region("Alexandra", ALEXANDRA, 1)]
+    archive, report = build_tile_pack(regions, source, *ZOOMS)
+    conn = _open(archive, tmp_path)
+
+    stored = {(z, x, y) for region in regions for z in range(ZOOMS[0], ZOOMS[1] + 1) for x, y in region.tiles(z)}
+    assert conn.execute("SELECT COUNT(*) FROM map").fetchone()[0] == len(stored) == report['tiles']
+    assert conn.execute("SELECT COUNT(*) FROM images").fetchone()[0] == len({tiles[tile] for tile in stored})
+    assert report['bytes'] == sum(len(data) for data in {tiles[tile] for tile in stored})
+
+
+def test_rows_are_flipped_to_tms(tmp_path):
+    source, tiles = _tile_tree(tmp_path / "tiles")
+    archive, _ = build_tile_pack([Region("Soweto", SOWETO, 1)], source, *ZOOMS)
+    conn = _open(archive, tmp_path)
+
+    for z, x, y in [(z, x, y) for z in range(ZOOMS[0], ZOOMS[1] + 1) for x, y in tiles_in_bbox(SOWETO, z)]:
+        row = conn.execute("SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                           (z, x, 2 ** z - 1 - y)).fetchone()
+        assert row[0] == tiles[(z, x, y)]
+
+
+def test_region_bytes_do_not_depend_on_order(tmp_path):
+    source, _ = _tile_tree(tmp_path / "tiles")
+    overlapping = (-26.25, 27.90, -26.10, 28.10)
+    regions = [Region("Soweto", SOWETO, 1), Region("Alexandra", ALEXANDRA, 1), Region("Between", overlapping, 1)]
+    _, forward = build_tile_pack(regions, source, *ZOOMS)
+    _, backward = build_tile_pack(regions[::-1], source, *ZOOMS)
+
+    by_name = lambda report: {entry['name']: (entry['tiles'], entry['images'], entry['bytes'])
+                              for entry in report['regions']}
+    assert by_name(forward) == by_name(backward)
+    assert forward['bytes'] == backward['bytes']
+
+
+# Resources on a diagonal merge into one region, but only get tiles around
+# themselves, not the empty corners of the merged box
+def test_regions_package_tiles_around_resources_only():
+    resources = pd.DataFrame({'latitude': [-26.0, -26.07, -27.0], 'longitude': [27.0, 27.07, 29.0],
+                              'address': ["1 Main Rd, Town", "2 Main Rd, Town", "3 Main Rd, Far"]})
+    regions = {region.name: region for region in resource_regions(resources, buffer_km=5.0)}
+    assert sorted(regions) == ["Far", "Town"]
+    town = regions["Town"]
+    assert town.resource_count == len(town.boxes) == 2
+    own = set(town.tiles(12))
+    assert own == {tile for box in town.boxes for tile in tiles_in_bbox(box, 12)}
+    assert own < set(tiles_in_bbox(town.bbox, 12))